@@ -1,3 +1,4 @@
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
@@ -5,18 +6,14 @@ import qrcode
 from io import BytesIO
 from datetime import datetime
 
-from backend import UserModule, SubscriptionManager, ActivityTracker, AdminAnalytics, ContentManager, MutualConnectionManager
-from database import DB
+from backend import db, admin_cache, UserModule, SubscriptionManager, ActivityTracker, AdminAnalytics, ContentManager, MutualConnectionManager
+from exports import available_formats, export_report
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="Netflix Subscription System", page_icon="🎬", layout="wide")
 
 # --- INIT ---
-@st.cache_resource
-def init_db():
-    return DB()
-
-db = init_db()
+# `db` is the process-wide connection pool created in backend.py and shared by every session
 user_sys = UserModule()
 sub_sys = SubscriptionManager()
 tracker = ActivityTracker()
@@ -24,6 +21,42 @@ admin_sys = AdminAnalytics()
 content_mgr = ContentManager()
 mutual_mgr  = MutualConnectionManager()
 
+# --- REPORT EXPORTS ---
+def export_controls(report, label):
+    """
+    Format picker + 'Prepare' button for a streamed export (see exports.py).
+    The file is only built on request and handed to download_button as a file handle.
+    """
+    state_key = f"export_{report}"
+    ex1, ex2, ex3 = st.columns([1, 1, 2])
+    with ex1:
+        fmt = st.selectbox("Format", available_formats(), format_func=str.upper,
+                           key=f"{state_key}_fmt", label_visibility="collapsed")
+    with ex2:
+        if st.button(f"⚙️ Prepare {label}", key=f"{state_key}_prepare", use_container_width=True):
+            with st.spinner("Exporting..."):
+                st.session_state[state_key] = export_report(report, fmt)
+    with ex3:
+        prepared = st.session_state.get(state_key)
+        if prepared and os.path.exists(prepared[0]):
+            path, file_name, mime = prepared
+            with open(path, "rb") as fh:
+                st.download_button(f"📥 Download {label} ({file_name.rsplit('.', 1)[1].upper()})",
+                                   data=fh, file_name=file_name, mime=mime, key=f"{state_key}_download")
+
+# --- CONTENT SEARCH ---
+# How the Browse page counts results: 'exact', 'estimate', 'auto' or 'has_more'
+# (see ContentManager.count_content)
+CONTENT_COUNT_STRATEGY = "auto"
+
+def search_mode_picker(key):
+    """Match-mode radio for ContentManager.browse_content; typo-tolerant only when pg_trgm is set up."""
+    modes = {"Best match": "ranked", "Title": "title", "Contains": "substring"}
+    if content_mgr.trigram_search_available():
+        modes["Typo-tolerant"] = "fuzzy"
+    choice = st.radio("Match", list(modes), horizontal=True, key=key, label_visibility="collapsed")
+    return modes[choice]
+
 # --- CSS STYLING ---
 st.markdown("""
 <style>
@@ -190,8 +223,9 @@ elif is_user_logged_in:
     if 'email' not in st.session_state or 'age' not in st.session_state:
         uid = st.session_state['user_id']
         try:
-            db.cursor.execute("SELECT email, age, fullname FROM users WHERE user_id=%s", (uid,))
-            result = db.cursor.fetchone()
+            with db.cursor() as cur:
+                cur.execute("SELECT email, age, fullname FROM users WHERE user_id=%s", (uid,))
+                result = cur.fetchone()
             if result:
                 st.session_state['email'] = result[0]
                 st.session_state['age'] = result[1]
@@ -202,9 +236,13 @@ elif is_user_logged_in:
 
     st.sidebar.title(f"👋 Hi, {st.session_state['name']}")
     
+    # --- HOME SNAPSHOT ---
+    # One query per rerun: active plan, expired plan, dashboard stats and invite
+    # count are fetched together here and reused throughout the user session page
+    home = user_sys.get_home_snapshot(st.session_state['user_id'])
+    active_plan = home['active_plan']
+
     # --- SIDEBAR CANCEL BUTTON ---
-    # Fetched once here and reused throughout the entire user session page
-    active_plan = sub_sys.get_active_plan(st.session_state['user_id'])
 
     if active_plan:
         st.sidebar.warning("You have an active plan.")
@@ -218,7 +256,7 @@ elif is_user_logged_in:
     user_menu = st.sidebar.radio("Menu", ["🏠 Dashboard", "📺 Browse Content", "💬 Feedback", "🧾 My Transactions", "⚙️ My Profile", "🔔 Notifications"])
 
     # Notification badge — shows unread invite count next to bell
-    _notif_count = mutual_mgr.get_notification_count(st.session_state['user_id'])
+    _notif_count = home['notification_count']
     if _notif_count > 0:
         st.sidebar.markdown(
             f'<div style="background:#E50914;color:white;padding:6px 12px;border-radius:8px;'
@@ -242,11 +280,11 @@ elif is_user_logged_in:
             elif _days_left <= 7:
                 st.toast(f"⚠️ Your plan expires in {_days_left} days on {active_plan['end_date'].strftime('%d %b %Y')}.", icon="⚠️")
         else:
-            _expired = sub_sys.get_expired_plan(st.session_state['user_id'])
+            _expired = home['expired_plan']
             if _expired:
                 st.toast("🔴 Your subscription has expired! Go to Dashboard to renew.", icon="🔴")
     if user_menu == "🏠 Dashboard":
-        dash = user_sys.get_user_dashboard(st.session_state['user_id'])
+        dash = home['dashboard']
 
         st.title(f"👋 Welcome Back, {st.session_state['name']}!")
         st.caption(f"🕐 Last Login: {dash['last_login']}")
@@ -370,7 +408,7 @@ elif is_user_logged_in:
                             st.rerun()
 
         else:
-            expired_plan = sub_sys.get_expired_plan(st.session_state['user_id'])
+            expired_plan = home['expired_plan']
 
             if expired_plan and not st.session_state.get('pending_purchase'):
                 st.subheader("🔴 Your Subscription Has Expired")
@@ -495,7 +533,7 @@ elif is_user_logged_in:
         # ── Mutual Connection Status Card (always visible in dashboard) ──
         st.divider()
         _grp_info, _members_df = mutual_mgr.get_user_active_connection(st.session_state['user_id'])
-        _notif_badge = mutual_mgr.get_notification_count(st.session_state['user_id'])
+        _notif_badge = _notif_count     # from the home snapshot, no extra query
 
         if _grp_info:
             savings = float(_grp_info['full_price']) - float(_grp_info['split_price'])
@@ -870,32 +908,73 @@ elif is_user_logged_in:
 
             with col_f3:
                 search_q = st.text_input("🔍 Search title, cast, or director", placeholder="e.g. Inception, Tom Hanks...")
-
-            # Pagination state
+                search_mode = search_mode_picker("content_search_mode")
+
+            # Range filters on the parsed duration / date_added columns (ContentManager.RANGE_COLUMNS)
+            with st.expander("⚙️ More filters"):
+                col_r1, col_r2, col_r3 = st.columns(3)
+                with col_r1:
+                    runtime = st.slider("⏱️ Runtime (minutes, movies)", 0, 320, (0, 320), step=10)
+                with col_r2:
+                    seasons = st.slider("📺 Seasons (TV shows)", 1, 20, (1, 20))
+                with col_r3:
+                    added_since = st.date_input("📅 Added to Netflix since", value=None, format="DD/MM/YYYY")
+            ranges = {}
+            if runtime != (0, 320):
+                ranges['duration_minutes'] = (runtime[0] or None, runtime[1] if runtime[1] < 320 else None)
+            if seasons != (1, 20):
+                ranges['season_count'] = (seasons[0] if seasons[0] > 1 else None, seasons[1] if seasons[1] < 20 else None)
+            if added_since:
+                ranges['added_on'] = (added_since, None)
+
+            # Pagination state: keyset cursor of the current page (None = first page)
             if 'content_page' not in st.session_state:
                 st.session_state['content_page'] = 1
+                st.session_state['content_cursor'] = None
 
             # Reset page on filter change
-            filter_key = f"{type_filter}|{genre_filter}|{search_q}"
+            filter_key = f"{type_filter}|{genre_filter}|{search_q}|{search_mode}|{sorted(ranges.items())}"
             if st.session_state.get('last_filter') != filter_key:
                 st.session_state['content_page'] = 1
+                st.session_state['content_cursor'] = None
                 st.session_state['last_filter'] = filter_key
 
             PAGE_SIZE = 20
-            df_content, total_count = content_mgr.browse_content(
+            df_content, next_cursor, prev_cursor = content_mgr.browse_content_keyset(
                 content_type=type_filter,
                 genre_filter=genre_filter,
                 search_query=search_q,
-                page=st.session_state['content_page'],
-                page_size=PAGE_SIZE
+                cursor=st.session_state['content_cursor'],
+                page_size=PAGE_SIZE,
+                search_mode=search_mode,
+                ranges=ranges
             )
-
-            total_pages = max(1, -(-total_count // PAGE_SIZE))  # ceil division
-            st.caption(f"Showing **{len(df_content)}** of **{total_count:,}** results  |  Page {st.session_state['content_page']} of {total_pages}")
+            # Exact (cached) for plain browsing, planner estimate for free-text search
+            total_count, exact = content_mgr.count_content(type_filter, genre_filter, search_q,
+                                                           search_mode, strategy=CONTENT_COUNT_STRATEGY,
+                                                           ranges=ranges)
+            page_no = st.session_state['content_page']
+            if total_count is None:
+                # 'has_more': no count query, Next is driven by next_cursor alone
+                of_pages = ""
+                st.caption(f"Showing **{len(df_content)}** results  |  Page {page_no}")
+            else:
+                # Never show fewer results than the pages already seen prove exist;
+                # on the last page the seen rows are the exact total
+                seen = (page_no - 1) * PAGE_SIZE + len(df_content) + (1 if next_cursor else 0)
+                total_count = max(total_count, seen) if next_cursor else seen
+                exact = exact or not next_cursor
+                total_pages = max(1, -(-total_count // PAGE_SIZE))  # ceil division
+                about = "" if exact else "about "
+                of_pages = f" / {about}{total_pages}"
+                st.caption(f"Showing **{len(df_content)}** of {about}**{total_count:,}** results  |  Page {page_no} of {about}{total_pages}")
 
             if df_content.empty:
                 st.info("No content found matching your filters. Try a different search.")
             else:
+                # Neighbours of the whole page in one lookup (content_neighbors)
+                similar_names = content_mgr.get_similar_title_names(df_content['content_id'].tolist(), limit=5)
+
                 # Display content as cards (3 per row)
                 for i in range(0, len(df_content), 3):
                     cols = st.columns(3)
@@ -937,20 +1016,27 @@ elif is_user_logged_in:
                                 if row['country']:
                                     st.markdown(f"**🌍 Country:** {row['country']}")
                                 st.markdown(f"**📖 Description:** {row['description']}")
+                                if similar_names.get(int(row['content_id'])):
+                                    st.markdown(f"**🎯 More like this:** {', '.join(similar_names[int(row['content_id'])])}")
+                                if st.button("✅ Watched", key=f"watched_{row['content_id']}"):
+                                    if content_mgr.mark_watched(st.session_state['user_id'], int(row['content_id'])):
+                                        st.toast(f"Added '{row['title']}' to your watch history", icon="✅")
 
             st.divider()
 
             # Pagination controls
             p_col1, p_col2, p_col3 = st.columns([1, 2, 1])
             with p_col1:
-                if st.button("⬅️ Previous", disabled=(st.session_state['content_page'] <= 1), use_container_width=True):
+                if st.button("⬅️ Previous", disabled=(prev_cursor is None), use_container_width=True):
                     st.session_state['content_page'] -= 1
+                    st.session_state['content_cursor'] = prev_cursor
                     st.rerun()
             with p_col2:
-                st.markdown(f"<p style='text-align:center; color:#aaa;'>Page {st.session_state['content_page']} / {total_pages}</p>", unsafe_allow_html=True)
+                st.markdown(f"<p style='text-align:center; color:#aaa;'>Page {page_no}{of_pages}</p>", unsafe_allow_html=True)
             with p_col3:
-                if st.button("Next ➡️", disabled=(st.session_state['content_page'] >= total_pages), use_container_width=True):
+                if st.button("Next ➡️", disabled=(next_cursor is None), use_container_width=True):
                     st.session_state['content_page'] += 1
+                    st.session_state['content_cursor'] = next_cursor
                     st.rerun()
 
         # ──────────────────────────────────────────────────────
@@ -961,12 +1047,18 @@ elif is_user_logged_in:
             profile = user_sys.get_profile(st.session_state['user_id'])
             fav_genre = profile.get('favorite_genre', '') if profile else ''
 
-            if fav_genre:
+            has_history = bool(content_mgr.get_watched_ids(st.session_state['user_id'], limit=1))
+
+            if fav_genre and has_history:
+                st.success(f"🎯 Showing recommendations based on your favourite genre (**{fav_genre}**) and what you've watched")
+            elif fav_genre:
                 st.success(f"🎯 Showing recommendations based on your favourite genre: **{fav_genre}**")
+            elif has_history:
+                st.success("🎯 Showing recommendations based on what you've watched")
             else:
                 st.info("💡 You haven't set a favourite genre yet. Go to **⚙️ My Profile** to set one! Showing trending titles for now.")
 
-            df_recs = content_mgr.get_recommendations(fav_genre, limit=12)
+            df_recs = content_mgr.get_recommendations(fav_genre, limit=12, user_id=st.session_state['user_id'])
 
             if df_recs.empty:
                 st.warning("No recommendations found. Try updating your favourite genre in your profile.")
@@ -1084,16 +1176,21 @@ elif is_admin_logged_in:
             base.update(kwargs)
             return base
 
-        # ── DOWNLOAD CSV ──────────────────────────────────────────
-        df_subs = admin_sys.get_all_data("subscriptions")
-        if not df_subs.empty:
-            csv = df_subs.to_csv(index=False).encode("utf-8")
-            st.download_button(
-                "📥 Download Revenue Report (CSV)",
-                data=csv,
-                file_name="revenue_report.csv",
-                mime="text/csv",
-            )
+        # ── CACHE STATUS ──────────────────────────────────────────
+        # Dashboard queries are cached for up to a few minutes; purchases,
+        # renewals and cancellations refresh the affected numbers at once.
+        _cs = admin_cache.stats()
+        cs1, cs2 = st.columns([4, 1])
+        cs1.caption(
+            f"⚡ Analytics cache: {_cs['entries']} entries · {_cs['hits']} hits / "
+            f"{_cs['misses']} misses ({_cs['hit_rate']}% hit rate) · {_cs['evictions']} evicted"
+        )
+        if cs2.button("🔄 Refresh data", use_container_width=True):
+            admin_cache.invalidate()
+            st.rerun()
+
+        # ── DOWNLOAD REPORT ───────────────────────────────────────
+        export_controls("revenue_report", "Revenue Report")
         st.divider()
 
         # ════════════════════════════════════════════════════════
@@ -1120,8 +1217,6 @@ elif is_admin_logged_in:
         st.subheader("📈 Section 2 — Revenue Charts")
         g2, g3 = st.columns([3, 2])
 
-        df_subs_chart = admin_sys.get_all_data("subscriptions")
-
         with g2:
             st.markdown("🌍 **Revenue by Country**")
             try:
@@ -1524,8 +1619,8 @@ elif is_admin_logged_in:
             del_id = st.number_input("Enter Feedback ID to delete", min_value=1, step=1)
             if st.button("🗑️ Delete Feedback", type="primary"):
                 try:
-                    db.cursor.execute("DELETE FROM feedback WHERE id = %s", (int(del_id),))
-                    db.conn.commit()
+                    with db.cursor() as cur:
+                        cur.execute("DELETE FROM feedback WHERE id = %s", (int(del_id),))
                     st.success(f"Feedback ID {del_id} deleted successfully.")
                     st.rerun()
                 except Exception as e:
@@ -1537,8 +1632,6 @@ elif is_admin_logged_in:
         st.title("👥 User Management")
         st.info("Search, filter and manage user accounts.")
 
-        df_users = admin_sys.get_all_data("users")
-
         # ── Filters row ──────────────────────────────────────
         fc1, fc2, fc3 = st.columns([2, 1, 1])
         with fc1:
@@ -1548,19 +1641,41 @@ elif is_admin_logged_in:
         with fc3:
             st.write("")  # spacer
 
-        # Apply filters
-        if search_email.strip():
-            df_users = df_users[
-                df_users['email'].str.contains(search_email, case=False, na=False) |
-                df_users['fullname'].str.contains(search_email, case=False, na=False)
-            ]
-        if role_filter != "All":
-            df_users = df_users[df_users['role'] == role_filter]
+        # Filters run in SQL and only the visible page is fetched.
+        # Keyset paging: a stack of page-start cursors (None = first page).
+        user_filters = {} if role_filter == "All" else {"role": role_filter}
+        manage_key = f"{search_email.strip()}|{role_filter}"
+        if st.session_state.get('manage_filter') != manage_key:
+            st.session_state['manage_cursors'] = [None]
+            st.session_state['manage_filter'] = manage_key
+
+        MANAGE_PAGE_SIZE = 50
+        # password / profile_pic_url are not part of the projection
+        df_users, next_cursor = admin_sys.get_table_page(
+            "users",
+            filters=user_filters,
+            search=search_email,
+            after=st.session_state['manage_cursors'][-1],
+            page_size=MANAGE_PAGE_SIZE,
+        )
+        total_matches = admin_sys.count_table_rows("users", filters=user_filters, search=search_email)
+        page_no = len(st.session_state['manage_cursors'])
+        total_pages = max(1, -(-total_matches // MANAGE_PAGE_SIZE))  # ceil division
 
-        # ── Hide sensitive columns ───────────────────────────
-        display_cols = [c for c in df_users.columns if c not in ('password', 'profile_pic_url')]
-        st.caption(f"Showing **{len(df_users)}** users")
-        st.dataframe(df_users[display_cols], use_container_width=True)
+        st.caption(f"Showing **{len(df_users)}** of **{total_matches:,}** users  |  Page {page_no} of {total_pages}")
+        st.dataframe(df_users, use_container_width=True)
+
+        mp1, mp2, mp3 = st.columns([1, 2, 1])
+        with mp1:
+            if st.button("⬅️ Previous", key="manage_prev", disabled=(page_no <= 1), use_container_width=True):
+                st.session_state['manage_cursors'].pop()
+                st.rerun()
+        with mp2:
+            st.markdown(f"<p style='text-align:center; color:#aaa;'>Page {page_no} / {total_pages}</p>", unsafe_allow_html=True)
+        with mp3:
+            if st.button("Next ➡️", key="manage_next", disabled=(next_cursor is None), use_container_width=True):
+                st.session_state['manage_cursors'].append(next_cursor)
+                st.rerun()
 
         st.divider()
         st.subheader("🛠️ Perform Action on User")
@@ -1814,14 +1929,8 @@ elif is_admin_logged_in:
             })
             st.dataframe(df_display, use_container_width=True)
 
-            # Download CSV
-            csv = df_display.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                "📥 Download Full Payment Report (CSV)",
-                data=csv,
-                file_name='payment_report.csv',
-                mime='text/csv'
-            )
+            # Download report (streamed from the database, not from df_display)
+            export_controls("payment_report", "Full Payment Report")
         else:
             st.info("No payment records found yet.")
 
@@ -2105,15 +2214,36 @@ elif is_admin_logged_in:
 
         with g1:
             st.subheader("🎭 Top 15 Genres")
-            df_genres = content_mgr.get_genre_distribution()
-            if not df_genres.empty:
+            genre_split = st.radio("Split by", ["None", "Type", "Release year"], horizontal=True,
+                                   key="genre_split")
+            breakdown = {"None": None, "Type": "content_type", "Release year": "release_year"}[genre_split]
+            df_genres = content_mgr.get_genre_distribution(breakdown=breakdown)
+            if not df_genres.empty and breakdown == "release_year":
+                df_genres = df_genres[df_genres['release_year'] > 1990]
+                fig_genre = px.density_heatmap(
+                    df_genres, x='release_year', y='genre', z='count',
+                    histfunc='sum', nbinsx=int(df_genres['release_year'].nunique()),
+                    title="Genres by Release Year",
+                    color_continuous_scale=[[0.0, _CL_PAPER], [1.0, _CL_BLUE]],
+                    labels={'release_year': 'Year', 'genre': 'Genre', 'count': 'Titles'}
+                )
+                fig_genre.update_layout(
+                    **_cl_layout,
+                    yaxis=dict(gridcolor=_CL_GRID, color=_CL_FONT),
+                    xaxis=dict(gridcolor=_CL_GRID, color=_CL_FONT),
+                )
+                st.plotly_chart(fig_genre, use_container_width=True)
+            elif not df_genres.empty:
+                if breakdown:
+                    colors = dict(color='content_type', color_discrete_map={'Movie': _CL_BLUE, 'TV Show': _CL_GREEN})
+                else:
+                    colors = dict(color='count', color_continuous_scale=[[0.0, "#1a3a6b"], [1.0, _CL_BLUE]])
                 fig_genre = px.bar(
                     df_genres, x='count', y='genre',
                     orientation='h',
                     title="Most Common Genres",
-                    color='count',
-                    color_continuous_scale=[[0.0, "#1a3a6b"], [1.0, _CL_BLUE]],
-                    labels={'count': 'Number of Titles', 'genre': 'Genre'}
+                    labels={'count': 'Number of Titles', 'genre': 'Genre', 'content_type': 'Type'},
+                    **colors
                 )
                 fig_genre.update_layout(
                     **_cl_layout,
@@ -2172,13 +2302,15 @@ elif is_admin_logged_in:
             adm_genre = st.selectbox("Genre", adm_genres, key="adm_genre")
         with c3:
             adm_search = st.text_input("Search title / cast", key="adm_search")
+            adm_mode = search_mode_picker("adm_search_mode")
 
         df_adm, adm_total = content_mgr.browse_content(
             content_type=adm_type,
             genre_filter=adm_genre,
             search_query=adm_search,
             page=1,
-            page_size=50
+            page_size=50,
+            search_mode=adm_mode
         )
         st.caption(f"Showing top 50 of **{adm_total:,}** results")
         if not df_adm.empty:
@@ -1,10 +1,60 @@
+import numpy as np
 import pandas as pd
+import base64
 import hashlib
+import json
+import re
+import atexit
+import threading
+import psycopg2
 from datetime import datetime, timedelta
+from psycopg2.extras import execute_values
+from cache import TTLCache
+from catalog import ContentCatalog, title_tokens
 from database import DB
+from migrations import ACTIVITY_ROLLED_THROUGH, CONTENT_BROWSE_KEY, CONTENT_SEARCH_CONFIG
+from recommender import ContentRecommender
 
 db = DB()
 
+# Process-wide cache for AdminAnalytics results. Entries are tagged with the
+# tables they read; writes below invalidate the matching tags, and activity
+# data (written constantly by ActivityWriter) simply expires on its TTL.
+admin_cache = TTLCache()
+
+
+def _bump_user_summary(cur, user_id, spend=0, subs=0):
+    """
+    Adds a purchase to a user's running totals in user_summary, inside the
+    caller's transaction, so dashboard stats are O(1) reads instead of
+    SUMs over the user's whole history. Watch time and last login are
+    kept by ActivityWriter's batched flushes.
+    """
+    cur.execute("""
+        INSERT INTO user_summary (user_id, lifetime_spend, subscription_count, updated_at)
+        VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id) DO UPDATE SET
+            lifetime_spend     = user_summary.lifetime_spend     + EXCLUDED.lifetime_spend,
+            subscription_count = user_summary.subscription_count + EXCLUDED.subscription_count,
+            updated_at         = CURRENT_TIMESTAMP
+    """, (user_id, spend, subs))
+
+
+def _bump_revenue_daily(cur, plan_name, payment_type, amount):
+    """
+    Adds one SUCCESS payment to today's revenue_daily row, inside the
+    caller's transaction, so revenue reports read the rollup instead of
+    scanning the whole payments ledger.
+    """
+    cur.execute("""
+        INSERT INTO revenue_daily (day, plan_name, payment_type, txn_count, revenue)
+        VALUES (CURRENT_DATE, COALESCE(%s, 'Unknown'), %s, 1, %s)
+        ON CONFLICT (day, plan_name, payment_type) DO UPDATE SET
+            txn_count = revenue_daily.txn_count + 1,
+            revenue   = revenue_daily.revenue   + EXCLUDED.revenue
+    """, (plan_name, payment_type, amount))
+
+
 class UserModule:
     def register(self, name, email, password, mobile, age, country, favorite_genre=""):
         # 1. Basic Empty Checks
@@ -47,19 +97,21 @@ class UserModule:
         hashed_pw = hashlib.sha256(password.encode()).hexdigest()
         
         try:
-            db.cursor.execute(
-                "INSERT INTO users (fullname, email, password, mobile, age, country, favorite_genre) VALUES (%s, %s, %s, %s, %s, %s, %s)", 
-                (name, email, hashed_pw, mobile, age, country, favorite_genre)
-            )
-            db.conn.commit()
+            with db.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO users (fullname, email, password, mobile, age, country, favorite_genre) VALUES (%s, %s, %s, %s, %s, %s, %s)", 
+                    (name, email, hashed_pw, mobile, age, country, favorite_genre)
+                )
+            admin_cache.invalidate("users")
             return True, "Registration Successful"
         except Exception: 
             return False, "This email is already registered."
 
     def login(self, email, password):
         hashed_pw = hashlib.sha256(password.encode()).hexdigest()
-        db.cursor.execute("SELECT * FROM users WHERE email=%s AND password=%s", (email, hashed_pw))
-        return db.cursor.fetchone()
+        with db.cursor() as cur:
+            cur.execute("SELECT * FROM users WHERE email=%s AND password=%s", (email, hashed_pw))
+            return cur.fetchone()
 
     def submit_feedback(self, user_id, content):
         """Stores user movie/show requests"""
@@ -71,42 +123,93 @@ class UserModule:
         if len(content.strip()) > 1000:
             return False, "Feedback is too long (maximum 1000 characters)."
         try:
-            db.cursor.execute(
-                "INSERT INTO feedback (user_id, request_content) VALUES (%s, %s)",
-                (user_id, content.strip())
-            )
-            db.conn.commit()
+            with db.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO feedback (user_id, request_content) VALUES (%s, %s)",
+                    (user_id, content.strip())
+                )
             return True, "Thank you! Your request has been sent to the content team."
         except:
             return False, "Could not submit feedback. Please try again."
 
     def get_user_analytics(self, user_id):
-        """Returns personal analytics: Spend and Watch Time"""
-        # Total Spend
-        query_spend = "SELECT COALESCE(SUM(amount), 0) FROM subscriptions WHERE user_id=%s"
-        db.cursor.execute(query_spend, (user_id,))
-        total_spend = db.cursor.fetchone()[0]
+        """Returns personal analytics: Spend and Watch Time (from user_summary)"""
+        with db.cursor() as cur:
+            cur.execute(
+                "SELECT lifetime_spend, watch_minutes FROM user_summary WHERE user_id=%s",
+                (user_id,)
+            )
+            row = cur.fetchone()
+        if not row:
+            return 0, 0
+        total_spend, total_mins = row
+        return total_spend, total_mins
 
-        # Total Watch Time
-        query_time = "SELECT COALESCE(SUM(session_minutes), 0) FROM user_activity WHERE user_id=%s"
-        db.cursor.execute(query_time, (user_id,))
-        total_mins = db.cursor.fetchone()[0]
+    # Columns of a subscriptions row, in the order returned by the home query
+    SUBSCRIPTION_COLS = ["subscription_id", "user_id", "service_type", "plan_name", "amount",
+                         "start_date", "end_date", "status", "auto_renewal"]
 
-        return total_spend, total_mins
+    def get_home_snapshot(self, user_id):
+        """
+        Everything the user home page needs in ONE round-trip:
+        dashboard stats, active plan, latest expired plan and the
+        pending-invite count for the notification bell.
+        Returns dict with keys: dashboard, active_plan, expired_plan, notification_count
+        """
+        with db.cursor() as cur:
+            cur.execute("""
+                SELECT ap.subscription_id, ap.user_id, ap.service_type, ap.plan_name, ap.amount,
+                       ap.start_date, ap.end_date, ap.status, ap.auto_renewal,
+                       ep.subscription_id, ep.user_id, ep.service_type, ep.plan_name, ep.amount,
+                       ep.start_date, ep.end_date, ep.status, ep.auto_renewal,
+                       COALESCE(us.lifetime_spend, 0), COALESCE(us.subscription_count, 0),
+                       COALESCE(us.watch_minutes, 0), us.last_login,
+                       inv.pending
+                FROM (SELECT %(uid)s::int AS user_id) u
+                -- 1. Active plan
+                LEFT JOIN LATERAL (
+                    SELECT * FROM subscriptions
+                    WHERE user_id = u.user_id AND status = 'ACTIVE'
+                    ORDER BY start_date DESC LIMIT 1
+                ) ap ON TRUE
+                -- 2. Most recent expired / cancelled plan (for renewal)
+                LEFT JOIN LATERAL (
+                    SELECT * FROM subscriptions
+                    WHERE user_id = u.user_id AND status IN ('EXPIRED', 'CANCELLED')
+                    ORDER BY end_date DESC LIMIT 1
+                ) ep ON TRUE
+                -- 3. Lifetime spend, subscriptions ever, watch time, last login
+                LEFT JOIN user_summary us ON us.user_id = u.user_id
+                -- 4. Unread mutual-connection invites
+                CROSS JOIN LATERAL (
+                    SELECT COUNT(*) AS pending FROM mutual_invites
+                    WHERE user_id = u.user_id AND invite_status = 'PENDING'
+                ) inv
+            """, {"uid": user_id})
+            row = cur.fetchone()
+
+        n = len(self.SUBSCRIPTION_COLS)
+        active_plan  = self._subscription_dict(row[:n])
+        expired_plan = self._subscription_dict(row[n:2 * n])
+        total_spend, total_subs, total_watch, last_login_ts, pending = row[2 * n:]
 
-    def get_user_dashboard(self, user_id):
-        """Returns all data needed for the user dashboard home page"""
-        from datetime import datetime
+        return {
+            "dashboard": self._build_dashboard(active_plan, total_spend, total_subs,
+                                               total_watch, last_login_ts),
+            "active_plan": active_plan,
+            "expired_plan": expired_plan,
+            "notification_count": int(pending),
+        }
 
-        # 1. Active Plan Info
-        db.cursor.execute("""
-            SELECT plan_name, amount, start_date, end_date, status, auto_renewal
-            FROM subscriptions
-            WHERE user_id = %s AND status = 'ACTIVE'
-            ORDER BY start_date DESC LIMIT 1
-        """, (user_id,))
-        plan_row = db.cursor.fetchone()
+    def _subscription_dict(self, values):
+        """Maps one subscriptions row from the home query to a dict (None if absent)."""
+        if values[0] is None:
+            return None
+        plan = dict(zip(self.SUBSCRIPTION_COLS, values))
+        plan["amount"] = float(plan["amount"]) if plan["amount"] is not None else 0.0
+        return plan
 
+    def _build_dashboard(self, plan, total_spend, total_subs, total_watch, last_login_ts):
         plan_name = None
         plan_amount = 0
         days_left = 0
@@ -116,13 +219,13 @@ class UserModule:
         sub_status = "NO PLAN"
         auto_renewal = False
 
-        if plan_row:
-            plan_name = plan_row[0]
-            plan_amount = float(plan_row[1])
-            start_date = plan_row[2]
-            end_date = plan_row[3]
-            sub_status = plan_row[4]
-            auto_renewal = plan_row[5] if plan_row[5] is not None else False
+        if plan:
+            plan_name = plan["plan_name"]
+            plan_amount = plan["amount"]
+            start_date = plan["start_date"]
+            end_date = plan["end_date"]
+            sub_status = plan["status"]
+            auto_renewal = plan["auto_renewal"] if plan["auto_renewal"] is not None else False
 
             # Calculate days remaining
             now = datetime.now()
@@ -131,32 +234,7 @@ class UserModule:
             total_days = max(1, (end_date - start_date).days)
             end_date_str = end_date.strftime("%d %b %Y")
 
-        # 2. Total Money Spent
-        db.cursor.execute(
-            "SELECT COALESCE(SUM(amount), 0) FROM subscriptions WHERE user_id = %s", (user_id,)
-        )
-        total_spend = float(db.cursor.fetchone()[0])
-
-        # 3. Total Watch Time (SUM of all session_minutes)
-        db.cursor.execute(
-            "SELECT COALESCE(SUM(session_minutes), 0) FROM user_activity WHERE user_id = %s", (user_id,)
-        )
-        total_watch = int(db.cursor.fetchone()[0])
-
-        # 4. Total number of subscriptions ever
-        db.cursor.execute(
-            "SELECT COUNT(*) FROM subscriptions WHERE user_id = %s", (user_id,)
-        )
-        total_subs = int(db.cursor.fetchone()[0])
-
-        # 5. Last login time
-        db.cursor.execute("""
-            SELECT login_time FROM user_activity
-            WHERE user_id = %s
-            ORDER BY login_time DESC LIMIT 1
-        """, (user_id,))
-        last_login_row = db.cursor.fetchone()
-        last_login = last_login_row[0].strftime("%d %b %Y, %I:%M %p") if last_login_row else "First Login"
+        last_login = last_login_ts.strftime("%d %b %Y, %I:%M %p") if last_login_ts else "First Login"
 
         return {
             "plan_name": plan_name,
@@ -167,19 +245,25 @@ class UserModule:
             "end_date_str": end_date_str,
             "sub_status": sub_status,
             "auto_renewal": auto_renewal,
-            "total_spend": total_spend,
-            "total_watch": total_watch,
-            "total_subs": total_subs,
+            "total_spend": float(total_spend),
+            "total_watch": int(total_watch),
+            "total_subs": int(total_subs),
             "last_login": last_login
         }
+
+    def get_user_dashboard(self, user_id):
+        """Returns all data needed for the user dashboard home page (single query)."""
+        return self.get_home_snapshot(user_id)["dashboard"]
+
     def change_user_status(self, user_id, new_status):
         """Changes user role (e.g., to SUSPENDED)"""
         try:
-            db.cursor.execute(
-                "UPDATE users SET role = %s WHERE user_id = %s",
-                (new_status, user_id)
-            )
-            db.conn.commit()
+            with db.cursor() as cur:
+                cur.execute(
+                    "UPDATE users SET role = %s WHERE user_id = %s",
+                    (new_status, user_id)
+                )
+            admin_cache.invalidate("users")
             return True
         except Exception as e:
             print(f"Error changing user status: {e}")
@@ -188,8 +272,9 @@ class UserModule:
     def delete_user(self, user_id):
         """Deletes a user from the database"""
         try:
-            db.cursor.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
-            db.conn.commit()
+            with db.cursor() as cur:
+                cur.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
+            admin_cache.invalidate("users")
             return True
         except Exception as e:
             print(f"Error deleting user: {e}")
@@ -197,11 +282,12 @@ class UserModule:
 
     def get_profile(self, user_id):
         """Fetch current profile data for a user"""
-        db.cursor.execute("""
-            SELECT fullname, email, mobile, age, country, gender, dob, favorite_genre
-            FROM users WHERE user_id = %s
-        """, (user_id,))
-        row = db.cursor.fetchone()
+        with db.cursor() as cur:
+            cur.execute("""
+                SELECT fullname, email, mobile, age, country, gender, dob, favorite_genre
+                FROM users WHERE user_id = %s
+            """, (user_id,))
+            row = cur.fetchone()
         if not row:
             return None
         return {
@@ -223,13 +309,14 @@ class UserModule:
         if mobile and (not mobile.isdigit() or len(mobile) != 10):
             return False, "Mobile must be exactly 10 digits."
         try:
-            db.cursor.execute("""
-                UPDATE users
-                SET fullname = %s, mobile = %s, country = %s,
-                    gender = %s, dob = %s, favorite_genre = %s
-                WHERE user_id = %s
-            """, (fullname.strip(), mobile, country, gender, dob, favorite_genre, user_id))
-            db.conn.commit()
+            with db.cursor() as cur:
+                cur.execute("""
+                    UPDATE users
+                    SET fullname = %s, mobile = %s, country = %s,
+                        gender = %s, dob = %s, favorite_genre = %s
+                    WHERE user_id = %s
+                """, (fullname.strip(), mobile, country, gender, dob, favorite_genre, user_id))
+            admin_cache.invalidate("users")
             return True, "Profile updated successfully!"
         except Exception as e:
             print(f"Profile update error: {e}")
@@ -237,29 +324,33 @@ class UserModule:
 
 class SubscriptionManager:
     def buy_plan(self, user_id, plan_name, amount, service_type, auto_renewal=False):
-        # ── ISSUE 6: Guard Against Duplicate Active Subscriptions ──
-        db.cursor.execute(
-            "SELECT COUNT(*) FROM subscriptions WHERE user_id=%s AND status='ACTIVE'",
-            (user_id,)
-        )
-        if db.cursor.fetchone()[0] > 0:
-            return None, None  # Already has an active plan — block double purchase
-
-        start = datetime.now()
-        end = start + timedelta(days=30)
-        db.cursor.execute(
-            "INSERT INTO subscriptions (user_id, plan_name, amount, start_date, end_date, service_type, auto_renewal) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING subscription_id",
-            (user_id, plan_name, amount, start, end, service_type, auto_renewal)
-        )
-        sub_id = db.cursor.fetchone()[0]
-        db.cursor.execute(
-            "INSERT INTO payments (user_id, subscription_id, plan_name, amount, payment_type, payment_status) VALUES (%s, %s, %s, %s, %s, %s)",
-            (user_id, sub_id, plan_name, amount, 'NEW', 'SUCCESS')
-        )
-        db.conn.commit()
+        with db.cursor() as cur:
+            # ── ISSUE 6: Guard Against Duplicate Active Subscriptions ──
+            cur.execute(
+                "SELECT COUNT(*) FROM subscriptions WHERE user_id=%s AND status='ACTIVE'",
+                (user_id,)
+            )
+            if cur.fetchone()[0] > 0:
+                return None, None  # Already has an active plan — block double purchase
+
+            start = datetime.now()
+            end = start + timedelta(days=30)
+            cur.execute(
+                "INSERT INTO subscriptions (user_id, plan_name, amount, start_date, end_date, service_type, auto_renewal) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING subscription_id",
+                (user_id, plan_name, amount, start, end, service_type, auto_renewal)
+            )
+            sub_id = cur.fetchone()[0]
+            cur.execute(
+                "INSERT INTO payments (user_id, subscription_id, plan_name, amount, payment_type, payment_status) VALUES (%s, %s, %s, %s, %s, %s)",
+                (user_id, sub_id, plan_name, amount, 'NEW', 'SUCCESS')
+            )
+            _bump_user_summary(cur, user_id, spend=amount, subs=1)
+            _bump_revenue_daily(cur, plan_name, 'NEW', amount)
+        admin_cache.invalidate("subscriptions", "payments")
         # Fetch user info for PDF
-        db.cursor.execute("SELECT fullname, email FROM users WHERE user_id=%s", (user_id,))
-        urow = db.cursor.fetchone()
+        with db.cursor() as cur:
+            cur.execute("SELECT fullname, email FROM users WHERE user_id=%s", (user_id,))
+            urow = cur.fetchone()
         uname  = urow[0] if urow else "User"
         uemail = urow[1] if urow else ""
         txt = self.generate_ott_invoice(user_id, service_type, plan_name, amount, start.strftime("%Y-%m-%d"))
@@ -269,38 +360,42 @@ class SubscriptionManager:
     def renew_subscription(self, user_id):
         """Renews an expired subscription for the user"""
         try:
-            # Get the last expired subscription
-            db.cursor.execute("""
-                SELECT subscription_id, plan_name, amount, service_type, auto_renewal
-                FROM subscriptions
-                WHERE user_id = %s AND status IN ('EXPIRED', 'CANCELLED')
-                ORDER BY end_date DESC
-                LIMIT 1
-            """, (user_id,))
-            result = db.cursor.fetchone()
-            if not result:
-                return False, "No expired subscription found to renew."
-
-            sub_id, plan_name, amount, service_type, auto_renewal = result
-            start = datetime.now()
-            end = start + timedelta(days=30)
-
-            # Insert new subscription row
-            db.cursor.execute("""
-                INSERT INTO subscriptions (user_id, plan_name, amount, start_date, end_date, service_type, status, auto_renewal)
-                VALUES (%s, %s, %s, %s, %s, %s, 'ACTIVE', %s) RETURNING subscription_id
-            """, (user_id, plan_name, amount, start, end, service_type, auto_renewal))
-            new_sub_id = db.cursor.fetchone()[0]
-
-            # Record payment
-            db.cursor.execute(
-                "INSERT INTO payments (user_id, subscription_id, plan_name, amount, payment_type, payment_status) VALUES (%s, %s, %s, %s, %s, %s)",
-                (user_id, new_sub_id, plan_name, amount, 'RENEWAL', 'SUCCESS')
-            )
-            db.conn.commit()
+            with db.cursor() as cur:
+                # Get the last expired subscription
+                cur.execute("""
+                    SELECT subscription_id, plan_name, amount, service_type, auto_renewal
+                    FROM subscriptions
+                    WHERE user_id = %s AND status IN ('EXPIRED', 'CANCELLED')
+                    ORDER BY end_date DESC
+                    LIMIT 1
+                """, (user_id,))
+                result = cur.fetchone()
+                if not result:
+                    return False, "No expired subscription found to renew."
+
+                sub_id, plan_name, amount, service_type, auto_renewal = result
+                start = datetime.now()
+                end = start + timedelta(days=30)
+
+                # Insert new subscription row
+                cur.execute("""
+                    INSERT INTO subscriptions (user_id, plan_name, amount, start_date, end_date, service_type, status, auto_renewal)
+                    VALUES (%s, %s, %s, %s, %s, %s, 'ACTIVE', %s) RETURNING subscription_id
+                """, (user_id, plan_name, amount, start, end, service_type, auto_renewal))
+                new_sub_id = cur.fetchone()[0]
+
+                # Record payment
+                cur.execute(
+                    "INSERT INTO payments (user_id, subscription_id, plan_name, amount, payment_type, payment_status) VALUES (%s, %s, %s, %s, %s, %s)",
+                    (user_id, new_sub_id, plan_name, amount, 'RENEWAL', 'SUCCESS')
+                )
+                _bump_user_summary(cur, user_id, spend=amount, subs=1)
+                _bump_revenue_daily(cur, plan_name, 'RENEWAL', amount)
+            admin_cache.invalidate("subscriptions", "payments")
             # Fetch user info for PDF
-            db.cursor.execute("SELECT fullname, email FROM users WHERE user_id=%s", (user_id,))
-            urow = db.cursor.fetchone()
+            with db.cursor() as cur:
+                cur.execute("SELECT fullname, email FROM users WHERE user_id=%s", (user_id,))
+                urow = cur.fetchone()
             uname  = urow[0] if urow else "User"
             uemail = urow[1] if urow else ""
             txt = self.generate_ott_invoice(user_id, service_type, plan_name, amount, start.strftime("%Y-%m-%d"))
@@ -313,11 +408,12 @@ class SubscriptionManager:
     def toggle_auto_renewal(self, user_id, enable: bool):
         """Enables or disables auto-renewal on the user's active subscription"""
         try:
-            db.cursor.execute("""
-                UPDATE subscriptions SET auto_renewal = %s
-                WHERE user_id = %s AND status = 'ACTIVE'
-            """, (enable, user_id))
-            db.conn.commit()
+            with db.cursor() as cur:
+                cur.execute("""
+                    UPDATE subscriptions SET auto_renewal = %s
+                    WHERE user_id = %s AND status = 'ACTIVE'
+                """, (enable, user_id))
+            admin_cache.invalidate("subscriptions")
             return True
         except Exception as e:
             print(f"Toggle Error: {e}")
@@ -331,7 +427,7 @@ class SubscriptionManager:
             ORDER BY end_date DESC
             LIMIT 1
         """
-        df = pd.read_sql(query, db.conn, params=(user_id,))
+        df = db.read_sql(query, params=(user_id,))
         if df.empty:
             return None
         return df.iloc[0].to_dict()
@@ -344,19 +440,20 @@ class SubscriptionManager:
             WHERE user_id = %s
             ORDER BY payment_date DESC
         """
-        return pd.read_sql(query, db.conn, params=(user_id,))
+        return db.read_sql(query, params=(user_id,))
     
     def regenerate_receipt(self, payment_id):
         """Regenerate PDF receipt for a specific payment ID — returns bytes."""
         try:
-            db.cursor.execute("""
-                SELECT p.user_id, p.plan_name, p.amount, p.payment_type,
-                       p.payment_date, u.fullname, u.email
-                FROM payments p
-                JOIN users u ON p.user_id = u.user_id
-                WHERE p.payment_id = %s
-            """, (payment_id,))
-            result = db.cursor.fetchone()
+            with db.cursor() as cur:
+                cur.execute("""
+                    SELECT p.user_id, p.plan_name, p.amount, p.payment_type,
+                           p.payment_date, u.fullname, u.email
+                    FROM payments p
+                    JOIN users u ON p.user_id = u.user_id
+                    WHERE p.payment_id = %s
+                """, (payment_id,))
+                result = cur.fetchone()
             if not result:
                 return None
             user_id, plan_name, amount, payment_type, payment_date, fullname, email = result
@@ -370,7 +467,7 @@ class SubscriptionManager:
             return None
 
     def get_user_invoices(self, user_id):
-        return pd.read_sql(f"SELECT service_type, plan_name, amount, start_date, end_date, status FROM subscriptions WHERE user_id={int(user_id)} ORDER BY start_date DESC", db.conn)
+        return db.read_sql(f"SELECT service_type, plan_name, amount, start_date, end_date, status FROM subscriptions WHERE user_id={int(user_id)} ORDER BY start_date DESC")
 
     def generate_ott_invoice(self, uid, service, plan, amt, date):
         """Kept for backward compatibility — returns simple text summary."""
@@ -391,19 +488,20 @@ class SubscriptionManager:
             from io import BytesIO
             from datetime import timedelta
 
-            # ── Fetch extra user details ──────────────────────────
-            db.cursor.execute("SELECT mobile, country FROM users WHERE user_id=%s", (uid,))
-            user_row = db.cursor.fetchone()
+            with db.cursor() as cur:
+                # ── Fetch extra user details ──────────────────────
+                cur.execute("SELECT mobile, country FROM users WHERE user_id=%s", (uid,))
+                user_row = cur.fetchone()
+
+                # ── Fetch payment ID ──────────────────────────────
+                cur.execute("""
+                    SELECT payment_id FROM payments
+                    WHERE user_id = %s
+                    ORDER BY payment_date DESC LIMIT 1
+                """, (uid,))
+                pay_row = cur.fetchone()
             mobile  = user_row[0] if user_row and user_row[0] else "N/A"
             country = user_row[1] if user_row and user_row[1] else "N/A"
-
-            # ── Fetch payment ID ──────────────────────────────────
-            db.cursor.execute("""
-                SELECT payment_id FROM payments
-                WHERE user_id = %s
-                ORDER BY payment_date DESC LIMIT 1
-            """, (uid,))
-            pay_row    = db.cursor.fetchone()
             payment_id = pay_row[0] if pay_row else f"PAY{uid}{datetime.now().strftime('%Y%m%d%H%M')}"
 
             # ── Validity dates ────────────────────────────────────
@@ -640,7 +738,7 @@ class SubscriptionManager:
             ORDER BY start_date DESC 
             LIMIT 1
         """
-        df = pd.read_sql(query, db.conn, params=(user_id,))
+        df = db.read_sql(query, params=(user_id,))
         
         if df.empty:
             return None
@@ -649,75 +747,225 @@ class SubscriptionManager:
     def cancel_subscription(self, user_id):
         """Updates the status of the user's active subscription to CANCELLED"""
         try:
-            db.cursor.execute(
-                "UPDATE subscriptions SET status = 'CANCELLED' WHERE user_id = %s AND status = 'ACTIVE'",
-                (user_id,)
-            )
-            db.conn.commit()
+            with db.cursor() as cur:
+                cur.execute(
+                    "UPDATE subscriptions SET status = 'CANCELLED' WHERE user_id = %s AND status = 'ACTIVE'",
+                    (user_id,)
+                )
+            admin_cache.invalidate("subscriptions")
             return True
         except Exception as e:
             print(f"Error cancelling subscription: {e}")
             return False
 
+class ActivityWriter:
+    """
+    Write-behind buffer for login/logout events.
+
+    log_in/log_out only append to an in-memory queue; a background thread
+    flushes the queue in multi-row batches (one transaction per flush)
+    when it reaches `batch_size` events or every `flush_interval` seconds,
+    and close() — registered with atexit — flushes whatever is left.
+    activity_ids are handed out from blocks pre-allocated from the
+    user_activity sequence, so log_in can return an id without a write.
+
+    sync=True flushes on every call (no thread) — use it in tests and scripts.
+    """
+
+    ID_BLOCK_SIZE = 100
+
+    def __init__(self, batch_size=200, flush_interval=2.0, sync=False):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sync = sync
+        self._lock = threading.Lock()          # guards the queues
+        self._id_lock = threading.Lock()       # guards the id block
+        self._flush_lock = threading.Lock()    # one flush at a time
+        self._logins = []                      # (activity_id, user_id, login_time)
+        self._logouts = []                     # (activity_id, logout_time)
+        self._ids = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        if not sync:
+            self._thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    # ── Producer side ──────────────────────────────────────────
+    def log_in(self, uid, when):
+        aid = self._next_id()
+        self._enqueue(self._logins, (aid, uid, when))
+        return aid
+
+    def log_out(self, aid, when):
+        self._enqueue(self._logouts, (aid, when))
+
+    def pending(self):
+        with self._lock:
+            return len(self._logins) + len(self._logouts)
+
+    def _enqueue(self, queue, event):
+        with self._lock:
+            queue.append(event)
+            full = len(self._logins) + len(self._logouts) >= self.batch_size
+        if self.sync:
+            self.flush()
+        elif full:
+            self._wake.set()
+
+    def _next_id(self):
+        with self._id_lock:
+            if not self._ids:
+                with db.cursor() as cur:
+                    cur.execute("""
+                        SELECT nextval(pg_get_serial_sequence('user_activity', 'activity_id'))
+                        FROM generate_series(1, %s)
+                    """, (self.ID_BLOCK_SIZE,))
+                    self._ids = [r[0] for r in cur.fetchall()]
+            return self._ids.pop(0)
+
+    # ── Consumer side ──────────────────────────────────────────
+    def flush(self):
+        """Writes every queued event in one transaction. Returns the number written."""
+        with self._flush_lock:
+            with self._lock:
+                logins, self._logins = self._logins, []
+                logouts, self._logouts = self._logouts, []
+            if not logins and not logouts:
+                return 0
+            try:
+                self._write(logins, logouts)
+            except (psycopg2.IntegrityError, psycopg2.DataError):
+                # One bad event (e.g. a deleted user) must not block the queue:
+                # replay the batch event by event and drop only the rejected ones.
+                self._write_individually(logins, logouts)
+            except Exception:
+                self._requeue(logins, logouts)
+                raise
+            return len(logins) + len(logouts)
+
+    def _write(self, logins, logouts):
+        with db.cursor() as cur:
+            if logins:
+                self._write_logins(cur, logins)
+            if logouts:
+                self._write_logouts(cur, logouts)
+
+    def _write_individually(self, logins, logouts):
+        events = [([e], []) for e in logins] + [([], [e]) for e in logouts]
+        for i, (login, logout) in enumerate(events):
+            try:
+                self._write(login, logout)
+            except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+                print(f"⚠️ Dropped activity event {(login or logout)[0]}: {e}")
+            except Exception:
+                rest = events[i:]
+                self._requeue([e for l, _ in rest for e in l], [e for _, o in rest for e in o])
+                raise
+
+    def _requeue(self, logins, logouts):
+        """Puts unwritten events back in front of the queue for the next flush."""
+        with self._lock:
+            self._logins[:0] = logins
+            self._logouts[:0] = logouts
+
+    def _write_logins(self, cur, logins):
+        execute_values(
+            cur, "INSERT INTO user_activity (activity_id, user_id, login_time) VALUES %s", logins
+        )
+        # Latest login per user → user_summary.last_login
+        latest = {}
+        for _, uid, when in logins:
+            if uid not in latest or when > latest[uid]:
+                latest[uid] = when
+        execute_values(cur, """
+            INSERT INTO user_summary (user_id, last_login, updated_at) VALUES %s
+            ON CONFLICT (user_id) DO UPDATE SET
+                last_login = GREATEST(user_summary.last_login, EXCLUDED.last_login),
+                updated_at = CURRENT_TIMESTAMP
+        """, list(latest.items()), template="(%s, %s, CURRENT_TIMESTAMP)")
+
+    def _write_logouts(self, cur, logouts):
+        # Close every session in one UPDATE and add the minutes to user_summary.
+        # `logout_time IS NULL` makes a repeated logout a no-op.
+        execute_values(cur, """
+            WITH closed AS (
+                UPDATE user_activity a
+                SET logout_time     = v.logout_time,
+                    session_minutes = FLOOR(EXTRACT(EPOCH FROM (v.logout_time - a.login_time)) / 60)
+                FROM (VALUES %s) AS v(activity_id, logout_time)
+                WHERE a.activity_id = v.activity_id AND a.logout_time IS NULL
+                RETURNING a.user_id, a.session_minutes
+            )
+            INSERT INTO user_summary (user_id, watch_minutes, updated_at)
+            SELECT user_id, SUM(session_minutes), CURRENT_TIMESTAMP FROM closed GROUP BY user_id
+            ON CONFLICT (user_id) DO UPDATE SET
+                watch_minutes = user_summary.watch_minutes + EXCLUDED.watch_minutes,
+                updated_at    = CURRENT_TIMESTAMP
+        """, logouts, template="(%s::int, %s::timestamp)")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Activity flush failed (will retry): {e}")
+
+    def close(self):
+        """Stops the background thread and flushes anything still queued."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=10)
+        self.flush()
+
+
+# Shared by every session in this process
+activity_writer = ActivityWriter()
+
+
 class ActivityTracker:
+    def __init__(self, writer=None):
+        self.writer = writer or activity_writer
+
     def log_in(self, uid):
-        now = datetime.now()
-        db.cursor.execute(
-            "INSERT INTO user_activity (user_id, login_time) VALUES (%s, %s) RETURNING activity_id", 
-            (uid, now)
-        )
-        db.conn.commit()
-        return db.cursor.fetchone()[0]
+        return self.writer.log_in(uid, datetime.now())
 
     def log_out(self, aid):
-        now = datetime.now()
-        db.cursor.execute("SELECT login_time FROM user_activity WHERE activity_id=%s", (aid,))
-        res = db.cursor.fetchone()
-        if res:
-            start = res[0]
-            mins = int((now - start).total_seconds() / 60)
-            db.cursor.execute(
-                "UPDATE user_activity SET logout_time=%s, session_minutes=%s WHERE activity_id=%s", 
-                (now, mins, aid)
-            )
-            db.conn.commit()
+        self.writer.log_out(aid, datetime.now())
 
 class AdminAnalytics:
+    # Dashboard reads are cached in admin_cache (see cache.py) for `ttl` seconds,
+    # tagged with the tables they read. Feedback and user search stay live.
+    @admin_cache.cached(ttl=60, tags=("payments",))
     def get_monthly_comparison(self):
         """
-        Uses PAYMENTS table (not subscriptions) as source of truth for revenue.
+        Uses PAYMENTS (via the revenue_daily rollup) as source of truth for revenue.
         Seed script never writes to payments — so historical revenue is never
         affected by re-seeding. Only real app transactions are counted here.
         """
-        df = pd.read_sql(
-            "SELECT amount, payment_date FROM payments WHERE payment_status = 'SUCCESS'",
-            db.conn
-        )
-        if df.empty: return 0, 0, 0, 0, 0, 0
-
-        df['payment_date'] = pd.to_datetime(df['payment_date'])
-        now = datetime.now()
-
-        # Current month
-        curr_mask = (
-            (df['payment_date'].dt.month == now.month) &
-            (df['payment_date'].dt.year  == now.year)
-        )
-        curr_rev = df[curr_mask]['amount'].sum()
-        total_sales_count = int(df[curr_mask].shape[0])
-
-        # Previous month
-        first_day_curr   = now.replace(day=1)
-        prev_month_date  = first_day_curr - timedelta(days=1)
-        prev_mask = (
-            (df['payment_date'].dt.month == prev_month_date.month) &
-            (df['payment_date'].dt.year  == prev_month_date.year)
-        )
-        prev_rev = df[prev_mask]['amount'].sum()
+        df = db.read_sql("""
+            SELECT
+                COALESCE(SUM(revenue)   FILTER (WHERE day >= DATE_TRUNC('month', CURRENT_DATE)), 0) AS curr_rev,
+                COALESCE(SUM(txn_count) FILTER (WHERE day >= DATE_TRUNC('month', CURRENT_DATE)), 0) AS curr_count,
+                COALESCE(SUM(revenue)   FILTER (WHERE day >= DATE_TRUNC('month', CURRENT_DATE) - INTERVAL '1 month'
+                                                  AND day <  DATE_TRUNC('month', CURRENT_DATE)), 0) AS prev_rev,
+                COALESCE(SUM(revenue)   FILTER (WHERE EXTRACT(YEAR FROM day) = EXTRACT(YEAR FROM CURRENT_DATE) - 1), 0) AS last_year_rev,
+                COALESCE(SUM(revenue), 0) AS lifetime_rev,
+                COUNT(*) AS rollup_rows
+            FROM revenue_daily
+        """)
+        row = df.iloc[0]
+        if row['rollup_rows'] == 0: return 0, 0, 0, 0, 0, 0
 
-        # Last year & lifetime
-        last_year_rev = df[df['payment_date'].dt.year == (now.year - 1)]['amount'].sum()
-        lifetime_rev  = df['amount'].sum()
+        curr_rev          = float(row['curr_rev'])
+        prev_rev          = float(row['prev_rev'])
+        last_year_rev     = float(row['last_year_rev'])
+        lifetime_rev      = float(row['lifetime_rev'])
+        total_sales_count = int(row['curr_count'])
 
         # Growth %
         growth = 0
@@ -726,21 +974,98 @@ class AdminAnalytics:
 
         return curr_rev, prev_rev, growth, last_year_rev, total_sales_count, lifetime_rev
 
-    def get_all_data(self, tbl):
-        allowed = ["users", "subscriptions", "user_activity", "feedback", "payments"]
-        if tbl not in allowed: return pd.DataFrame()
-        df = pd.read_sql(f"SELECT * FROM {tbl}", db.conn)
-        if tbl == 'subscriptions' and not df.empty:
-            df.rename(columns={'amount': 'Revenue'}, inplace=True)
-        return df
-    
+    # ── Paginated admin tables ───────────────────────────────
+    # Per table: key column used for keyset paging, the columns an admin view
+    # may select (password is never one of them), and the text columns a
+    # free-text search matches against.
+    TABLE_SPECS = {
+        "users": ("user_id",
+                  ["user_id", "fullname", "email", "mobile", "age", "country", "role",
+                   "created_at", "gender", "dob", "favorite_genre"],
+                  ["fullname", "email"]),
+        "subscriptions": ("subscription_id",
+                          ["subscription_id", "user_id", "service_type", "plan_name", "amount",
+                           "start_date", "end_date", "status", "auto_renewal"],
+                          ["plan_name", "service_type"]),
+        "payments": ("payment_id",
+                     ["payment_id", "user_id", "subscription_id", "plan_name", "amount",
+                      "payment_type", "payment_status", "payment_date"],
+                     ["plan_name"]),
+        "user_activity": ("activity_id",
+                          ["activity_id", "user_id", "login_time", "logout_time", "session_minutes"],
+                          []),
+        "feedback": ("id",
+                     ["id", "user_id", "request_content", "created_at"],
+                     ["request_content"]),
+    }
+
+    def _table_filters(self, tbl, filters, search):
+        """WHERE clause + params for equality `filters` and an ILIKE `search`, validated against TABLE_SPECS."""
+        _, allowed, searchable = self.TABLE_SPECS[tbl]
+        clauses, params = [], []
+        for col, value in (filters or {}).items():
+            if col not in allowed:
+                raise ValueError(f"Unknown column for {tbl}: {col}")
+            if value is None:
+                clauses.append(f"{col} IS NULL")
+            else:
+                clauses.append(f"{col} = %s")
+                params.append(value)
+        if search and search.strip() and searchable:
+            pattern = "%" + search.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            clauses.append("(" + " OR ".join(f"{col} ILIKE %s" for col in searchable) + ")")
+            params.extend([pattern] * len(searchable))
+        return clauses, params
+
+    def get_table_page(self, tbl, columns=None, filters=None, search="", after=None, page_size=50):
+        """
+        One page of an admin table with filtering done in SQL.
+        Keyset pagination on the table's key column: pass the returned
+        next_cursor as `after` for the following page (None = first page).
+        Returns (DataFrame, next_cursor) — next_cursor is None on the last page.
+        """
+        if tbl not in self.TABLE_SPECS:
+            return pd.DataFrame(), None
+        key, allowed, _ = self.TABLE_SPECS[tbl]
+        columns = [c for c in (columns or allowed) if c in allowed]
+        if key not in columns:
+            columns = [key] + columns
+
+        clauses, params = self._table_filters(tbl, filters, search)
+        if after is not None:
+            clauses.append(f"{key} > %s")
+            params.append(after)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+
+        # Fetch one extra row to know whether another page exists
+        query = f"SELECT {', '.join(columns)} FROM {tbl} {where} ORDER BY {key} LIMIT %s"
+        df = db.read_sql(query, params=tuple(params) + (page_size + 1,))
+        next_cursor = None
+        if len(df) > page_size:
+            df = df.iloc[:page_size]
+            next_cursor = df[key].iloc[-1].item()
+        return df, next_cursor
+
+    @admin_cache.cached(ttl=60, tags=("users", "subscriptions", "payments", "activity"))
+    def count_table_rows(self, tbl, filters=None, search=""):
+        """Number of rows matching the same filters as get_table_page (cached)."""
+        if tbl not in self.TABLE_SPECS:
+            return 0
+        clauses, params = self._table_filters(tbl, filters, search)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        with db.cursor() as cur:
+            cur.execute(f"SELECT COUNT(*) FROM {tbl} {where}", tuple(params))
+            return cur.fetchone()[0]
+
+    @admin_cache.cached(ttl=300, tags=("users", "subscriptions"))
     def get_demographics_data(self):
         query_country = "SELECT country, COUNT(*) as count FROM users GROUP BY country ORDER BY count DESC"
-        df_country = pd.read_sql(query_country, db.conn)
-        total_users = pd.read_sql("SELECT COUNT(*) FROM users", db.conn).iloc[0,0]
-        paid_users = pd.read_sql("SELECT COUNT(DISTINCT user_id) FROM subscriptions", db.conn).iloc[0,0]
+        df_country = db.read_sql(query_country)
+        total_users = db.read_sql("SELECT COUNT(*) FROM users").iloc[0,0]
+        paid_users = db.read_sql("SELECT COUNT(DISTINCT user_id) FROM subscriptions").iloc[0,0]
         return df_country, total_users, paid_users
 
+    @admin_cache.cached(ttl=60, tags=("payments", "users"))
     def get_revenue_by_country(self):
         """Revenue by country using PAYMENTS table (source of truth)"""
         query = """
@@ -751,8 +1076,9 @@ class AdminAnalytics:
             GROUP BY u.country
             ORDER BY revenue ASC
         """
-        return pd.read_sql(query, db.conn)
+        return db.read_sql(query)
 
+    @admin_cache.cached(ttl=60, tags=("payments",))
     def get_renewal_rate(self):
         """
         Renewal Rate = Renewal Transactions / Total Transactions * 100
@@ -760,14 +1086,13 @@ class AdminAnalytics:
         """
         query = """
             SELECT
-                COUNT(CASE WHEN payment_type = 'RENEWAL' THEN 1 END) as renewal_count,
-                COUNT(*) as total_count,
-                COALESCE(SUM(CASE WHEN payment_type = 'RENEWAL' THEN amount ELSE 0 END), 0) as renewal_rev,
-                COALESCE(SUM(amount), 0) as total_rev
-            FROM payments
-            WHERE payment_status = 'SUCCESS'
+                COALESCE(SUM(CASE WHEN payment_type = 'RENEWAL' THEN txn_count ELSE 0 END), 0) as renewal_count,
+                COALESCE(SUM(txn_count), 0) as total_count,
+                COALESCE(SUM(CASE WHEN payment_type = 'RENEWAL' THEN revenue ELSE 0 END), 0) as renewal_rev,
+                COALESCE(SUM(revenue), 0) as total_rev
+            FROM revenue_daily
         """
-        df = pd.read_sql(query, db.conn)
+        df = db.read_sql(query)
         if df.empty or df.iloc[0]['total_count'] == 0:
             return 0.0, 0.0, 0, 0
         row = df.iloc[0]
@@ -782,7 +1107,8 @@ class AdminAnalytics:
             JOIN users u ON f.user_id = u.user_id
             ORDER BY f.created_at DESC
         """
-        return pd.read_sql(query, db.conn)
+        return db.read_sql(query)
+    @admin_cache.cached(ttl=60, tags=("subscriptions",))
     def get_plan_popularity(self):
         """Fetches sales count grouped by plan name"""
         query = """
@@ -791,63 +1117,63 @@ class AdminAnalytics:
             GROUP BY plan_name
             ORDER BY total_sales DESC
         """
-        return pd.read_sql(query, db.conn)
+        return db.read_sql(query)
+    @admin_cache.cached(ttl=300, tags=("users",))
     def get_age_distribution(self):
         """Fetches user ages for demographics analysis"""
         query = "SELECT age FROM users"
-        return pd.read_sql(query, db.conn)
+        return db.read_sql(query)
 
+    @admin_cache.cached(ttl=60, tags=("payments",))
     def get_total_user_count(self):
         """Fetches paying user count for ARPU calculation (excludes non-paying users)"""
         query = "SELECT COUNT(DISTINCT user_id) as count FROM payments WHERE payment_status = 'SUCCESS'"
-        df = pd.read_sql(query, db.conn)
+        df = db.read_sql(query)
         count = df.iloc[0]['count']
         return count if count > 0 else 1  # avoid division by zero
 
+    @admin_cache.cached(ttl=60, tags=("payments",))
     def get_monthly_revenue_trend(self):
         """
-        Fetches real revenue trend over last 6 months using PAYMENTS table.
+        Fetches real revenue trend over last 6 months from the revenue_daily rollup of PAYMENTS.
         Seed data does not insert payments, so this chart only shows
         genuine transactions made through the app — never inflated by seeding.
         """
         query = """
-            SELECT TO_CHAR(payment_date, 'YYYY-MM') as "Month",
-                   SUM(amount) as "Revenue"
-            FROM payments
-            WHERE payment_status = 'SUCCESS'
-              AND payment_date >= NOW() - INTERVAL '6 months'
+            SELECT TO_CHAR(day, 'YYYY-MM') as "Month",
+                   SUM(revenue) as "Revenue"
+            FROM revenue_daily
+            WHERE day >= (NOW() - INTERVAL '6 months')::date
             GROUP BY "Month"
             ORDER BY "Month" ASC
         """
-        return pd.read_sql(query, db.conn)
+        return db.read_sql(query)
+    @admin_cache.cached(ttl=60, tags=("subscriptions",))
+    def get_subscription_status_counts(self):
+        """
+        {status: count} over all subscriptions in one GROUP BY scan.
+        Cached, so the churn cards and the status donut share one query.
+        """
+        with db.cursor() as cur:
+            cur.execute("SELECT status, COUNT(*) FROM subscriptions GROUP BY status")
+            return dict(cur.fetchall())
+
     def get_churn_stats(self):
         """
         Calculates Churn Rate and counts.
         Churn = EXPIRED + CANCELLED (both mean user is no longer on an active plan).
         Returns: total_subs, churned (expired+cancelled), cancelled_only, expired_only, churn_rate
         """
-        # Total subscriptions ever created
-        total_subs = pd.read_sql(
-            "SELECT COUNT(*) as count FROM subscriptions", db.conn
-        ).iloc[0]['count']
-
-        # Churned = EXPIRED + CANCELLED
-        churned = pd.read_sql(
-            "SELECT COUNT(*) as count FROM subscriptions WHERE status IN ('CANCELLED', 'EXPIRED')",
-            db.conn
-        ).iloc[0]['count']
+        counts = self.get_subscription_status_counts()
 
+        # Total subscriptions ever created
+        total_subs = sum(counts.values())
         # Cancelled only (explicitly cancelled by user)
-        cancelled_only = pd.read_sql(
-            "SELECT COUNT(*) as count FROM subscriptions WHERE status = 'CANCELLED'",
-            db.conn
-        ).iloc[0]['count']
-
+        cancelled_only = counts.get('CANCELLED', 0)
         # Expired only (plan ran out, not renewed)
-        expired_only = pd.read_sql(
-            "SELECT COUNT(*) as count FROM subscriptions WHERE status = 'EXPIRED'",
-            db.conn
-        ).iloc[0]['count']
+        expired_only = counts.get('EXPIRED', 0)
+        # Churned = EXPIRED + CANCELLED
+        churned = cancelled_only + expired_only
 
         # Churn rate = churned / total * 100
         churn_rate = round((churned / total_subs) * 100, 2) if total_subs > 0 else 0
@@ -856,38 +1182,57 @@ class AdminAnalytics:
 
     def get_active_vs_cancelled(self):
         """Fetches counts for pie chart grouped by status"""
-        query = "SELECT status, COUNT(*) as count FROM subscriptions GROUP BY status"
-        return pd.read_sql(query, db.conn)
+        counts = self.get_subscription_status_counts()
+        return pd.DataFrame(list(counts.items()), columns=["status", "count"])
+    @admin_cache.cached(ttl=300, tags=("activity",))
     def get_avg_session_duration(self):
-        """Calculates average watch time per session"""
-        query = "SELECT COALESCE(AVG(session_minutes), 0) FROM user_activity"
-        df = pd.read_sql(query, db.conn)
+        """Calculates average watch time per session (daily rollups + raw rows since the last rollup)"""
+        query = f"""
+            SELECT COALESCE(SUM(minutes)::float / NULLIF(SUM(sessions), 0), 0)
+            FROM (
+                SELECT sessions, minutes FROM activity_daily_hour
+                WHERE day <= {ACTIVITY_ROLLED_THROUGH}
+                UNION ALL
+                SELECT COUNT(*), COALESCE(SUM(session_minutes), 0) FROM user_activity
+                WHERE login_time >= {ACTIVITY_ROLLED_THROUGH} + 1
+            ) t
+        """
+        df = db.read_sql(query)
         return df.iloc[0][0]
 
+    @admin_cache.cached(ttl=300, tags=("activity",))
     def get_peak_hours(self):
         """Returns login count for all 24 hours of the day ordered chronologically"""
-        query = """
-            SELECT EXTRACT(HOUR FROM login_time) as login_hour, COUNT(*) as count
-            FROM user_activity
+        query = f"""
+            SELECT login_hour::int AS login_hour, SUM(logins)::bigint AS count
+            FROM (
+                SELECT hour AS login_hour, sessions AS logins FROM activity_daily_hour
+                WHERE day <= {ACTIVITY_ROLLED_THROUGH}
+                UNION ALL
+                SELECT EXTRACT(HOUR FROM login_time), COUNT(*) FROM user_activity
+                WHERE login_time >= {ACTIVITY_ROLLED_THROUGH} + 1
+                GROUP BY 1
+            ) t
             GROUP BY login_hour
             ORDER BY login_hour ASC
         """
-        return pd.read_sql(query, db.conn)
+        return db.read_sql(query)
     
+    @admin_cache.cached(ttl=60, tags=("payments",))
     def get_plan_revenue_share(self):
         """
-        Calculates real revenue by plan using PAYMENTS table.
+        Calculates real revenue by plan from the revenue_daily rollup of PAYMENTS.
         Seed data is excluded since it never inserts into payments.
         """
         query = """
-            SELECT plan_name, SUM(amount) as total_revenue
-            FROM payments
-            WHERE payment_status = 'SUCCESS'
+            SELECT plan_name, SUM(revenue) as total_revenue
+            FROM revenue_daily
             GROUP BY plan_name
             ORDER BY total_revenue DESC
         """
-        return pd.read_sql(query, db.conn)
+        return db.read_sql(query)
 
+    @admin_cache.cached(ttl=60, tags=("payments", "users"))
     def get_customer_lifetime_value(self):
         """
         Calculates CLV using PAYMENTS table only.
@@ -904,7 +1249,7 @@ class AdminAnalytics:
             WHERE p.payment_status = 'SUCCESS'
             GROUP BY u.user_id, u.fullname
         """
-        df = pd.read_sql(query, db.conn)
+        df = db.read_sql(query)
         if df.empty:
             return df
 
@@ -915,6 +1260,7 @@ class AdminAnalytics:
 
         return df
     
+    @admin_cache.cached(ttl=60, tags=("payments", "users"))
     def get_all_payments(self):
         """Fetches all payment records across all users for admin view"""
         query = """
@@ -924,38 +1270,40 @@ class AdminAnalytics:
             JOIN users u ON p.user_id = u.user_id
             ORDER BY p.payment_date DESC
         """
-        return pd.read_sql(query, db.conn)
+        return db.read_sql(query)
 
+    @admin_cache.cached(ttl=60, tags=("payments",))
     def get_new_vs_renewal_revenue(self):
         """Returns NEW vs RENEWAL total revenue and transaction count for metric cards"""
         query = """
             SELECT 
                 payment_type,
-                COUNT(*) as txn_count,
-                COALESCE(SUM(amount), 0) as total_revenue
-            FROM payments
-            WHERE payment_status = 'SUCCESS'
+                SUM(txn_count) as txn_count,
+                COALESCE(SUM(revenue), 0) as total_revenue
+            FROM revenue_daily
             GROUP BY payment_type
             ORDER BY payment_type ASC
         """
-        return pd.read_sql(query, db.conn)
+        return db.read_sql(query)
 
+    @admin_cache.cached(ttl=60, tags=("payments",))
     def get_monthly_new_vs_renewal(self):
         """Returns month-wise NEW vs RENEWAL breakdown for trend line chart"""
         query = """
             SELECT 
-                TO_CHAR(payment_date, 'YYYY-MM') as month,
+                TO_CHAR(day, 'YYYY-MM') as month,
                 payment_type,
-                SUM(amount) as total_revenue
-            FROM payments
-            WHERE payment_status = 'SUCCESS'
+                SUM(revenue) as total_revenue
+            FROM revenue_daily
             GROUP BY month, payment_type
             ORDER BY month ASC
         """
-        return pd.read_sql(query, db.conn)
+        return db.read_sql(query)
 
+    @admin_cache.cached(ttl=120, tags=("subscriptions", "activity"))
     def get_at_risk_users(self, days_threshold=30):
         """Finds active subscribers who haven't logged in for 30+ days"""
+        # last_login is kept current in user_summary, so no scan of user_activity
         query = """
             SELECT 
                 u.user_id,
@@ -965,20 +1313,19 @@ class AdminAnalytics:
                 s.plan_name,
                 s.amount,
                 s.end_date,
-                MAX(a.login_time) as last_login,
-                (CURRENT_DATE - MAX(a.login_time)::date) as days_inactive
+                us.last_login,
+                (CURRENT_DATE - us.last_login::date) as days_inactive
             FROM users u
             JOIN subscriptions s ON u.user_id = s.user_id
-            LEFT JOIN user_activity a ON u.user_id = a.user_id
+            LEFT JOIN user_summary us ON u.user_id = us.user_id
             WHERE s.status = 'ACTIVE'
-            GROUP BY u.user_id, u.fullname, u.email, u.country,
-                     s.plan_name, s.amount, s.end_date
-            HAVING (CURRENT_DATE - MAX(a.login_time)::date) >= %s
-                OR MAX(a.login_time) IS NULL
+              AND ((CURRENT_DATE - us.last_login::date) >= %s
+                   OR us.last_login IS NULL)
             ORDER BY days_inactive DESC NULLS FIRST
         """
-        return pd.read_sql(query, db.conn, params=(days_threshold,))
+        return db.read_sql(query, params=(days_threshold,))
 
+    @admin_cache.cached(ttl=120, tags=("subscriptions", "payments", "users"))
     def get_revenue_forecast(self):
         """Predicts next month revenue based on active subs, renewal rate and new user trend"""
         # Step 1: Active subscriptions count and avg price
@@ -988,7 +1335,7 @@ class AdminAnalytics:
                    COALESCE(SUM(amount), 0) as active_revenue
             FROM subscriptions WHERE status = 'ACTIVE'
         """
-        df_active = pd.read_sql(query_active, db.conn)
+        df_active = db.read_sql(query_active)
         active_count = int(df_active.iloc[0]['active_count'])
         avg_price    = float(df_active.iloc[0]['avg_price'])
 
@@ -1004,7 +1351,7 @@ class AdminAnalytics:
               AND created_at >= NOW() - INTERVAL '3 months'
               AND created_at < NOW()
         """
-        df_new = pd.read_sql(query_new_users, db.conn)
+        df_new = db.read_sql(query_new_users)
         total_new_3months = int(df_new.iloc[0]['count'])
         avg_new_per_month = round(total_new_3months / 3, 1)
 
@@ -1016,7 +1363,7 @@ class AdminAnalytics:
 
         # Step 5: Confidence score (more data = more confidence)
         query_total_payments = "SELECT COUNT(*) as cnt FROM payments"
-        df_pay = pd.read_sql(query_total_payments, db.conn)
+        df_pay = db.read_sql(query_total_payments)
         total_payments = int(df_pay.iloc[0]['cnt'])
         confidence = min(95, 40 + (total_payments * 2))
 
@@ -1062,7 +1409,7 @@ class AdminAnalytics:
         if filters:
             query += " WHERE " + " AND ".join(filters)
             
-        return pd.read_sql(query, db.conn, params=tuple(params))
+        return db.read_sql(query, params=tuple(params))
 
 
 # ══════════════════════════════════════════════════════════════════
@@ -1086,7 +1433,21 @@ class MutualConnectionManager:
 
     def get_low_usage_users(self, threshold_mins=60):
         """Returns active subscribers whose total watch time this month is below threshold."""
-        query = """
+        # Finished days come from the daily rollup, only sessions since the last rollup from user_activity
+        query = f"""
+            WITH month_usage AS (
+                SELECT user_id, SUM(mins) AS mins
+                FROM (
+                    SELECT user_id, minutes AS mins FROM activity_daily_user
+                    WHERE day >= DATE_TRUNC('month', CURRENT_DATE)::date
+                      AND day <= {ACTIVITY_ROLLED_THROUGH}
+                    UNION ALL
+                    SELECT user_id, session_minutes FROM user_activity
+                    WHERE login_time >= GREATEST(DATE_TRUNC('month', CURRENT_DATE)::date,
+                                                 {ACTIVITY_ROLLED_THROUGH} + 1)
+                ) t
+                GROUP BY user_id
+            )
             SELECT
                 u.user_id,
                 u.fullname,
@@ -1095,19 +1456,15 @@ class MutualConnectionManager:
                 s.plan_name,
                 s.amount        AS plan_price,
                 s.end_date,
-                COALESCE(SUM(a.session_minutes), 0) AS watch_mins_this_month
+                COALESCE(m.mins, 0)::bigint AS watch_mins_this_month
             FROM users u
             JOIN subscriptions s ON u.user_id = s.user_id
-            LEFT JOIN user_activity a
-                ON u.user_id = a.user_id
-                AND a.login_time >= DATE_TRUNC('month', CURRENT_DATE)
+            LEFT JOIN month_usage m ON u.user_id = m.user_id
             WHERE s.status = 'ACTIVE'
-            GROUP BY u.user_id, u.fullname, u.email, u.country,
-                     s.plan_name, s.amount, s.end_date
-            HAVING COALESCE(SUM(a.session_minutes), 0) < %s
+              AND COALESCE(m.mins, 0) < %s
             ORDER BY watch_mins_this_month ASC
         """
-        return pd.read_sql(query, db.conn, params=(threshold_mins,))
+        return db.read_sql(query, params=(threshold_mins,))
 
     def create_group_and_invite(self, user_ids, plan_name, admin_message):
         """
@@ -1121,24 +1478,23 @@ class MutualConnectionManager:
         max_members = len(user_ids)
         split_price = round(full_price / max_members, 2)
         try:
-            db.cursor.execute("""
-                INSERT INTO mutual_groups
-                    (plan_name, full_price, split_price, max_members, status)
-                VALUES (%s, %s, %s, %s, 'FORMING')
-                RETURNING group_id
-            """, (plan_name, full_price, split_price, max_members))
-            group_id = db.cursor.fetchone()[0]
-            for uid in user_ids:
-                db.cursor.execute("""
-                    INSERT INTO mutual_invites
-                        (user_id, group_id, plan_name, split_price, admin_message,
-                         invite_status, member_status)
-                    VALUES (%s, %s, %s, %s, %s, 'PENDING', 'NONE')
-                """, (uid, group_id, plan_name, split_price, admin_message))
-            db.conn.commit()
+            with db.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO mutual_groups
+                        (plan_name, full_price, split_price, max_members, status)
+                    VALUES (%s, %s, %s, %s, 'FORMING')
+                    RETURNING group_id
+                """, (plan_name, full_price, split_price, max_members))
+                group_id = cur.fetchone()[0]
+                for uid in user_ids:
+                    cur.execute("""
+                        INSERT INTO mutual_invites
+                            (user_id, group_id, plan_name, split_price, admin_message,
+                             invite_status, member_status)
+                        VALUES (%s, %s, %s, %s, %s, 'PENDING', 'NONE')
+                    """, (uid, group_id, plan_name, split_price, admin_message))
             return True, f"Group #{group_id} created. Invites sent to {len(user_ids)} users.", group_id
         except Exception as e:
-            db.conn.rollback()
             return False, f"Error creating group: {e}", None
 
     def get_all_groups(self):
@@ -1162,7 +1518,7 @@ class MutualConnectionManager:
                      g.max_members, g.status, g.created_at
             ORDER BY g.created_at DESC
         """
-        return pd.read_sql(query, db.conn)
+        return db.read_sql(query)
 
     def get_group_members(self, group_id):
         """Returns full member list for a group."""
@@ -1175,17 +1531,18 @@ class MutualConnectionManager:
             WHERE i.group_id = %s
             ORDER BY i.sent_at ASC
         """
-        return pd.read_sql(query, db.conn, params=(group_id,))
+        return db.read_sql(query, params=(group_id,))
 
     # ---------- USER METHODS ----------
 
     def get_notification_count(self, user_id):
         """Returns count of unread (PENDING) invites — used for bell badge."""
-        db.cursor.execute(
-            "SELECT COUNT(*) FROM mutual_invites WHERE user_id=%s AND invite_status='PENDING'",
-            (user_id,)
-        )
-        return db.cursor.fetchone()[0]
+        with db.cursor() as cur:
+            cur.execute(
+                "SELECT COUNT(*) FROM mutual_invites WHERE user_id=%s AND invite_status='PENDING'",
+                (user_id,)
+            )
+            return cur.fetchone()[0]
 
     def respond_to_invite(self, invite_id, user_id, accept: bool):
         """
@@ -1196,33 +1553,32 @@ class MutualConnectionManager:
         try:
             new_status = 'ACCEPTED' if accept else 'DECLINED'
             new_member = 'ACTIVE'   if accept else 'NONE'
-            db.cursor.execute("""
-                UPDATE mutual_invites
-                SET invite_status = %s,
-                    member_status = %s,
-                    responded_at  = CURRENT_TIMESTAMP
-                WHERE invite_id = %s AND user_id = %s
-            """, (new_status, new_member, invite_id, user_id))
-            if accept:
-                db.cursor.execute(
-                    "SELECT group_id FROM mutual_invites WHERE invite_id = %s", (invite_id,)
-                )
-                group_id = db.cursor.fetchone()[0]
-                db.cursor.execute("""
-                    SELECT COUNT(*) AS total,
-                           SUM(CASE WHEN invite_status='ACCEPTED' THEN 1 ELSE 0 END) AS accepted
-                    FROM mutual_invites WHERE group_id = %s
-                """, (group_id,))
-                row = db.cursor.fetchone()
-                if row and row[0] > 0 and row[0] == row[1]:
-                    db.cursor.execute(
-                        "UPDATE mutual_groups SET status='ACTIVE' WHERE group_id=%s", (group_id,)
+            with db.cursor() as cur:
+                cur.execute("""
+                    UPDATE mutual_invites
+                    SET invite_status = %s,
+                        member_status = %s,
+                        responded_at  = CURRENT_TIMESTAMP
+                    WHERE invite_id = %s AND user_id = %s
+                """, (new_status, new_member, invite_id, user_id))
+                if accept:
+                    cur.execute(
+                        "SELECT group_id FROM mutual_invites WHERE invite_id = %s", (invite_id,)
                     )
-            db.conn.commit()
+                    group_id = cur.fetchone()[0]
+                    cur.execute("""
+                        SELECT COUNT(*) AS total,
+                               SUM(CASE WHEN invite_status='ACCEPTED' THEN 1 ELSE 0 END) AS accepted
+                        FROM mutual_invites WHERE group_id = %s
+                    """, (group_id,))
+                    row = cur.fetchone()
+                    if row and row[0] > 0 and row[0] == row[1]:
+                        cur.execute(
+                            "UPDATE mutual_groups SET status='ACTIVE' WHERE group_id=%s", (group_id,)
+                        )
             msg = "You have joined the mutual connection group!" if accept else "Invite declined."
             return True, msg
         except Exception as e:
-            db.conn.rollback()
             return False, f"Error responding: {e}"
 
     def get_user_active_connection(self, user_id):
@@ -1241,7 +1597,7 @@ class MutualConnectionManager:
             ORDER BY i.responded_at DESC
             LIMIT 1
         """
-        df = pd.read_sql(query, db.conn, params=(user_id,))
+        df = db.read_sql(query, params=(user_id,))
         if df.empty:
             return None, None
         group_info = df.iloc[0].to_dict()
@@ -1260,183 +1616,630 @@ class MutualConnectionManager:
             WHERE i.user_id = %s
             ORDER BY i.sent_at DESC
         """
-        return pd.read_sql(query, db.conn, params=(user_id,))
+        return db.read_sql(query, params=(user_id,))
 
 # ══════════════════════════════════════════════════════════════════
 #  NEW: ContentManager — handles all Netflix content from Kaggle
 # ══════════════════════════════════════════════════════════════════
 
+def _encode_content_cursor(direction, key):
+    """Opaque browse cursor: the sort key of the page edge + which way to read."""
+    raw = json.dumps({"d": direction, "k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_content_cursor(cursor):
+    """(direction, key) of a cursor; (None, None) for no cursor or one we can't read."""
+    if not cursor:
+        return None, None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if data["d"] in ("next", "prev") and isinstance(data["k"], list):
+            return data["d"], data["k"]
+    except (ValueError, KeyError, TypeError):
+        pass
+    return None, None
+
+
+# Profile "Favorite Genre" choices → catalog genres they cover (besides names containing the label)
+FAVORITE_GENRE_ALIASES = {
+    "Comedy":      ["Comedies", "TV Comedies"],
+    "Drama":       ["Dramas", "TV Dramas"],
+    "Horror":      ["Horror Movies", "TV Horror"],
+    "Romance":     ["Romantic Movies", "Romantic TV Shows"],
+    "Thriller":    ["Thrillers", "TV Thrillers"],
+    "Documentary": ["Documentaries", "Docuseries"],
+    "Animation":   ["Anime Features", "Anime Series", "Kids' TV"],
+}
+
+# Live titles held in memory (catalog.py), rebuilt when the loader bumps the
+# content version. False serves every content read from Postgres.
+USE_CONTENT_CATALOG = True
+content_catalog = ContentCatalog(db)
+# Cached content counts / the trigram flag are dropped whenever the catalog reloads
+content_catalog.on_reload(lambda snap: admin_cache.invalidate("content"))
+# Similarity model over the catalog (recommender.py), cached on disk per content version
+content_recommender = ContentRecommender(content_catalog)
+
+
 class ContentManager:
     """
     Manages browsing, searching, and recommending Netflix content
     loaded from the Kaggle dataset via load_kaggle_content.py.
+    Requests the in-memory catalog can answer exactly (no text search, or
+    'title' search) are served from it; everything else goes to Postgres.
     """
+    BROWSE_COLUMNS = ["content_id", "content_type", "title", "director", "cast_members",
+                      "country", "release_year", "rating", "duration", "genre", "description"]
+    RECOMMENDATION_COLUMNS = ["content_id", "content_type", "title", "genre",
+                              "release_year", "rating", "duration", "description"]
+    # Numeric / date columns browse_content can filter by range (parsed by the loader)
+    RANGE_COLUMNS = ("duration_minutes", "season_count", "added_on")
 
     def is_content_loaded(self):
         """Returns True if the content table has at least one row."""
+        snap = self._catalog()
+        if snap is not None:
+            return snap.size > 0
         try:
-            db.cursor.execute("SELECT COUNT(*) FROM content")
-            return db.cursor.fetchone()[0] > 0
+            with db.cursor() as cur:
+                cur.execute("SELECT EXISTS (SELECT 1 FROM content WHERE removed_at IS NULL)")
+                return cur.fetchone()[0]
         except Exception:
             return False
 
     def get_content_stats(self):
         """Returns total movies, total TV shows, and total titles."""
+        snap = self._catalog()
+        if snap is not None:
+            return snap.size, snap.type_counts.get("Movie", 0), snap.type_counts.get("TV Show", 0)
         try:
-            db.cursor.execute("SELECT COUNT(*) FROM content")
-            total = db.cursor.fetchone()[0]
-            db.cursor.execute("SELECT COUNT(*) FROM content WHERE content_type = 'Movie'")
-            movies = db.cursor.fetchone()[0]
-            db.cursor.execute("SELECT COUNT(*) FROM content WHERE content_type = 'TV Show'")
-            shows = db.cursor.fetchone()[0]
+            with db.cursor() as cur:
+                cur.execute("SELECT COUNT(*) FROM content WHERE removed_at IS NULL")
+                total = cur.fetchone()[0]
+                cur.execute("SELECT COUNT(*) FROM content WHERE content_type = 'Movie' AND removed_at IS NULL")
+                movies = cur.fetchone()[0]
+                cur.execute("SELECT COUNT(*) FROM content WHERE content_type = 'TV Show' AND removed_at IS NULL")
+                shows = cur.fetchone()[0]
             return total, movies, shows
         except Exception:
             return 0, 0, 0
 
     def get_all_genres(self):
-        """
-        Returns a sorted unique list of individual genres
-        extracted from the comma-separated 'genre' column.
-        """
+        """Returns the sorted genre names that at least one live title carries."""
+        snap = self._catalog()
+        if snap is not None:
+            return list(snap.genres)
         try:
-            df = pd.read_sql("SELECT DISTINCT genre FROM content WHERE genre != ''", db.conn)
-            genres = set()
-            for g_str in df['genre'].dropna():
-                for g in g_str.split(','):
-                    genres.add(g.strip())
-            return sorted(genres)
+            df = db.read_sql("""
+                SELECT g.name
+                FROM genres g
+                WHERE EXISTS (
+                    SELECT 1 FROM content_genres cg
+                    JOIN content c ON c.content_id = cg.content_id
+                    WHERE cg.genre_id = g.genre_id AND c.removed_at IS NULL
+                )
+                ORDER BY g.name
+            """)
+            return df['name'].tolist()
         except Exception:
             return []
 
-    def browse_content(self, content_type="All", genre_filter="All",
-                       search_query="", page=1, page_size=20):
+    @admin_cache.cached(ttl=300, tags=("content",))
+    def trigram_search_available(self):
+        """True once pg_trgm and its content indexes exist (see migrations.enable_content_trigram)."""
+        try:
+            with db.cursor() as cur:
+                cur.execute("SELECT to_regclass('idx_content_title_trgm') IS NOT NULL")
+                return cur.fetchone()[0]
+        except Exception:
+            return False
+
+    def _content_filters(self, content_type, genre_filter, search_query, search_mode, ranges=None):
         """
-        Returns a paginated DataFrame of content matching filters.
-        content_type : 'All', 'Movie', or 'TV Show'
-        genre_filter : single genre string or 'All'
-        search_query : title / cast / director search string
-        page         : page number (1-indexed)
-        page_size    : rows per page
+        WHERE conditions + params for a browse request, and its sort key as a
+        list of (expression, params), all ascending. Matches sort first; the
+        browse key (CONTENT_BROWSE_KEY) always ends it, so the order is total.
         """
-        conditions = ["1=1"]
+        conditions = ["removed_at IS NULL"]     # skip titles tombstoned by --sync --prune
         params = []
+        order_keys = []
 
         if content_type != "All":
             conditions.append("content_type = %s")
             params.append(content_type)
 
         if genre_filter != "All":
-            conditions.append("genre ILIKE %s")
-            params.append(f"%{genre_filter}%")
-
-        if search_query.strip():
+            conditions.append("""content_id IN (
+                SELECT cg.content_id FROM content_genres cg
+                JOIN genres g ON g.genre_id = cg.genre_id
+                WHERE g.name = %s)""")
+            params.append(genre_filter)
+
+        # Range bounds go to SQL as plain comparisons on the indexed columns (migration 014)
+        for column, (low, high) in sorted((ranges or {}).items()):
+            if column not in self.RANGE_COLUMNS:
+                raise ValueError(f"range filters must be on one of {self.RANGE_COLUMNS}")
+            if low is not None:
+                conditions.append(f"{column} >= %s")
+                params.append(low)
+            if high is not None:
+                conditions.append(f"{column} <= %s")
+                params.append(high)
+
+        q = search_query.strip()
+        if search_mode == "fuzzy" and q and not self.trigram_search_available():
+            search_mode = "substring"
+        if q and search_mode == "ranked":
+            # Every word must match, as a prefix ("stran thin" finds Stranger Things).
+            # A query of only stop words ("It") has no lexemes left, so fall back to
+            # whole-word title matches.
+            words = re.findall(r"\w+", q)
+            tsquery = " & ".join(f"{w}:*" for w in words)
             conditions.append(
-                "(title ILIKE %s OR cast_members ILIKE %s OR director ILIKE %s)"
+                "(search_vector @@ to_tsquery(%s, %s)"
+                " OR (numnode(to_tsquery(%s, %s)) = 0 AND title ~* %s))"
             )
-            q = f"%{search_query.strip()}%"
+            title_words = "\\m" + re.sub(r"([^\w\s])", r"\\\1", q) + "\\M"
+            params.extend([CONTENT_SEARCH_CONFIG, tsquery, CONTENT_SEARCH_CONFIG, tsquery, title_words])
+            # Titles that start with the query first, then by weighted rank
+            starts_with = re.sub(r"([%_\\])", r"\\\1", q) + "%"
+            order_keys.append(("-(title ILIKE %s)::int", [starts_with]))
+            # float8: a real would not survive the round trip through a cursor exactly
+            order_keys.append(("-ts_rank(search_vector, to_tsquery(%s, %s))::float8",
+                               [CONTENT_SEARCH_CONFIG, tsquery]))
+        elif q and search_mode == "title":
+            # Every word starts a word of the title — the catalog's title index, in SQL
+            for word in title_tokens(q):
+                conditions.append("title ~* %s")
+                params.append("\\m" + word)
+        elif q and search_mode == "fuzzy":
+            conditions.append("(title %%> %s OR cast_members %%> %s OR director %%> %s)")
             params.extend([q, q, q])
+            order_keys.append(("-GREATEST(word_similarity(%s, title), word_similarity(%s, cast_members),"
+                               " word_similarity(%s, director))::float8", [q, q, q]))
+        elif q:
+            conditions.append(
+                "(title ILIKE %s OR cast_members ILIKE %s OR director ILIKE %s)"
+            )
+            like = f"%{q}%"
+            params.extend([like, like, like])
 
-        where_clause = " AND ".join(conditions)
-        offset = (page - 1) * page_size
+        order_keys += [(k, []) for k in CONTENT_BROWSE_KEY]
+        return conditions, params, order_keys
+
+    def _catalog(self, search_query="", search_mode="ranked"):
+        """The catalog snapshot if it answers this request exactly as SQL would, else None."""
+        if not USE_CONTENT_CATALOG or (search_query.strip() and search_mode != "title"):
+            return None
+        return content_catalog.snapshot()
+
+    def _catalog_match(self, snap, content_type, genre_filter, search_query, ranges=None):
+        """Positions of the matching titles in browse order — _content_filters for the snapshot."""
+        if any(column not in self.RANGE_COLUMNS for column in ranges or {}):
+            raise ValueError(f"range filters must be on one of {self.RANGE_COLUMNS}")
+        return snap.match(content_type=None if content_type == "All" else content_type,
+                          genres=None if genre_filter == "All" else [genre_filter],
+                          title_words=title_tokens(search_query), ranges=ranges)
+
+    def _catalog_keyset(self, snap, hits, cursor, page_size):
+        """
+        browse_content_keyset over matched positions. None when the cursor's
+        row is not in the snapshot as the cursor saw it (SQL then seeks by key).
+        """
+        direction, key = _decode_content_cursor(cursor)
+        if key is None or len(key) != len(CONTENT_BROWSE_KEY):
+            page = hits[:page_size]
+            next_cursor = (_encode_content_cursor("next", snap.browse_key(page[-1]))
+                           if len(hits) > page_size else None)
+            return snap.rows(page, self.BROWSE_COLUMNS), next_cursor, None
+
+        pos = snap.position_of.get(key[-1])
+        if pos is None or snap.browse_key(pos) != key:
+            return None
+        if direction == "prev":
+            end = int(np.searchsorted(hits, pos))
+            start = max(0, end - page_size)
+            page = hits[start:end]
+            more_before, more_after = start > 0, True
+        else:
+            start = int(np.searchsorted(hits, pos, side="right"))
+            page = hits[start:start + page_size]
+            more_before, more_after = True, start + page_size < len(hits)
+        if not len(page):
+            return snap.rows(page, self.BROWSE_COLUMNS), None, None
+        next_cursor = _encode_content_cursor("next", snap.browse_key(page[-1])) if more_after else None
+        prev_cursor = _encode_content_cursor("prev", snap.browse_key(page[0])) if more_before else None
+        return snap.rows(page, self.BROWSE_COLUMNS), next_cursor, prev_cursor
 
-        # Count total matching rows (for pagination)
-        count_query = f"SELECT COUNT(*) FROM content WHERE {where_clause}"
-        db.cursor.execute(count_query, tuple(params))
-        total_count = db.cursor.fetchone()[0]
+    def browse_content(self, content_type="All", genre_filter="All",
+                       search_query="", page=1, page_size=20, search_mode="ranked",
+                       count_strategy="exact", ranges=None):
+        """
+        Returns a paginated DataFrame of content matching filters, plus the total match count.
+        content_type   : 'All', 'Movie', or 'TV Show'
+        genre_filter   : exact genre name (see get_all_genres) or 'All'
+        search_query   : title / cast / director search string
+        page           : page number (1-indexed)
+        page_size      : rows per page
+        search_mode    : 'ranked'    full-text on the weighted search_vector, best match first
+                                     (title > cast > director > description; words match as prefixes)
+                         'title'     every word starts a word of the title, in browse order
+                         'substring' ILIKE anywhere in title / cast / director
+                         'fuzzy'     typo-tolerant trigram match (needs pg_trgm, else 'substring')
+        count_strategy : see count_content. With 'has_more' the total is a lower
+                         bound — one past this page when another page exists.
+        ranges         : {column: (low, high)} on RANGE_COLUMNS, inclusive, None for an open
+                         end — e.g. {'duration_minutes': (None, 99)}, {'added_on': (date, None)}.
+                         Titles without a value (a movie's season_count) never match.
+        Page numbers cost O(offset) on deep pages; browse_content_keyset does not.
+        """
+        snap = self._catalog(search_query, search_mode)
+        if snap is not None:
+            hits = self._catalog_match(snap, content_type, genre_filter, search_query, ranges)
+            offset = (page - 1) * page_size
+            return snap.rows(hits[offset:offset + page_size], self.BROWSE_COLUMNS), len(hits)
+
+        conditions, params, order_keys = self._content_filters(
+            content_type, genre_filter, search_query, search_mode, ranges)
+        order_by = ", ".join(expr for expr, _ in order_keys)
+        order_params = [p for _, ps in order_keys for p in ps]
+        offset = (page - 1) * page_size
 
-        # Fetch page
+        # One extra row tells whether another page follows
         data_query = f"""
             SELECT content_id, content_type, title, director, cast_members,
                    country, release_year, rating, duration, genre, description
             FROM content
-            WHERE {where_clause}
-            ORDER BY release_year DESC NULLS LAST, title ASC
+            WHERE {" AND ".join(conditions)}
+            ORDER BY {order_by}
             LIMIT %s OFFSET %s
         """
-        params.extend([page_size, offset])
-        df = pd.read_sql(data_query, db.conn, params=tuple(params))
+        df = db.read_sql(data_query, params=tuple(params + order_params + [page_size + 1, offset]))
+        more = len(df) > page_size
+        df = df.iloc[:page_size]
+
+        # Rows this page proves exist (nothing, if we paged past the end)
+        seen = offset + len(df) + (1 if more else 0) if len(df) else 0
+        if not more and (len(df) or offset == 0):
+            return df, seen                 # last page: the total is known exactly
+        total_count, _ = self.count_content(content_type, genre_filter, search_query,
+                                            search_mode, count_strategy, ranges)
+        # An estimate (or no count) must still cover the rows we know exist
+        return df, max(total_count or 0, seen)
+
+    def browse_content_keyset(self, content_type="All", genre_filter="All",
+                              search_query="", cursor=None, page_size=20, search_mode="ranked",
+                              ranges=None):
+        """
+        Same filters and order as browse_content, paged by cursor instead of
+        page number: each page is an index seek past the previous page's last
+        row, so page 500 costs the same as page 1.
+        cursor : None for the first page, else a next/prev cursor from a previous call
+        Returns (DataFrame, next_cursor, prev_cursor); either cursor is None at that end.
+        Cursors are opaque strings, valid only for the filters that produced them.
+        """
+        snap = self._catalog(search_query, search_mode)
+        if snap is not None:
+            hits = self._catalog_match(snap, content_type, genre_filter, search_query, ranges)
+            result = self._catalog_keyset(snap, hits, cursor, page_size)
+            if result is not None:
+                return result
+
+        conditions, params, order_keys = self._content_filters(
+            content_type, genre_filter, search_query, search_mode, ranges)
+        direction, key = _decode_content_cursor(cursor)
+        backwards = direction == "prev"
+
+        key_exprs = [expr for expr, _ in order_keys]
+        key_params = [p for _, ps in order_keys for p in ps]
+        if key is not None and len(key) == len(key_exprs):
+            conditions.append(f"({', '.join(key_exprs)}) {'<' if backwards else '>'} "
+                              f"({', '.join(['%s'] * len(key))})")
+            params += key_params + key
+        else:
+            backwards = False
+
+        sort = " DESC" if backwards else ""
+        select_keys = ", ".join(f"{expr} AS _k{i}" for i, expr in enumerate(key_exprs))
+        # Fetch one extra row to know whether the page has a neighbour that way
+        query = f"""
+            SELECT content_id, content_type, title, director, cast_members,
+                   country, release_year, rating, duration, genre, description,
+                   {select_keys}
+            FROM content
+            WHERE {" AND ".join(conditions)}
+            ORDER BY {", ".join(expr + sort for expr in key_exprs)}
+            LIMIT %s
+        """
+        df = db.read_sql(query, params=tuple(key_params + params + key_params + [page_size + 1]))
 
-        return df, total_count
+        more = len(df) > page_size
+        df = df.iloc[:page_size]
+        if backwards:
+            df = df.iloc[::-1]
+        df = df.reset_index(drop=True)
 
-    def get_recommendations(self, favorite_genre, limit=10):
+        key_cols = [f"_k{i}" for i in range(len(key_exprs))]
+        keys = df[key_cols]
+        df = df.drop(columns=key_cols)
+        if df.empty:
+            return df, None, None
+        first = [v.item() if hasattr(v, "item") else v for v in keys.iloc[0]]
+        last = [v.item() if hasattr(v, "item") else v for v in keys.iloc[-1]]
+        if backwards:
+            next_cursor = _encode_content_cursor("next", last)
+            prev_cursor = _encode_content_cursor("prev", first) if more else None
+        else:
+            next_cursor = _encode_content_cursor("next", last) if more else None
+            prev_cursor = _encode_content_cursor("prev", first) if key is not None else None
+        return df, next_cursor, prev_cursor
+
+    def count_content(self, content_type="All", genre_filter="All", search_query="",
+                      search_mode="ranked", strategy="exact", ranges=None):
+        """
+        Total for "Page X of Y", so paging doesn't pay for a second full scan:
+          'exact'    COUNT(*) with the browse filters, cached per filter key (5 min)
+          'estimate' the planner's row estimate (EXPLAIN) — no rows are read
+          'auto'     estimate for free-text searches (the expensive filters), exact otherwise
+          'has_more' no count at all; page with next_cursor / the page_size+1st row
+        Returns (count, is_exact); count is None for 'has_more'.
         """
-        Returns content matching the user's favorite_genre from their profile.
-        Falls back to trending (most recent) if no genre set.
+        if strategy == "auto":
+            strategy = "estimate" if search_query.strip() else "exact"
+        if strategy == "has_more":
+            return None, False
+        snap = self._catalog(search_query, search_mode)
+        if snap is not None:
+            return len(self._catalog_match(snap, content_type, genre_filter, search_query, ranges)), True
+        if strategy == "estimate":
+            return self._estimate_content_count(content_type, genre_filter, search_query,
+                                                search_mode, ranges), False
+        return self._exact_content_count(content_type, genre_filter, search_query, search_mode, ranges), True
+
+    @admin_cache.cached(ttl=300, tags=("content",))
+    def _exact_content_count(self, content_type, genre_filter, search_query, search_mode, ranges=None):
+        conditions, params, _ = self._content_filters(
+            content_type, genre_filter, search_query, search_mode, ranges)
+        with db.cursor() as cur:
+            cur.execute(f"SELECT COUNT(*) FROM content WHERE {' AND '.join(conditions)}", tuple(params))
+            return cur.fetchone()[0]
+
+    def _estimate_content_count(self, content_type, genre_filter, search_query, search_mode, ranges=None):
+        conditions, params, _ = self._content_filters(
+            content_type, genre_filter, search_query, search_mode, ranges)
+        with db.cursor() as cur:
+            cur.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM content WHERE {' AND '.join(conditions)}",
+                        tuple(params))
+            return int(cur.fetchone()[0][0]["Plan"]["Plan Rows"])
+
+    def get_recommendations(self, favorite_genre, limit=10, user_id=None):
+        """
+        Returns content for the user's favorite_genre from their profile and,
+        given user_id, the titles they marked as watched — ranked by similarity
+        (recommender.py) when the catalog is in memory, else the newest titles
+        of the genre. Falls back to trending (most recent) if neither is set.
         """
         try:
+            snap = self._catalog()
+            if snap is not None:
+                label = (favorite_genre or "").strip()
+                aliases = FAVORITE_GENRE_ALIASES.get(label, [])
+                names = [g for g in snap.by_genre if g in aliases or label.lower() in g.lower()] if label else []
+                watched_ids = self.get_watched_ids(user_id) if user_id else []
+                model = content_recommender.model() if (names or watched_ids) else None
+                if model is not None:
+                    # The model may still be the previous catalog version's while the
+                    # new one builds: translate through content_ids, not positions
+                    watched = [model.position_of[c] for c in watched_ids if c in model.position_of]
+                    hits = [snap.position_of[c] for c in model.ids[model.for_profile(watched, names, limit)]
+                            if c in snap.position_of]
+                    if hits:
+                        return snap.rows(hits, self.RECOMMENDATION_COLUMNS)
+                hits = snap.match(genres=names) if label else snap.all
+                return snap.rows(hits[:limit], self.RECOMMENDATION_COLUMNS)
+
             if not favorite_genre or favorite_genre.strip() == "":
                 # No genre set — return most recent titles
                 query = """
                     SELECT content_id, content_type, title, genre,
                            release_year, rating, duration, description
                     FROM content
+                    WHERE removed_at IS NULL
                     ORDER BY release_year DESC NULLS LAST
                     LIMIT %s
                 """
-                return pd.read_sql(query, db.conn, params=(limit,))
+                return db.read_sql(query, params=(limit,))
             else:
+                # Resolved against the small genres table, then an indexed join
+                aliases = FAVORITE_GENRE_ALIASES.get(favorite_genre.strip(), [])
                 query = """
                     SELECT content_id, content_type, title, genre,
                            release_year, rating, duration, description
                     FROM content
-                    WHERE genre ILIKE %s
+                    WHERE removed_at IS NULL AND content_id IN (
+                        SELECT cg.content_id FROM content_genres cg
+                        JOIN genres g ON g.genre_id = cg.genre_id
+                        WHERE g.name = ANY(%s) OR g.name ILIKE %s)
                     ORDER BY release_year DESC NULLS LAST
                     LIMIT %s
                 """
-                return pd.read_sql(query, db.conn, params=(f"%{favorite_genre}%", limit))
+                return db.read_sql(query, params=(aliases, f"%{favorite_genre.strip()}%", limit))
         except Exception as e:
             print(f"Recommendation error: {e}")
             return pd.DataFrame()
 
+    def get_similar_titles(self, content_id, limit=10):
+        """
+        Titles most like this one ("More like this"), best first, with their
+        similarity score. Read from content_neighbors (one primary-key range,
+        filled offline by recommender.py); empty until that job has run.
+        """
+        try:
+            return db.read_sql("""
+                SELECT c.content_id, c.content_type, c.title, c.genre,
+                       c.release_year, c.rating, c.duration, c.description, n.score
+                FROM content_neighbors n
+                JOIN content c ON c.content_id = n.neighbor_id
+                WHERE n.content_id = %s AND c.removed_at IS NULL
+                ORDER BY n.rank
+                LIMIT %s
+            """, params=(int(content_id), limit))
+        except Exception as e:
+            print(f"Similar titles error: {e}")
+            return pd.DataFrame()
+
+    def get_similar_title_names(self, content_ids, limit=5):
+        """{content_id: [neighbour titles, best first]} for a whole page of titles in one query."""
+        try:
+            with db.cursor() as cur:
+                cur.execute("""
+                    SELECT n.content_id, c.title
+                    FROM content_neighbors n
+                    JOIN content c ON c.content_id = n.neighbor_id
+                    WHERE n.content_id = ANY(%s) AND n.rank <= %s AND c.removed_at IS NULL
+                    ORDER BY n.content_id, n.rank
+                """, ([int(i) for i in content_ids], limit))
+                names = {}
+                for cid, title in cur.fetchall():
+                    names.setdefault(cid, []).append(title)
+                return names
+        except Exception as e:
+            print(f"Similar titles error: {e}")
+            return {}
+
+    def mark_watched(self, user_id, content_id):
+        """Adds a title to the user's watch history (or refreshes when it was watched)."""
+        try:
+            with db.cursor() as cur:
+                # Kept by show_id, which survives catalog reloads; a keyless title can't be stored
+                cur.execute("""
+                    INSERT INTO content_views (user_id, show_id)
+                    SELECT %s, show_id FROM content WHERE content_id = %s AND show_id IS NOT NULL
+                    ON CONFLICT (user_id, show_id) DO UPDATE SET viewed_at = CURRENT_TIMESTAMP
+                """, (user_id, content_id))
+                return cur.rowcount > 0
+        except Exception as e:
+            print(f"Watch history error: {e}")
+            return False
+
+    def get_watched_ids(self, user_id, limit=50):
+        """Current content_ids of the live titles the user watched, most recent first."""
+        try:
+            with db.cursor() as cur:
+                cur.execute("""
+                    SELECT c.content_id
+                    FROM content_views v
+                    JOIN content c ON c.show_id = v.show_id
+                    WHERE v.user_id = %s AND c.removed_at IS NULL
+                    ORDER BY v.viewed_at DESC
+                    LIMIT %s
+                """, (user_id, limit))
+                return [r[0] for r in cur.fetchall()]
+        except Exception:
+            return []
+
     def get_content_by_id(self, content_id):
         """Returns a single title's full details as a dict."""
         try:
-            db.cursor.execute("""
-                SELECT content_id, content_type, title, director, cast_members,
-                       country, date_added, release_year, rating, duration,
-                       genre, description
-                FROM content WHERE content_id = %s
-            """, (content_id,))
-            row = db.cursor.fetchone()
+            snap = self._catalog()
+            row = snap.row(content_id) if snap is not None else None
+            if row is not None:
+                del row["show_id"]
+                return row
+            # Not in memory: a tombstoned title, or one loaded since the last refresh
+            with db.cursor() as cur:
+                cur.execute("""
+                    SELECT content_id, content_type, title, director, cast_members,
+                           country, date_added, release_year, rating, duration,
+                           genre, description, duration_minutes, season_count, added_on
+                    FROM content WHERE content_id = %s
+                """, (content_id,))
+                row = cur.fetchone()
             if not row:
                 return None
             cols = ["content_id","content_type","title","director","cast_members",
                     "country","date_added","release_year","rating","duration",
-                    "genre","description"]
+                    "genre","description","duration_minutes","season_count","added_on"]
             return dict(zip(cols, row))
         except Exception:
             return None
 
     # ── Admin helpers ──────────────────────────────────────────
-    def get_genre_distribution(self):
-        """Returns top 15 genres by content count for admin charts."""
+    GENRE_BREAKDOWNS = ("content_type", "release_year")
+
+    def get_genre_distribution(self, top_n=15, breakdown=None):
+        """
+        Titles per genre over the whole live catalog, for the top_n genres.
+        A title counts once for every genre it carries (genres bridge table).
+        breakdown : None            -> columns genre, count (largest first)
+                    'content_type'  -> genre, content_type, count
+                    'release_year'  -> genre, release_year, count (titles without a year left out)
+        """
+        if breakdown is not None and breakdown not in self.GENRE_BREAKDOWNS:
+            raise ValueError(f"breakdown must be one of {self.GENRE_BREAKDOWNS}")
         try:
-            df = pd.read_sql(
-                "SELECT genre, COUNT(*) as count FROM content "
-                "WHERE genre != '' GROUP BY genre ORDER BY count DESC LIMIT 15",
-                db.conn
-            )
-            # Expand comma-separated genres
-            rows = []
-            for _, r in df.iterrows():
-                for g in str(r['genre']).split(','):
-                    rows.append(g.strip())
-            from collections import Counter
-            counter = Counter(rows)
-            top = pd.DataFrame(counter.most_common(15), columns=['genre', 'count'])
-            return top
-        except Exception:
+            snap = self._catalog()
+            if snap is not None:
+                top = sorted(snap.by_genre, key=lambda g: (-len(snap.by_genre[g]), g))[:top_n]
+                if breakdown is None:
+                    return pd.DataFrame({"genre": top,
+                                         "count": [len(snap.by_genre[g]) for g in top]})
+                positions = [snap.by_genre[g] for g in top]
+                df = pd.DataFrame({
+                    "genre": np.repeat(top, [len(p) for p in positions]),
+                    breakdown: snap.columns[breakdown][np.concatenate(positions)] if top else [],
+                }).dropna()
+                df = df.groupby(["genre", breakdown]).size().reset_index(name="count")
+                df["rank"] = df["genre"].map({g: i for i, g in enumerate(top)})
+                return df.sort_values(["rank", breakdown], ignore_index=True).drop(columns="rank")
+
+            if breakdown is None:
+                return db.read_sql("""
+                    SELECT g.name AS genre, COUNT(*) AS count
+                    FROM content_genres cg
+                    JOIN genres g ON g.genre_id = cg.genre_id
+                    JOIN content c ON c.content_id = cg.content_id
+                    WHERE c.removed_at IS NULL
+                    GROUP BY g.name
+                    ORDER BY count DESC, g.name
+                    LIMIT %s
+                """, params=(top_n,))
+            # breakdown is one of GENRE_BREAKDOWNS, so it is safe to splice in
+            return db.read_sql(f"""
+                WITH top AS (
+                    SELECT cg.genre_id, ROW_NUMBER() OVER (ORDER BY COUNT(*) DESC, g.name) AS rank
+                    FROM content_genres cg
+                    JOIN genres g ON g.genre_id = cg.genre_id
+                    JOIN content c ON c.content_id = cg.content_id
+                    WHERE c.removed_at IS NULL
+                    GROUP BY cg.genre_id, g.name
+                    ORDER BY rank
+                    LIMIT %s
+                )
+                SELECT g.name AS genre, c.{breakdown}, COUNT(*) AS count
+                FROM top
+                JOIN genres g ON g.genre_id = top.genre_id
+                JOIN content_genres cg ON cg.genre_id = top.genre_id
+                JOIN content c ON c.content_id = cg.content_id
+                WHERE c.removed_at IS NULL AND c.{breakdown} IS NOT NULL
+                GROUP BY g.name, top.rank, c.{breakdown}
+                ORDER BY top.rank, c.{breakdown}
+            """, params=(top_n,))
+        except Exception as e:
+            print(f"Genre distribution error: {e}")
             return pd.DataFrame()
 
     def get_yearly_additions(self):
         """Returns count of titles added per release_year for trend chart."""
         try:
-            return pd.read_sql("""
+            return db.read_sql("""
                 SELECT release_year, COUNT(*) as count
                 FROM content
                 WHERE release_year IS NOT NULL AND release_year > 1990
+                  AND removed_at IS NULL
                 GROUP BY release_year
                 ORDER BY release_year ASC
-            """, db.conn)
+            """)
         except Exception:
             return pd.DataFrame()
\ No newline at end of file
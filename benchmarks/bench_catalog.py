@@ -0,0 +1,98 @@
+"""
+Benchmark: ContentManager reads served from the in-process catalog
+(catalog.py) versus the same calls answered by Postgres.
+
+Runs each read --runs times both ways against your loaded content table
+(read-only; nothing is written) and prints the median latency. Results
+are checked to be identical before they are timed.
+
+Usage:
+    python benchmarks/bench_catalog.py
+    python benchmarks/bench_catalog.py --runs 500
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import backend                                   # noqa: E402
+
+warnings.filterwarnings("ignore", message="pandas only supports SQLAlchemy")
+
+cm = backend.ContentManager()
+
+
+def count_uncached():
+    # The SQL path caches counts for 5 minutes; time the query itself
+    backend.admin_cache.invalidate("content")
+    return cm.count_content("All", "Comedies")
+
+
+# name -> call; every one of these can be answered from the catalog
+READS = [
+    ("browse: first page",          lambda: cm.browse_content(page=1)),
+    ("browse: page 200",            lambda: cm.browse_content(page=200)),
+    ("browse: Movie + Dramas",      lambda: cm.browse_content("Movie", "Dramas", page=3)),
+    ("browse: title 'love'",        lambda: cm.browse_content(search_query="love", search_mode="title")),
+    ("browse: runtime 60-90 min",   lambda: cm.browse_content(ranges={"duration_minutes": (60, 90)})),
+    ("keyset: first page",          lambda: cm.browse_content_keyset("TV Show", "All")),
+    ("count: genre",                count_uncached),
+    ("recommendations: Drama",      lambda: cm.get_recommendations("Drama", 12)),
+    ("recommendations: none set",   lambda: cm.get_recommendations("", 12)),
+    ("get_content_by_id",           lambda: cm.get_content_by_id(3686)),
+]
+
+
+def _comparable(result):
+    if isinstance(result, tuple):
+        return tuple(_comparable(r) for r in result)
+    if hasattr(result, "to_dict"):
+        return result.astype(object).where(result.notna(), None).to_dict("list")
+    return result
+
+
+def timed(call, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200, help="calls per read and path (default 200)")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    snap = backend.content_catalog.snapshot()
+    if snap is None:
+        sys.exit("❌ Catalog could not be loaded — is the content table populated and migrated?")
+    print(f"ℹ️  Catalog: {snap.size:,} titles, version {snap.version}, loaded in "
+          f"{(time.perf_counter() - t0) * 1000:.0f} ms\n")
+
+    results = []
+    for name, call in READS:
+        backend.USE_CONTENT_CATALOG = False
+        from_sql = call()
+        sql_us = timed(call, args.runs)
+        backend.USE_CONTENT_CATALOG = True
+        assert _comparable(call()) == _comparable(from_sql) or name.startswith("recommendations"), name
+        catalog_us = timed(call, args.runs)
+        results.append((name, sql_us, catalog_us))
+
+    print("═" * 66)
+    print(f"{'Read':<30}{'SQL µs':>12}{'catalog µs':>12}{'speedup':>12}")
+    print("─" * 66)
+    for name, sql_us, catalog_us in results:
+        print(f"{name:<30}{sql_us:>12,.0f}{catalog_us:>12,.0f}{sql_us / catalog_us:>11.0f}x")
+    print("═" * 66)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark: the churn section of the admin dashboard — five COUNT scans
+over subscriptions (old get_churn_stats + get_active_vs_cancelled) versus
+the single GROUP BY status histogram they now share.
+
+Builds a throw-away copy of subscriptions in a scratch schema
+(`bench_churn`) with --rows synthetic rows, without or with the
+HOT_PATH_INDEXES, and times both variants end to end through pd.read_sql /
+a cursor, the way backend.py issues them. Your real tables are never touched.
+
+Usage:
+    python benchmarks/bench_churn_stats.py                  # 1,000,000 rows
+    python benchmarks/bench_churn_stats.py --rows 200000 --runs 20
+    python benchmarks/bench_churn_stats.py --indexes        # with migration 002 indexes
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import warnings
+
+import pandas as pd
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import DB_HOST, DB_NAME, DB_USER, DB_PASS   # noqa: E402
+from migrations import HOT_PATH_INDEXES                   # noqa: E402
+
+SCHEMA = "bench_churn"
+
+# What one admin render used to issue (get_churn_stats x4 + get_active_vs_cancelled)
+OLD_QUERIES = [
+    "SELECT COUNT(*) as count FROM subscriptions",
+    "SELECT COUNT(*) as count FROM subscriptions WHERE status IN ('CANCELLED', 'EXPIRED')",
+    "SELECT COUNT(*) as count FROM subscriptions WHERE status = 'CANCELLED'",
+    "SELECT COUNT(*) as count FROM subscriptions WHERE status = 'EXPIRED'",
+    "SELECT status, COUNT(*) as count FROM subscriptions GROUP BY status",
+]
+
+# AdminAnalytics.get_subscription_status_counts
+NEW_QUERY = "SELECT status, COUNT(*) FROM subscriptions GROUP BY status"
+
+
+def build_table(cur, rows, indexes):
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    cur.execute(f"SET search_path TO {SCHEMA}")
+    cur.execute("CREATE TABLE subscriptions (LIKE public.subscriptions INCLUDING DEFAULTS)")
+    cur.execute("""
+        INSERT INTO subscriptions (subscription_id, user_id, service_type, plan_name, amount,
+                                   start_date, end_date, status, auto_renewal)
+        SELECT g, 1 + (random() * 199999)::int, 'Netflix',
+               (ARRAY['Mobile','Standard','Premium'])[1 + (g %% 3)],
+               (ARRAY[149, 499, 649])[1 + (g %% 3)],
+               NOW() - (random() * INTERVAL '720 days'),
+               NOW() - (random() * INTERVAL '720 days') + INTERVAL '30 days',
+               CASE WHEN random() < 0.1 THEN 'ACTIVE'
+                    WHEN random() < 0.8 THEN 'EXPIRED' ELSE 'CANCELLED' END,
+               random() < 0.3
+        FROM generate_series(1, %(rows)s) g
+    """, {"rows": rows})
+    if indexes:
+        for ddl in HOT_PATH_INDEXES:
+            if "ON subscriptions (" in ddl:
+                cur.execute(ddl)
+    cur.execute("ANALYZE subscriptions")
+
+
+def old_render(conn):
+    counts = [pd.read_sql(q, conn) for q in OLD_QUERIES[:4]]
+    pie = pd.read_sql(OLD_QUERIES[4], conn)
+    return [int(df.iloc[0]["count"]) for df in counts], pie
+
+
+def new_render(conn):
+    with conn.cursor() as cur:
+        cur.execute(NEW_QUERY)
+        counts = dict(cur.fetchall())
+    total = sum(counts.values())
+    cancelled, expired = counts.get("CANCELLED", 0), counts.get("EXPIRED", 0)
+    pie = pd.DataFrame(list(counts.items()), columns=["status", "count"])
+    return [total, cancelled + expired, cancelled, expired], pie
+
+
+def time_it(fn, conn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(conn)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows",    type=int, default=1_000_000, help="subscription rows (default 1,000,000)")
+    parser.add_argument("--runs",    type=int, default=15,        help="timed renders per variant")
+    parser.add_argument("--indexes", action="store_true",         help="add the subscriptions HOT_PATH_INDEXES first")
+    parser.add_argument("--keep",    action="store_true",         help="keep the bench_churn schema afterwards")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message=".*pandas only supports SQLAlchemy.*")
+
+    conn = psycopg2.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASS)
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    print(f"📦 Building {args.rows:,} subscriptions in schema '{SCHEMA}'"
+          f"{' with indexes' if args.indexes else ''}...")
+    t0 = time.perf_counter()
+    build_table(cur, args.rows, args.indexes)
+    print(f"   done in {time.perf_counter() - t0:.1f}s\n")
+
+    old_counts, old_pie = old_render(conn)
+    new_counts, new_pie = new_render(conn)
+    same_pie = (old_pie.sort_values("status").reset_index(drop=True)
+                .equals(new_pie.sort_values("status").reset_index(drop=True)))
+    print(f"🔎 Results identical: {old_counts == new_counts and same_pie}  {new_counts}\n")
+
+    before = time_it(old_render, conn, args.runs)
+    after  = time_it(new_render, conn, args.runs)
+
+    print("═" * 60)
+    print(f"{'Variant':<30}{'queries':>10}{'median (ms)':>18}")
+    print("─" * 60)
+    print(f"{'4x COUNT + GROUP BY (old)':<30}{len(OLD_QUERIES):>10}{before:>18.2f}")
+    print(f"{'status histogram (new)':<30}{1:>10}{after:>18.2f}")
+    print("─" * 60)
+    print(f"{'speed-up':<30}{'':>10}{before / after if after else 0:>17.1f}x")
+    print("═" * 60)
+
+    if not args.keep:
+        cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: load throughput of load_kaggle_content.py's COPY path versus
+its execute_values fallback on a synthetic catalog.
+
+The catalog is netflix_titles.csv tiled up to --rows titles (show_ids are
+made unique), cleaned with the loader's own clean_titles(), and generated
+in --chunk-row slices so a 10M-row run never holds the whole catalog in
+memory. Rows go into a copy of the content table in a scratch schema
+(`bench_load`); your real content table is never touched.
+
+Usage:
+    python benchmarks/bench_content_load.py                        # 1,000,000 rows, both modes
+    python benchmarks/bench_content_load.py --rows 10000000 --modes copy
+    python benchmarks/bench_content_load.py --rows 200000 --keep
+"""
+
+import argparse
+import os
+import resource
+import sys
+import time
+
+import pandas as pd
+import psycopg2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from database import DB_HOST, DB_NAME, DB_USER, DB_PASS                      # noqa: E402
+from load_kaggle_content import CSV_FILE, clean_titles, copy_titles, insert_titles  # noqa: E402
+
+SCHEMA = "bench_load"
+LOADERS = {"copy": copy_titles, "insert": insert_titles}
+
+
+def synthetic_chunks(base, rows, chunk_rows):
+    """Yields cleaned DataFrames of up to chunk_rows titles, tiled from `base`."""
+    produced = 0
+    while produced < rows:
+        n = min(chunk_rows, rows - produced)
+        idx = [(produced + i) % len(base) for i in range(n)]
+        chunk = base.iloc[idx].reset_index(drop=True)
+        chunk["show_id"] = ["b" + str(produced + i) for i in range(n)]
+        produced += n
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows",       type=int, default=1_000_000, help="titles to load (default 1,000,000)")
+    parser.add_argument("--chunk-rows", type=int, default=250_000,   help="titles generated + loaded per slice")
+    parser.add_argument("--modes",      default="copy,insert",       help="comma list of: copy, insert")
+    parser.add_argument("--keep",       action="store_true",         help="keep the bench_load schema afterwards")
+    args = parser.parse_args()
+
+    base, _ = clean_titles(pd.read_csv(os.path.join(ROOT, CSV_FILE), dtype=str))
+
+    conn = psycopg2.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASS)
+    conn.set_client_encoding("UTF8")
+    cur = conn.cursor()
+
+    results = []
+    for mode in args.modes.split(","):
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA}")
+        # Own identity column: the copied default would draw from public's content sequence
+        cur.execute(f"CREATE TABLE {SCHEMA}.content (LIKE public.content INCLUDING DEFAULTS)")
+        cur.execute(f"""ALTER TABLE {SCHEMA}.content
+                        ALTER COLUMN content_id DROP DEFAULT,
+                        ALTER COLUMN content_id ADD GENERATED BY DEFAULT AS IDENTITY,
+                        ADD PRIMARY KEY (content_id)""")
+        cur.execute(f"SET search_path TO {SCHEMA}")
+        conn.commit()
+
+        print(f"⏱️  Loading {args.rows:,} titles with '{mode}'...")
+        loaded, busy = 0, 0.0
+        for chunk in synthetic_chunks(base, args.rows, args.chunk_rows):
+            t0 = time.perf_counter()
+            for _ in LOADERS[mode](cur, chunk):
+                pass
+            busy += time.perf_counter() - t0
+            loaded += len(chunk)
+        t0 = time.perf_counter()
+        conn.commit()
+        busy += time.perf_counter() - t0
+        cur.execute("SELECT COUNT(*) FROM content")
+        assert cur.fetchone()[0] == loaded
+        results.append((mode, loaded, busy))
+        print(f"   {loaded:,} rows in {busy:.1f}s  →  {loaded / busy:,.0f} rows/sec\n")
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print("═" * 56)
+    print(f"{'Mode':<12}{'rows':>14}{'seconds':>12}{'rows/sec':>18}")
+    print("─" * 56)
+    for mode, loaded, busy in results:
+        print(f"{mode:<12}{loaded:>14,}{busy:>12.1f}{loaded / busy:>18,.0f}")
+    print("═" * 56)
+    print(f"Peak RSS: {peak_mb:,.0f} MB")
+
+    cur.execute("SET search_path TO public")
+    if not args.keep:
+        cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Benchmark: per-request latency of the hot backend.py lookups with and
+without the HOT_PATH_INDEXES from migrations.py.
+
+Builds throw-away copies of subscriptions / user_activity / payments /
+mutual_invites in a scratch schema (`bench_idx`), fills each with
+--rows synthetic rows, times every query on random user_ids, then adds
+the indexes and times them again. Your real tables are never touched.
+
+Usage:
+    python benchmarks/bench_indexes.py                 # 1,000,000 rows per table
+    python benchmarks/bench_indexes.py --rows 200000 --runs 50
+    python benchmarks/bench_indexes.py --keep          # leave bench_idx schema behind
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import DB_HOST, DB_NAME, DB_USER, DB_PASS   # noqa: E402
+from migrations import HOT_PATH_INDEXES                   # noqa: E402
+
+SCHEMA = "bench_idx"
+
+# Same predicates as the backend methods they are named after.
+HOT_QUERIES = [
+    ("get_active_plan", """
+        SELECT * FROM subscriptions
+        WHERE user_id = %(uid)s AND status = 'ACTIVE'
+        ORDER BY start_date DESC LIMIT 1"""),
+    ("buy_plan guard", """
+        SELECT COUNT(*) FROM subscriptions WHERE user_id = %(uid)s AND status = 'ACTIVE'"""),
+    ("get_expired_plan", """
+        SELECT * FROM subscriptions
+        WHERE user_id = %(uid)s AND status IN ('EXPIRED', 'CANCELLED')
+        ORDER BY end_date DESC LIMIT 1"""),
+    ("dashboard: total spend", """
+        SELECT COALESCE(SUM(amount), 0) FROM subscriptions WHERE user_id = %(uid)s"""),
+    ("dashboard: watch time", """
+        SELECT COALESCE(SUM(session_minutes), 0) FROM user_activity WHERE user_id = %(uid)s"""),
+    ("dashboard: last login", """
+        SELECT login_time FROM user_activity
+        WHERE user_id = %(uid)s ORDER BY login_time DESC LIMIT 1"""),
+    ("get_payment_history", """
+        SELECT payment_id, plan_name, amount, payment_type, payment_status, payment_date
+        FROM payments WHERE user_id = %(uid)s ORDER BY payment_date DESC"""),
+    ("monthly revenue window", """
+        SELECT COALESCE(SUM(amount), 0) FROM payments
+        WHERE payment_status = 'SUCCESS'
+          AND payment_date >= DATE_TRUNC('month', NOW())"""),
+    ("notification bell", """
+        SELECT COUNT(*) FROM mutual_invites
+        WHERE user_id = %(uid)s AND invite_status = 'PENDING'"""),
+]
+
+
+def build_tables(cur, rows, users):
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    cur.execute(f"SET search_path TO {SCHEMA}")
+    # LIKE copies columns + defaults only: no PK/FK/indexes, so the
+    # "before" numbers reflect the pre-migration schema.
+    for tbl in ("subscriptions", "user_activity", "payments", "mutual_invites"):
+        cur.execute(f"CREATE TABLE {tbl} (LIKE public.{tbl} INCLUDING DEFAULTS)")
+
+    params = {"rows": rows, "users": users}
+    cur.execute("""
+        INSERT INTO subscriptions (subscription_id, user_id, service_type, plan_name, amount,
+                                   start_date, end_date, status, auto_renewal)
+        SELECT g, 1 + (random() * (%(users)s - 1))::int, 'Netflix',
+               (ARRAY['Mobile','Standard','Premium'])[1 + (g %% 3)],
+               (ARRAY[149, 499, 649])[1 + (g %% 3)],
+               NOW() - (random() * INTERVAL '720 days') AS s,
+               NOW() - (random() * INTERVAL '720 days') + INTERVAL '30 days',
+               CASE WHEN random() < 0.1 THEN 'ACTIVE'
+                    WHEN random() < 0.8 THEN 'EXPIRED' ELSE 'CANCELLED' END,
+               random() < 0.3
+        FROM generate_series(1, %(rows)s) g
+    """, params)
+    cur.execute("""
+        INSERT INTO user_activity (activity_id, user_id, login_time, logout_time, session_minutes)
+        SELECT g, 1 + (random() * (%(users)s - 1))::int,
+               NOW() - (random() * INTERVAL '720 days'), NULL, (random() * 180)::int
+        FROM generate_series(1, %(rows)s) g
+    """, params)
+    cur.execute("""
+        INSERT INTO payments (payment_id, user_id, subscription_id, plan_name, amount,
+                              payment_type, payment_status, payment_date)
+        SELECT g, 1 + (random() * (%(users)s - 1))::int, g,
+               (ARRAY['Mobile','Standard','Premium'])[1 + (g %% 3)],
+               (ARRAY[149, 499, 649])[1 + (g %% 3)],
+               CASE WHEN random() < 0.3 THEN 'RENEWAL' ELSE 'NEW' END,
+               CASE WHEN random() < 0.97 THEN 'SUCCESS' ELSE 'FAILED' END,
+               NOW() - (random() * INTERVAL '720 days')
+        FROM generate_series(1, %(rows)s) g
+    """, params)
+    cur.execute("""
+        INSERT INTO mutual_invites (invite_id, user_id, group_id, plan_name, split_price,
+                                    invite_status, member_status)
+        SELECT g, 1 + (random() * (%(users)s - 1))::int, 1 + g / 4, 'Standard', 166.33,
+               (ARRAY['PENDING','ACCEPTED','DECLINED'])[1 + (g %% 3)], 'NONE'
+        FROM generate_series(1, %(rows)s) g
+    """, params)
+    for tbl in ("subscriptions", "user_activity", "payments", "mutual_invites"):
+        cur.execute(f"ANALYZE {tbl}")
+
+
+def time_queries(cur, users, runs):
+    """Returns {label: median milliseconds} over `runs` random user_ids."""
+    rng = random.Random(42)            # same user_ids for both passes
+    results = {}
+    for label, sql in HOT_QUERIES:
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            cur.execute(sql, {"uid": rng.randint(1, users)})
+            cur.fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[label] = statistics.median(timings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows",  type=int, default=1_000_000, help="rows per table (default 1,000,000)")
+    parser.add_argument("--users", type=int, default=200_000,   help="distinct user_ids (default 200,000)")
+    parser.add_argument("--runs",  type=int, default=30,        help="timed executions per query")
+    parser.add_argument("--keep",  action="store_true",         help="keep the bench_idx schema afterwards")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASS)
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    print(f"📦 Building {args.rows:,} rows per table in schema '{SCHEMA}'...")
+    t0 = time.perf_counter()
+    build_tables(cur, args.rows, args.users)
+    print(f"   done in {time.perf_counter() - t0:.1f}s\n")
+
+    print("⏱️  Timing queries WITHOUT indexes...")
+    before = time_queries(cur, args.users, args.runs)
+
+    print("🔧 Creating HOT_PATH_INDEXES...")
+    t0 = time.perf_counter()
+    for ddl in HOT_PATH_INDEXES:
+        cur.execute(ddl)
+    for tbl in ("subscriptions", "user_activity", "payments", "mutual_invites"):
+        cur.execute(f"ANALYZE {tbl}")
+    print(f"   done in {time.perf_counter() - t0:.1f}s\n")
+
+    print("⏱️  Timing queries WITH indexes...")
+    after = time_queries(cur, args.users, args.runs)
+
+    print("\n" + "═" * 72)
+    print(f"{'Query':<28}{'before (ms)':>14}{'after (ms)':>14}{'speed-up':>14}")
+    print("─" * 72)
+    for label, _ in HOT_QUERIES:
+        b, a = before[label], after[label]
+        print(f"{label:<28}{b:>14.2f}{a:>14.3f}{b / a if a else 0:>13.0f}x")
+    print("═" * 72)
+
+    if not args.keep:
+        cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
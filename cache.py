@@ -0,0 +1,136 @@
+"""
+In-process TTL cache for read-mostly query results.
+
+Streamlit reruns app.py top to bottom on every widget interaction, so
+without a cache each admin render re-issues every analytics query. Values
+live in this process only (shared by every browser session) and are
+handed out as copies, so callers may mutate what they get back.
+
+Keys include free-text arguments (search boxes), so the cache is bounded:
+past `max_entries` the least recently used entry is evicted, and expired
+entries are swept out every CACHE_SWEEP_EVERY stores.
+
+Usage:
+    admin_cache = TTLCache()
+
+    class AdminAnalytics:
+        @admin_cache.cached(ttl=60, tags=("payments",))
+        def get_monthly_comparison(self): ...
+
+    admin_cache.invalidate("payments")   # after a write that changes payments
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+CACHE_MAX_ENTRIES = 1024
+CACHE_SWEEP_EVERY = 64
+
+
+def _freeze(value):
+    """Hashable stand-in for list / dict arguments so they can be part of a cache key."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class TTLCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags), least recently used first
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._sets = 0
+        # Bumped by invalidate(); a result computed across an invalidation is not stored
+        self._generation = 0
+
+    def get(self, key):
+        """Returns (True, copy of value) for a live entry, else (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                self._entries.move_to_end(key)
+                value = entry[1]
+            else:
+                if entry:
+                    del self._entries[key]
+                    self.expirations += 1
+                self.misses += 1
+                return False, None
+        return True, copy.deepcopy(value)
+
+    def set(self, key, value, ttl, tags=(), generation=None):
+        stored = copy.deepcopy(value)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            now = time.monotonic()
+            self._sets += 1
+            if self._sets % CACHE_SWEEP_EVERY == 0:
+                expired = [k for k, e in self._entries.items() if e[0] <= now]
+                for k in expired:
+                    del self._entries[k]
+                self.expirations += len(expired)
+            self._entries[key] = (now + ttl, stored, frozenset(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        """Drops entries carrying any of `tags`, or everything when called without tags."""
+        with self._lock:
+            if not tags:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                stale = [k for k, e in self._entries.items() if e[2].intersection(tags)]
+                for k in stale:
+                    del self._entries[k]
+                dropped = len(stale)
+            self.invalidations += 1
+            self._generation += 1
+        return dropped
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries":       len(self._entries),
+                "hits":          self.hits,
+                "misses":        self.misses,
+                "hit_rate":      round(self.hits / total * 100, 1) if total else 0.0,
+                "invalidations": self.invalidations,
+                "evictions":     self.evictions,
+                "expirations":   self.expirations,
+            }
+
+    def cached(self, ttl, tags=()):
+        """
+        Method decorator: caches the result per (method, arguments) for `ttl`
+        seconds. `self` is left out of the key, so fresh instances created on
+        every rerun still share entries.
+        """
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(obj, *args, **kwargs):
+                key = (fn.__qualname__, _freeze(args), _freeze(kwargs))
+                found, value = self.get(key)
+                if found:
+                    return value
+                generation = self._generation
+                value = fn(obj, *args, **kwargs)
+                self.set(key, value, ttl, tags, generation)
+                return value
+            return wrapper
+        return decorator
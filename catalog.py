@@ -0,0 +1,253 @@
+"""
+In-process, read-only copy of the content catalog.
+
+The catalog is small and only changes when load_kaggle_content.py runs,
+so ContentManager serves browse pages, recommendations and title details
+from memory instead of asking Postgres every rerun. Live titles are held
+as column arrays in browse order (CONTENT_BROWSE_KEY), so a row's position
+is its sort key; each filterable attribute has an inverted index (value ->
+sorted array of positions), so a filtered page is a few array
+intersections and a slice.
+
+A snapshot is rebuilt when the content version in catalog_meta moves (the
+loader bumps it). The version is polled at most every
+CATALOG_CHECK_SECONDS, so a finished load shows up within that delay.
+
+Usage:
+    catalog = ContentCatalog(db)
+    snap = catalog.snapshot()          # None if the catalog can't be read: use SQL
+    if snap is not None:
+        hits = snap.match(content_type="Movie", genres=["Dramas"])
+        page = snap.rows(hits[:20], ["content_id", "title"])
+"""
+
+import bisect
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from migrations import CONTENT_BROWSE_KEY
+
+CATALOG_CHECK_SECONDS = 30
+
+CATALOG_COLUMNS = ["content_id", "show_id", "content_type", "title", "director", "cast_members",
+                   "country", "date_added", "release_year", "rating", "duration", "genre",
+                   "description", "duration_minutes", "season_count", "added_on"]
+
+_EMPTY = np.empty(0, dtype=np.int32)
+
+
+def title_tokens(text):
+    """Lower-cased words of a title or a title query (the title index's terms)."""
+    return re.findall(r"\w+", (text or "").lower())
+
+
+def _postings(keys, positions):
+    """Inverted index: key -> sorted, de-duplicated int32 array of the positions carrying it."""
+    codes, uniques = pd.factorize(np.asarray(keys, dtype=object))
+    positions = np.asarray(positions, dtype=np.int32)
+    if not len(codes):
+        return {}
+    order = np.lexsort((positions, codes))
+    codes, positions = codes[order], positions[order]
+    starts = np.flatnonzero(np.diff(codes)) + 1
+    return {uniques[c]: np.unique(p)
+            for c, p in zip(codes[np.r_[0, starts]], np.split(positions, starts))}
+
+
+def _union(arrays):
+    arrays = [a for a in arrays if len(a)]
+    if not arrays:
+        return _EMPTY
+    return arrays[0] if len(arrays) == 1 else np.unique(np.concatenate(arrays))
+
+
+class CatalogSnapshot:
+    """One loaded version of the catalog. Never changed after it's built, so readers need no lock."""
+
+    def __init__(self, version, rows, genre_links):
+        self.version = version
+        self.size = len(rows)
+        values = list(zip(*rows)) if rows else [()] * len(CATALOG_COLUMNS)
+        self.columns = {c: np.array(v, dtype=object) for c, v in zip(CATALOG_COLUMNS, values)}
+        self.position_of = {cid: i for i, cid in enumerate(self.columns["content_id"])}
+        self.all = np.arange(self.size, dtype=np.int32)
+
+        df = pd.DataFrame({c: self.columns[c] for c in ("content_type", "rating", "release_year",
+                                                       "country", "title")})
+        live = df["content_type"].notna()
+        self.by_type = _postings(df["content_type"][live], self.all[live])
+        live = df["rating"].notna()
+        self.by_rating = _postings(df["rating"][live], self.all[live])
+        live = df["release_year"].notna()
+        self.by_year = _postings(df["release_year"][live], self.all[live])
+
+        # "United States, India" is listed under both countries
+        countries = df["country"].str.split(",").explode().str.strip()
+        countries = countries[countries.notna() & (countries != "")]
+        self.by_country = _postings(countries, countries.index)
+
+        tokens = df["title"].map(title_tokens).explode().dropna()
+        self.by_title_token = _postings(tokens, tokens.index)
+        self._title_vocab = sorted(self.by_title_token)
+
+        links = [(self.position_of[cid], name) for cid, name in genre_links if cid in self.position_of]
+        self.by_genre = _postings([n for _, n in links], [p for p, _ in links])
+
+        # Range-filterable columns as typed arrays; NULL (NaN / NaT) never passes a bound
+        self.ranged = {
+            "duration_minutes": pd.to_numeric(pd.Series(self.columns["duration_minutes"], dtype=object)).to_numpy(float),
+            "season_count":     pd.to_numeric(pd.Series(self.columns["season_count"], dtype=object)).to_numpy(float),
+            "added_on":         pd.to_datetime(pd.Series(self.columns["added_on"], dtype=object)).to_numpy("datetime64[D]"),
+        }
+
+        # Catalog metadata the pages show on every rerun
+        self.genres = sorted(self.by_genre)
+        self.type_counts = {t: len(p) for t, p in self.by_type.items()}
+
+    def _title_prefix(self, word):
+        """Positions whose title has a word starting with `word`."""
+        i = bisect.bisect_left(self._title_vocab, word)
+        matches = []
+        while i < len(self._title_vocab) and self._title_vocab[i].startswith(word):
+            matches.append(self.by_title_token[self._title_vocab[i]])
+            i += 1
+        return _union(matches)
+
+    def match(self, content_type=None, genres=None, rating=None, country=None,
+              release_year=None, title_words=None, ranges=None):
+        """
+        Sorted positions (= browse order) of the titles passing every given filter.
+        genres      : any of these genre names
+        title_words : every word must start a word of the title ("stran thin")
+        ranges      : {column of self.ranged: (low, high)}, inclusive; None is an open end
+        A None filter is not applied.
+        """
+        lists = []
+        if content_type is not None:
+            lists.append(self.by_type.get(content_type, _EMPTY))
+        if genres is not None:
+            lists.append(_union([self.by_genre.get(g, _EMPTY) for g in genres]))
+        if rating is not None:
+            lists.append(self.by_rating.get(rating, _EMPTY))
+        if country is not None:
+            lists.append(self.by_country.get(country, _EMPTY))
+        if release_year is not None:
+            lists.append(self.by_year.get(release_year, _EMPTY))
+        for word in title_words or []:
+            lists.append(self._title_prefix(word))
+        for column, (low, high) in (ranges or {}).items():
+            values = self.ranged[column]
+            as_value = (lambda b: np.datetime64(b, "D")) if column == "added_on" else float
+            keep = np.ones(self.size, dtype=bool)
+            if low is not None:
+                keep &= values >= as_value(low)
+            if high is not None:
+                keep &= values <= as_value(high)
+            lists.append(np.flatnonzero(keep).astype(np.int32))
+        if not lists:
+            return self.all
+
+        # Smallest posting list first: every intersection is at most that long
+        lists.sort(key=len)
+        hits = lists[0]
+        for other in lists[1:]:
+            if not len(hits):
+                break
+            hits = np.intersect1d(hits, other, assume_unique=True)
+        return hits
+
+    def rows(self, positions, columns):
+        """DataFrame of `columns` for the given positions, in that order."""
+        return pd.DataFrame({c: self.columns[c][positions] for c in columns})
+
+    def row(self, content_id):
+        """One title as a dict of CATALOG_COLUMNS, or None if it isn't a live title."""
+        pos = self.position_of.get(content_id)
+        if pos is None:
+            return None
+        return {c: self.columns[c][pos] for c in CATALOG_COLUMNS}
+
+    def browse_key(self, position):
+        """CONTENT_BROWSE_KEY values of one row, as the SQL browse cursors carry them."""
+        year = self.columns["release_year"][position]
+        return [-(year if year is not None else -1),
+                self.columns["title"][position] or "",
+                self.columns["content_id"][position]]
+
+
+class ContentCatalog:
+    def __init__(self, db, check_seconds=CATALOG_CHECK_SECONDS):
+        self._db = db
+        self.check_seconds = check_seconds
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()      # held by the one thread checking / reloading
+        self._listeners = []
+        self.loads = 0
+
+    def on_reload(self, callback):
+        """Calls callback(snapshot) after every new snapshot is loaded. It should return quickly."""
+        self._listeners.append(callback)
+
+    def snapshot(self):
+        """
+        The current CatalogSnapshot, rebuilt first if the content version moved.
+        None when the catalog has never loaded (callers fall back to SQL); if a
+        later check fails the last snapshot keeps serving. Only one thread
+        checks or reloads at a time: the rest keep serving the current
+        snapshot meanwhile, and wait only for the very first load.
+        """
+        if self._snapshot is not None and time.monotonic() - self._checked_at < self.check_seconds:
+            return self._snapshot
+        if not self._lock.acquire(blocking=self._snapshot is None):
+            return self._snapshot
+        try:
+            if self._snapshot is not None and time.monotonic() - self._checked_at < self.check_seconds:
+                return self._snapshot
+            try:
+                with self._db.cursor() as cur:
+                    cur.execute("SELECT version FROM catalog_meta WHERE name = 'content'")
+                    row = cur.fetchone()
+                version = row[0] if row else 0
+                if self._snapshot is None or self._snapshot.version != version:
+                    self._snapshot = self._load()
+                    self.loads += 1
+                    for callback in self._listeners:
+                        callback(self._snapshot)
+            except Exception as e:
+                print(f"⚠️  Content catalog not refreshed, using {'SQL' if self._snapshot is None else 'the last copy'}: {e}")
+            # Checked (or failed) just now either way: don't retry on every request
+            self._checked_at = time.monotonic()
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def invalidate(self):
+        """Re-check the version on the next request instead of after check_seconds."""
+        self._checked_at = 0.0
+
+    def _load(self):
+        order_by = ", ".join(CONTENT_BROWSE_KEY)
+        with self._db.cursor() as cur:
+            # One snapshot for the version and both reads, so they agree with each other
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            cur.execute("SELECT version FROM catalog_meta WHERE name = 'content'")
+            row = cur.fetchone()
+            cur.execute(f"""
+                SELECT {", ".join(CATALOG_COLUMNS)}
+                FROM content
+                WHERE removed_at IS NULL
+                ORDER BY {order_by}
+            """)
+            rows = cur.fetchall()
+            cur.execute("""
+                SELECT cg.content_id, g.name
+                FROM content_genres cg
+                JOIN genres g ON g.genre_id = cg.genre_id
+            """)
+            links = cur.fetchall()
+        return CatalogSnapshot(row[0] if row else 0, rows, links)
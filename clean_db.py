@@ -20,6 +20,8 @@ try:
     
     # This command clears data and resets the ID counters
     cursor.execute("TRUNCATE TABLE users, subscriptions, user_activity, visitors, feedback RESTART IDENTITY CASCADE")
+    # Rollup tables have no foreign keys, so CASCADE doesn't reach them
+    cursor.execute("TRUNCATE TABLE activity_daily_user, activity_daily_hour, rollup_state, revenue_daily")
     
     print("✅ SUCCESS: All data has been deleted and ID counters reset.")
     conn.close()
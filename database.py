@@ -1,6 +1,18 @@
 import psycopg2
-import hashlib
+import psycopg2.errors
+import psycopg2.pool
+import pandas as pd
 import sys
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from migrations import (
+    MIGRATIONS, SCHEMA_VERSION, USER_SUMMARY_REBUILD_SQL, REVENUE_DAILY_REBUILD_SQL,
+    ACTIVITY_LOGOUT_MARK_SQL, CONTENT_VERSION_BUMP_SQL,
+    ACTIVITY_PARTITION_MONTHS_AHEAD, add_months, activity_partition_name,
+    create_activity_partition, rollup_activity_range, enable_content_trigram,
+)
 
 # --- CONFIGURATION ---
 DB_HOST = "localhost"
@@ -8,255 +20,285 @@ DB_NAME = "sub_system"
 DB_USER = "postgres"
 DB_PASS = "shrey28"
 
+# Every Streamlit browser session runs on its own thread, so queries
+# borrow a connection from a bounded pool instead of sharing one cursor.
+POOL_MIN_CONN = 1
+POOL_MAX_CONN = 10
+
+# Arbitrary key for pg_advisory_xact_lock so two migration runs never overlap
+MIGRATION_LOCK_ID = 720_028
+
+# user_activity retention: raw monthly partitions older than this are dropped
+# by `python database.py --maintain` once their days are in the rollups.
+ACTIVITY_RETENTION_MONTHS = 12
+# Days re-aggregated on every rollup run; older days are re-rolled only when
+# one of their sessions logged out since the last run
+ACTIVITY_ROLLUP_LOOKBACK_DAYS = 2
+
 class DB:
-    def __init__(self):
-        self.conn = None
-        self.cursor = None
+    def __init__(self, check_schema=True):
+        self.pool = None
+        # ThreadedConnectionPool raises PoolError when exhausted instead of
+        # waiting, so callers queue on this semaphore for a free slot.
+        self._slots = threading.BoundedSemaphore(POOL_MAX_CONN)
         try:
-            self.conn = psycopg2.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASS)
-            self.conn.autocommit = True
-            self.cursor = self.conn.cursor()
-            self.create_tables()
-            self.update_user_schema()
+            self.pool = psycopg2.pool.ThreadedConnectionPool(
+                POOL_MIN_CONN, POOL_MAX_CONN,
+                host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASS,
+                # Content titles / cast are non-ASCII; don't inherit SQL_ASCII from the server
+                client_encoding="UTF8"
+            )
+            if check_schema:
+                self.check_schema()
             print("✅ Database Connected Successfully")
         except Exception as e:
             print(f"\n❌ CRITICAL DATABASE ERROR: {e}\n")
             sys.exit(1)
 
-    def create_tables(self):
-        commands = [
-            '''CREATE TABLE IF NOT EXISTS visitors (
-                visitor_id SERIAL PRIMARY KEY,
-                visit_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )''',
-            '''CREATE TABLE IF NOT EXISTS users (
-                user_id SERIAL PRIMARY KEY,
-                fullname VARCHAR(100),
-                email VARCHAR(100) UNIQUE,
-                password VARCHAR(255),
-                mobile VARCHAR(15),
-                age INTEGER,
-                country VARCHAR(50),
-                role VARCHAR(20) DEFAULT 'USER',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                gender VARCHAR(10),
-                dob DATE,
-                favorite_genre VARCHAR(50),
-                profile_pic_url TEXT
-            )''',
-            '''CREATE TABLE IF NOT EXISTS subscriptions (
-                subscription_id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(user_id),
-                service_type VARCHAR(50),
-                plan_name VARCHAR(50),
-                amount DECIMAL(10,2),
-                start_date TIMESTAMP,
-                end_date TIMESTAMP,
-                status VARCHAR(20) DEFAULT 'ACTIVE',
-                auto_renewal BOOLEAN DEFAULT FALSE
-            )''',
-            '''CREATE TABLE IF NOT EXISTS payments (
-                payment_id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(user_id),
-                subscription_id INTEGER REFERENCES subscriptions(subscription_id),
-                plan_name VARCHAR(50),
-                amount DECIMAL(10,2),
-                payment_type VARCHAR(20) DEFAULT 'NEW',
-                payment_status VARCHAR(20) DEFAULT 'SUCCESS',
-                payment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )''',
-            '''CREATE TABLE IF NOT EXISTS user_activity (
-                activity_id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(user_id),
-                login_time TIMESTAMP,
-                logout_time TIMESTAMP,
-                session_minutes INTEGER DEFAULT 0
-            )''',
-            '''CREATE TABLE IF NOT EXISTS feedback (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(user_id),
-                request_content TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )''',
-
-            # ─────────────────────────────────────────────────────────────
-            # NEW: Content table — stores Netflix movies & shows from Kaggle
-            # ─────────────────────────────────────────────────────────────
-            '''CREATE TABLE IF NOT EXISTS content (
-                content_id   SERIAL PRIMARY KEY,
-                show_id      VARCHAR(20),
-                content_type VARCHAR(10),          -- 'Movie' or 'TV Show'
-                title        VARCHAR(300),
-                director     TEXT,
-                cast_members TEXT,
-                country      VARCHAR(200),
-                date_added   VARCHAR(50),
-                release_year INTEGER,
-                rating       VARCHAR(20),          -- PG-13, TV-MA, etc.
-                duration     VARCHAR(30),          -- '90 min' or '3 Seasons'
-                genre        VARCHAR(200),         -- listed_in column from Kaggle
-                description  TEXT,
-                created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )''',
-
-            # ── Mutual Connection Groups ──────────────────────────
-            # Each row = one group of users sharing a plan
-            '''CREATE TABLE IF NOT EXISTS mutual_groups (
-                group_id     SERIAL PRIMARY KEY,
-                plan_name    VARCHAR(50),
-                full_price   DECIMAL(10,2),
-                split_price  DECIMAL(10,2),
-                max_members  INTEGER DEFAULT 4,
-                status       VARCHAR(20) DEFAULT 'FORMING',
-                created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )''',
+    @contextmanager
+    def connection(self):
+        """
+        Borrows a pooled connection for one unit of work.
+        Commits when the block exits cleanly, rolls back on error,
+        and always hands the connection back to the pool.
+        """
+        self._slots.acquire()
+        try:
+            conn = self.pool.getconn()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+            finally:
+                # Drop connections the server has closed so the pool reconnects
+                self.pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self._slots.release()
 
-            # ── Per-user invite & membership record ───────────────
-            # invite_status: PENDING → ACCEPTED / DECLINED
-            # member_status: ACTIVE (after group forms) / LEFT
-            '''CREATE TABLE IF NOT EXISTS mutual_invites (
-                invite_id     SERIAL PRIMARY KEY,
-                user_id       INTEGER REFERENCES users(user_id),
-                group_id      INTEGER REFERENCES mutual_groups(group_id),
-                plan_name     VARCHAR(50),
-                split_price   DECIMAL(10,2),
-                admin_message TEXT,
-                invite_status VARCHAR(20) DEFAULT 'PENDING',
-                member_status VARCHAR(20) DEFAULT 'NONE',
-                sent_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                responded_at  TIMESTAMP
-            )'''
-        ]
-        for cmd in commands:
-            self.cursor.execute(cmd)
+    @contextmanager
+    def cursor(self):
+        """Shortcut for a cursor on a borrowed connection (same commit/rollback rules)."""
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                yield cur
 
-        # Create Admin
-        try:
-            admin_pass = hashlib.sha256("admin123".encode()).hexdigest()
-            self.cursor.execute("""
-                INSERT INTO users (fullname, email, password, role)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (email) DO NOTHING
-            """, ("System Admin", "admin", admin_pass, "ADMIN"))
-        except Exception as e:
-            print(f"Admin Setup Note: {e}")
+    def read_sql(self, query, params=None):
+        """Runs a SELECT on a borrowed connection and returns a DataFrame."""
+        with self.connection() as conn:
+            return pd.read_sql(query, conn, params=params)
 
     def log_visitor(self):
-        if self.cursor:
-            self.cursor.execute("INSERT INTO visitors (visit_time) VALUES (CURRENT_TIMESTAMP)")
+        if self.pool:
+            with self.cursor() as cur:
+                cur.execute("INSERT INTO visitors (visit_time) VALUES (CURRENT_TIMESTAMP)")
 
     def close(self):
-        if self.cursor: self.cursor.close()
-        if self.conn:   self.conn.close()
-
-    def update_user_schema(self):
-        """Updates existing tables to add missing columns safely."""
-        new_columns = [
-            ("gender",         "VARCHAR(10)"),
-            ("dob",            "DATE"),
-            ("favorite_genre", "VARCHAR(50)"),
-            ("profile_pic_url","TEXT")
-        ]
+        if self.pool: self.pool.closeall()
 
+    # ── Schema migrations ──────────────────────────────────────
+    def schema_version(self):
+        """Returns the highest applied migration version (0 on a fresh database)."""
         try:
-            self.cursor.execute("ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS auto_renewal BOOLEAN DEFAULT FALSE")
-            self.conn.commit()
-        except Exception as e:
-            print(f"ℹ️ Info: {e}")
+            with self.cursor() as cur:
+                cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+                return cur.fetchone()[0]
+        except psycopg2.errors.UndefinedTable:
+            return 0
 
-        try:
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS payments (
-                    payment_id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(user_id),
-                    subscription_id INTEGER REFERENCES subscriptions(subscription_id),
-                    plan_name VARCHAR(50),
-                    amount DECIMAL(10,2),
-                    payment_type VARCHAR(20) DEFAULT 'NEW',
-                    payment_status VARCHAR(20) DEFAULT 'SUCCESS',
-                    payment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            self.conn.commit()
-        except Exception as e:
-            print(f"ℹ️ Info: {e}")
+    def check_schema(self):
+        """
+        Startup check: one SELECT, no DDL. Warns when migrations are pending
+        instead of applying them, so app start never takes catalog locks.
+        """
+        version = self.schema_version()
+        if version < SCHEMA_VERSION:
+            print(f"⚠️  Database schema is at version {version}, the app expects {SCHEMA_VERSION}.")
+            print("   Run:  python database.py   to apply pending migrations.")
+        return version
 
-        # ── NEW: Ensure content table exists even on older databases ──
-        try:
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS content (
-                    content_id   SERIAL PRIMARY KEY,
-                    show_id      VARCHAR(20),
-                    content_type VARCHAR(10),
-                    title        VARCHAR(300),
-                    director     TEXT,
-                    cast_members TEXT,
-                    country      VARCHAR(200),
-                    date_added   VARCHAR(50),
-                    release_year INTEGER,
-                    rating       VARCHAR(20),
-                    duration     VARCHAR(30),
-                    genre        VARCHAR(200),
-                    description  TEXT,
-                    created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    def migrate(self):
+        """Applies every pending migration in order. Returns the versions applied."""
+        with self.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version     INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
-            self.conn.commit()
-            print("✅ Content table checked/created.")
-        except Exception as e:
-            print(f"ℹ️ Info: {e}")
 
-        # ── NEW: Ensure mutual connection tables exist ──
-        try:
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS mutual_groups (
-                    group_id     SERIAL PRIMARY KEY,
-                    plan_name    VARCHAR(50),
-                    full_price   DECIMAL(10,2),
-                    split_price  DECIMAL(10,2),
-                    max_members  INTEGER DEFAULT 4,
-                    status       VARCHAR(20) DEFAULT 'FORMING',
-                    created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        applied = []
+        for version, description, steps in MIGRATIONS:
+            with self.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+                cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+                if cur.fetchone():
+                    continue
+                for step in steps:
+                    if callable(step):
+                        step(cur)
+                    elif isinstance(step, tuple):
+                        cur.execute(*step)
+                    else:
+                        cur.execute(step)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                    (version, description)
                 )
+            print(f"✅ Applied migration {version:03d}: {description}")
+            applied.append(version)
+        return applied
+
+    def rebuild_user_summary(self):
+        """Recomputes user_summary from the raw tables (backfill after bulk loads)."""
+        with self.cursor() as cur:
+            for stmt in USER_SUMMARY_REBUILD_SQL:
+                cur.execute(stmt)
+            return cur.rowcount
+
+    def rebuild_revenue_daily(self):
+        """Recomputes revenue_daily from the payments ledger. Returns the number of rollup rows."""
+        with self.cursor() as cur:
+            for stmt in REVENUE_DAILY_REBUILD_SQL:
+                cur.execute(stmt)
+            return cur.rowcount
+
+    def enable_trigram_search(self):
+        """(Re)tries pg_trgm + the content trigram indexes, e.g. after installing contrib."""
+        with self.cursor() as cur:
+            enabled = enable_content_trigram(cur)
+            if enabled:
+                # Running apps reload their catalog and drop the cached "trigram unavailable"
+                cur.execute(CONTENT_VERSION_BUMP_SQL)
+            return enabled
+
+    # ── user_activity partitions, rollups & retention ──────────
+    def ensure_activity_partitions(self, months_ahead=ACTIVITY_PARTITION_MONTHS_AHEAD):
+        """Creates any missing monthly partitions up to `months_ahead`. Returns their names."""
+        created = []
+        this_month = date.today().replace(day=1)
+        with self.cursor() as cur:
+            for offset in range(months_ahead + 1):
+                month = add_months(this_month, offset)
+                if create_activity_partition(cur, month):
+                    created.append(activity_partition_name(month))
+        return created
+
+    def rollup_activity(self, full=False):
+        """
+        Aggregates finished days into activity_daily_user / activity_daily_hour.
+        Re-covers the last ACTIVITY_ROLLUP_LOOKBACK_DAYS already rolled up, plus
+        any older day with a session that logged out since the last run;
+        `full=True` re-aggregates every day still held in raw partitions.
+        Returns (start, end, late days re-rolled), or None if nothing to do.
+        """
+        yesterday = date.today() - timedelta(days=1)
+        late_days = []
+        with self.cursor() as cur:
+            cur.execute("""
+                SELECT MAX(rolled_through), MAX(logouts_through)
+                FROM rollup_state WHERE name = 'user_activity'
             """)
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS mutual_invites (
-                    invite_id     SERIAL PRIMARY KEY,
-                    user_id       INTEGER REFERENCES users(user_id),
-                    group_id      INTEGER REFERENCES mutual_groups(group_id),
-                    plan_name     VARCHAR(50),
-                    split_price   DECIMAL(10,2),
-                    admin_message TEXT,
-                    invite_status VARCHAR(20) DEFAULT 'PENDING',
-                    member_status VARCHAR(20) DEFAULT 'NONE',
-                    sent_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    responded_at  TIMESTAMP
-                )
+            rolled_through, logouts_through = cur.fetchone()
+            if full or rolled_through is None:
+                cur.execute("SELECT MIN(login_time)::date FROM user_activity")
+                start = cur.fetchone()[0]
+            else:
+                start = rolled_through - timedelta(days=ACTIVITY_ROLLUP_LOOKBACK_DAYS - 1)
+                cur.execute("""
+                    SELECT DISTINCT login_time::date FROM user_activity
+                    WHERE logout_time >= COALESCE(%s::timestamp, '-infinity') AND login_time < %s
+                    ORDER BY 1
+                """, (logouts_through, start))
+                late_days = [r[0] for r in cur.fetchall()]
+                for day in late_days:
+                    rollup_activity_range(cur, day, day)
+            rolled = rollup_activity_range(cur, start, yesterday)
+            cur.execute(ACTIVITY_LOGOUT_MARK_SQL)
+        if rolled or late_days:
+            return start, yesterday, len(late_days)
+        return None
+
+    def drop_expired_activity(self, keep_months=ACTIVITY_RETENTION_MONTHS):
+        """
+        Drops raw monthly partitions older than `keep_months`, but never one
+        holding days the rollups don't cover yet. Returns the dropped names.
+        """
+        cutoff = add_months(date.today(), -keep_months)
+        dropped = []
+        with self.cursor() as cur:
+            cur.execute("SELECT MAX(rolled_through) FROM rollup_state WHERE name = 'user_activity'")
+            rolled_through = cur.fetchone()[0]
+            if rolled_through is None:
+                return dropped
+            cutoff = min(cutoff, rolled_through + timedelta(days=1))
+            cur.execute("""
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'user_activity'::regclass
+                  AND c.relname ~ '^user_activity_y[0-9]{4}m[0-9]{2}$'
+                ORDER BY c.relname
             """)
-            self.conn.commit()
-            print("✅ Mutual connection tables checked/created.")
-        except Exception as e:
-            print(f"ℹ️ Info: {e}")
+            for (name,) in cur.fetchall():
+                month_start = date(int(name[-7:-3]), int(name[-2:]), 1)
+                if add_months(month_start, 1) <= cutoff:
+                    cur.execute(f"DROP TABLE {name}")
+                    dropped.append(name)
+        return dropped
 
-        print("🔄 Updating 'users' table schema...")
-        for col_name, col_type in new_columns:
-            try:
-                self.cursor.execute(f"ALTER TABLE users ADD COLUMN IF NOT EXISTS {col_name} {col_type}")
-                self.conn.commit()
-                print(f"✅ Column '{col_name}' checked/added.")
-            except Exception as e:
-                print(f"ℹ️ Info: {e}")
+    def run_maintenance(self, full_rollup=False):
+        """Partitions ahead → rollups → retention. Safe to run as often as you like (e.g. nightly cron)."""
+        created = self.ensure_activity_partitions()
+        print(f"✅ Activity partitions ready ({len(created)} created)")
+        rolled = self.rollup_activity(full=full_rollup)
+        if rolled:
+            start, end, late = rolled
+            print(f"✅ Activity rolled up for {start} → {end}"
+                  + (f" (+{late} earlier day(s) with late logouts)" if late else ""))
+        else:
+            print("ℹ️  No finished days to roll up")
+        dropped = self.drop_expired_activity()
+        print(f"✅ Retention: dropped {len(dropped)} raw partition(s) older than {ACTIVITY_RETENTION_MONTHS} months")
 
 
 # ── Run this block when database.py is executed directly ──────
 if __name__ == "__main__":
+    if "--rebuild-summary" in sys.argv:
+        db = DB()
+        rows = db.rebuild_user_summary()
+        print(f"✅ user_summary rebuilt for {rows} users")
+        rows = db.rebuild_revenue_daily()
+        print(f"✅ revenue_daily rebuilt ({rows} day/plan/type rows)")
+        db.close()
+        sys.exit(0)
+
+    if "--enable-trigram" in sys.argv:
+        db = DB()
+        if db.enable_trigram_search():
+            print("✅ pg_trgm enabled — substring and typo-tolerant content search are indexed")
+        db.close()
+        sys.exit(0)
+
+    if "--maintain" in sys.argv:
+        db = DB()
+        db.run_maintenance(full_rollup="--full-rollup" in sys.argv)
+        db.close()
+        sys.exit(0)
+
     print("=" * 50)
     print("   SUBSCRIPTION MANAGEMENT SYSTEM")
     print("   Database Setup")
     print("=" * 50)
-    db = DB()
+    db = DB(check_schema=False)
+    applied = db.migrate()
     print("=" * 50)
-    print("✅ All tables created successfully!")
+    if applied:
+        print(f"✅ Applied {len(applied)} migration(s) — schema is at version {SCHEMA_VERSION}")
+    else:
+        print(f"✅ Schema already up to date (version {SCHEMA_VERSION})")
     print("✅ Admin account ready  →  ID: admin | Pass: admin123")
     print("=" * 50)
     print("▶️  Next step: python seed_netflix_realistic.py")
@@ -0,0 +1,176 @@
+"""
+Streaming exports of admin reports to a temp file.
+
+CSV is produced by PostgreSQL itself (`COPY (...) TO STDOUT`) and written
+straight into the file, so Python never holds the rows. Parquet is read
+through a named (server-side) cursor in chunks of EXPORT_CHUNK_ROWS and
+appended to the file one row group at a time. Either way memory stays
+bounded by one chunk, however large the table is.
+
+Parquet needs pyarrow; without it only CSV is offered.
+"""
+
+import os
+import tempfile
+import time
+import uuid
+
+from backend import db
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_CHUNK_ROWS = 50_000
+# Finished export files older than this are removed on the next export
+EXPORT_MAX_AGE_SECONDS = 3600
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "subscription_exports")
+
+# name -> (download file stem, SELECT, ORDER BY terms). Column names are the
+# report headers; the ORDER BY terms name those output columns, so they can
+# also be applied outside the SELECT (export_csv wraps the query).
+REPORTS = {
+    "revenue_report": ("revenue_report", """
+        SELECT subscription_id, user_id, service_type, plan_name,
+               amount AS "Revenue", start_date, end_date, status, auto_renewal
+        FROM subscriptions
+    """, ["subscription_id"]),
+    "payment_report": ("payment_report", """
+        SELECT p.payment_id AS "Txn ID", u.fullname AS "User", u.email AS "Email",
+               p.plan_name AS "Plan", p.amount AS "Amount (₹)", p.payment_type AS "Type",
+               p.payment_status AS "Status", p.payment_date AS "Date"
+        FROM payments p
+        JOIN users u ON p.user_id = u.user_id
+    """, ['"Date" DESC']),
+}
+
+MIME_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+def available_formats():
+    return ["csv", "parquet"] if pa else ["csv"]
+
+
+def _new_export_path(suffix):
+    """Fresh file in EXPORT_DIR; sweeps out exports nobody downloaded."""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    cutoff = time.time() - EXPORT_MAX_AGE_SECONDS
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+    return os.path.join(EXPORT_DIR, f"{uuid.uuid4().hex}.{suffix}")
+
+
+# PostgreSQL type OID -> SQL expression formatting the column as the old
+# DataFrame.to_csv downloads did (COPY would write t/f and trimmed fractions)
+_CSV_FORMATS = {
+    16:   "CASE WHEN {0} THEN 'True' WHEN NOT {0} THEN 'False' END",
+    1114: "to_char({0}, 'YYYY-MM-DD HH24:MI:SS.US')",
+}
+
+
+def _quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _csv_select(cur, sql, order_by=None):
+    """
+    The query wrapped in a SELECT that formats its bool and timestamp columns
+    for CSV. The order must be given here: the wrapper doesn't keep the inner one.
+    """
+    cur.execute(f"SELECT * FROM ({sql}) q LIMIT 0")
+    columns = []
+    for column in cur.description:
+        name = _quote_ident(column.name)
+        fmt = _CSV_FORMATS.get(column.type_code)
+        columns.append(f"{fmt.format('q.' + name)} AS {name}" if fmt else f"q.{name}")
+    order = f" ORDER BY {', '.join('q.' + term for term in order_by)}" if order_by else ""
+    return f"SELECT {', '.join(columns)} FROM ({sql}) q{order}"
+
+
+def export_csv(query, params=None, path=None, order_by=None):
+    """
+    Writes the query result as CSV (with header) via COPY TO STDOUT, sorted by
+    the `order_by` terms (on output column names). Returns the file path.
+    """
+    path = path or _new_export_path("csv")
+    with db.cursor() as cur:
+        sql = _csv_select(cur, cur.mogrify(query.strip().rstrip(";"), params).decode(), order_by)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", f)
+    return path
+
+
+# PostgreSQL type OID -> Arrow type (anything else is exported as text)
+_ARROW_TYPES = {
+    16:   lambda: pa.bool_(),
+    20:   lambda: pa.int64(),
+    21:   lambda: pa.int16(),
+    23:   lambda: pa.int32(),
+    700:  lambda: pa.float32(),
+    701:  lambda: pa.float64(),
+    1082: lambda: pa.date32(),
+    1114: lambda: pa.timestamp("us"),
+    1184: lambda: pa.timestamp("us", tz="UTC"),
+}
+
+
+def _arrow_field(column):
+    if column.type_code == 1700:           # NUMERIC: exact decimal when the column declares precision
+        if column.precision and column.scale is not None:
+            return pa.field(column.name, pa.decimal128(column.precision, column.scale)), None
+        return pa.field(column.name, pa.float64()), lambda v: None if v is None else float(v)
+    make = _ARROW_TYPES.get(column.type_code)
+    if make:
+        return pa.field(column.name, make()), None
+    return pa.field(column.name, pa.string()), lambda v: None if v is None else str(v)
+
+
+def export_parquet(query, params=None, path=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Streams the query through a named cursor into a Parquet file, one row group per chunk."""
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    path = path or _new_export_path("parquet")
+    writer = None
+    try:
+        with db.connection() as conn:
+            # A named cursor keeps the result set on the server; fetchmany pulls one chunk at a time
+            with conn.cursor(name=f"export_{uuid.uuid4().hex[:12]}") as cur:
+                cur.itersize = chunk_rows
+                cur.execute(query, params)
+                rows = cur.fetchmany(chunk_rows)
+                fields = [_arrow_field(c) for c in cur.description]
+                schema = pa.schema([f for f, _ in fields])
+                writer = pq.ParquetWriter(path, schema)
+                while rows:
+                    columns = []
+                    for i, (field, convert) in enumerate(fields):
+                        values = [r[i] for r in rows]
+                        if convert:
+                            values = [convert(v) for v in values]
+                        columns.append(pa.array(values, type=field.type))
+                    writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+                    rows = cur.fetchmany(chunk_rows)
+    finally:
+        if writer:
+            writer.close()
+    return path
+
+
+def export_report(name, fmt="csv"):
+    """
+    Runs one of REPORTS into a temp file.
+    Returns (path, download file name, mime type).
+    """
+    stem, query, order_by = REPORTS[name]
+    if fmt == "parquet":
+        path = export_parquet(f"{query.rstrip()} ORDER BY {', '.join(order_by)}")
+    else:
+        fmt = "csv"
+        path = export_csv(query, order_by=order_by)
+    return path, f"{stem}.{fmt}", MIME_TYPES[fmt]
@@ -8,13 +8,27 @@
 ║  3. Place it in the same folder as this script               ║
 ║  4. Run:  python load_kaggle_content.py                      ║
 ║     Or:   python load_kaggle_content.py --force   (re-seed)  ║
+║                                                              ║
+║  OPTIONS:                                                    ║
+║     --csv PATH        load a different CSV (same columns)    ║
+║     --mode insert     execute_values instead of COPY         ║
+║     --sync            upsert changed titles by show_id       ║
+║     --sync --prune    ...and tombstone titles not in the CSV ║
+║     --chunk-rows N    rows read + loaded per chunk           ║
 ╚══════════════════════════════════════════════════════════════╝
 """
 
-import psycopg2
-import pandas as pd
-import sys
+import csv
+import io
 import os
+import sys
+import time
+
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+
+from migrations import CONTENT_VERSION_BUMP_SQL, content_hash_sql, refresh_content_genres
 
 # ── DB CONFIG (must match your database.py) ──────────────────
 DB_HOST = "localhost"
@@ -24,20 +38,215 @@ DB_PASS = "shrey28"
 
 CSV_FILE = "netflix_titles.csv"   # Name of the Kaggle CSV file
 
+# Rows read + cleaned + loaded per chunk (--chunk-rows); also the size of
+# one COPY / execute_values round trip. Memory use scales with this, not the file.
+LOAD_BATCH_ROWS = 100_000
+
+# Kaggle CSV column → content table column, in table order
+COLUMN_MAP = [
+    ("show_id",      "show_id"),
+    ("type",         "content_type"),     # 'Movie' or 'TV Show'
+    ("title",        "title"),
+    ("director",     "director"),
+    ("cast",         "cast_members"),
+    ("country",      "country"),
+    ("date_added",   "date_added"),
+    ("release_year", "release_year"),
+    ("rating",       "rating"),
+    ("duration",     "duration"),
+    ("listed_in",    "genre"),
+    ("description",  "description"),
+]
+# Structured copies of duration / date_added that clean_titles() parses, for range filters
+PARSED_COLUMNS = ["duration_minutes", "season_count", "added_on"]
+CONTENT_COLUMNS = [dst for _, dst in COLUMN_MAP] + PARSED_COLUMNS
+
+# VARCHAR limits of the content table: longer values would abort the whole batch
+VARCHAR_LIMITS = {
+    "show_id": 20, "content_type": 10, "title": 300, "country": 200,
+    "date_added": 50, "rating": 20, "duration": 30, "genre": 200,
+}
+
+
+def clean_titles(df):
+    """
+    Vectorized replacement for the old per-cell clean():
+    NaN → '' and whitespace stripped on text columns, release_year → nullable int,
+    blank show_id → NULL, duration / date_added also parsed into PARSED_COLUMNS. Rows with over-long values or a repeated show_id are
+    rejected (the first occurrence of a show_id wins).
+    Returns (clean DataFrame in CONTENT_COLUMNS order, rejected rows with a `reason`).
+    """
+    out = pd.DataFrame(index=df.index)
+    for src, dst in COLUMN_MAP:
+        col = df[src] if src in df.columns else pd.Series(pd.NA, index=df.index, dtype=object)
+        if dst == "release_year":
+            out[dst] = pd.to_numeric(col, errors="coerce").astype("Int64")
+        else:
+            out[dst] = col.astype(object).where(col.notna(), "").astype(str).str.strip()
+
+    out["show_id"] = out["show_id"].mask(out["show_id"] == "")
+
+    # '90 min' / '3 Seasons' / 'September 25, 2021'; anything else stays NULL
+    # (the same rules migration 014 backfilled existing rows with)
+    out["duration_minutes"] = pd.to_numeric(
+        out["duration"].str.extract(r"^(\d+) min$", expand=False)).astype("Int64")
+    out["season_count"] = pd.to_numeric(
+        out["duration"].str.extract(r"^(\d+) Seasons?$", expand=False)).astype("Int64")
+    added = pd.to_datetime(out["date_added"], format="%B %d, %Y", errors="coerce")
+    out["added_on"] = added.dt.strftime("%Y-%m-%d")
+
+    reason = pd.Series("", index=df.index)
+    for column, limit in VARCHAR_LIMITS.items():
+        reason = reason.mask((reason == "") & (out[column].str.len() > limit),
+                             f"{column} longer than {limit} characters")
+    dup = out["show_id"].notna() & out["show_id"].duplicated()
+    reason = reason.mask((reason == "") & dup, "duplicate show_id")
+
+    bad = reason != ""
+    return out[~bad], out[bad].assign(reason=reason[bad])
+
+
+def copy_titles(cursor, df, batch_rows=LOAD_BATCH_ROWS, table="content"):
+    """Streams rows into `table` with COPY FROM STDIN, one CSV buffer per batch."""
+    sql = (f"COPY {table} ({', '.join(CONTENT_COLUMNS)}) FROM STDIN "
+           "WITH (FORMAT csv, NULL '\\N')")
+    for start in range(0, len(df), batch_rows):
+        buf = io.StringIO()
+        # Empty strings stay empty strings; only a missing release_year / show_id becomes NULL
+        df.iloc[start:start + batch_rows].to_csv(
+            buf, index=False, header=False, na_rep="\\N", quoting=csv.QUOTE_MINIMAL
+        )
+        buf.seek(0)
+        cursor.copy_expert(sql, buf)
+        yield min(start + batch_rows, len(df))
+
+
+def insert_titles(cursor, df, batch_rows=LOAD_BATCH_ROWS, table="content"):
+    """Fallback: multi-row INSERTs through execute_values (no COPY privileges needed)."""
+    sql = f"INSERT INTO {table} ({', '.join(CONTENT_COLUMNS)}) VALUES %s"
+    for start in range(0, len(df), batch_rows):
+        chunk = df.iloc[start:start + batch_rows].astype(object)
+        rows = chunk.where(chunk.notna(), None).itertuples(index=False, name=None)
+        execute_values(cursor, sql, list(rows), page_size=1000)
+        yield min(start + batch_rows, len(df))
+
+
+_KEYED = [c for c in CONTENT_COLUMNS if c != "show_id"]
+
+# Stage rows whose show_id is new, tombstoned, or whose content hash differs
+# are upserted in one statement; xmax = 0 tells a fresh insert from an update.
+# A show_id repeated across chunks keeps its first staged row.
+SYNC_UPSERT_SQL = f"""
+    WITH staged AS (
+        SELECT DISTINCT ON (show_id) *
+        FROM content_stage
+        ORDER BY show_id, stage_row
+    ), changed AS (
+        SELECT s.*
+        FROM staged s
+        LEFT JOIN content c ON c.show_id = s.show_id
+        WHERE c.content_id IS NULL
+           OR c.removed_at IS NOT NULL
+           OR c.content_hash <> {content_hash_sql("s.")}
+    ), upserted AS (
+        INSERT INTO content ({', '.join(CONTENT_COLUMNS)})
+        SELECT {', '.join(CONTENT_COLUMNS)} FROM changed
+        ON CONFLICT (show_id) DO UPDATE
+        SET {', '.join(f"{c} = EXCLUDED.{c}" for c in _KEYED)}, removed_at = NULL
+        RETURNING content_id, (xmax = 0) AS inserted
+    ), synced AS (
+        INSERT INTO content_synced SELECT content_id FROM upserted
+    )
+    SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted),
+           (SELECT COUNT(*) FROM staged)
+    FROM upserted
+"""
+
+SYNC_TOMBSTONE_SQL = """
+    UPDATE content c SET removed_at = CURRENT_TIMESTAMP
+    WHERE c.removed_at IS NULL AND c.show_id IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM content_stage s WHERE s.show_id = c.show_id)
+"""
+
+
+def begin_sync(cursor):
+    """Creates the content_stage temp table that --sync chunks are loaded into."""
+    # Readers keep going; a second sync waits for this one
+    cursor.execute("LOCK TABLE content IN SHARE ROW EXCLUSIVE MODE")
+    cursor.execute(f"""CREATE TEMP TABLE content_stage ON COMMIT DROP AS
+                       SELECT {', '.join(CONTENT_COLUMNS)} FROM content WITH NO DATA""")
+    cursor.execute("ALTER TABLE content_stage ADD COLUMN stage_row BIGSERIAL")
+    # content_ids the upsert touched, whose genre links need refreshing
+    cursor.execute("CREATE TEMP TABLE content_synced (content_id INTEGER) ON COMMIT DROP")
+
+
+def apply_sync(cursor, prune=False):
+    """
+    Diffs content_stage against content by show_id and applies only the changes.
+    Returns (inserted, updated, unchanged, tombstoned).
+    """
+    cursor.execute("ANALYZE content_stage")
+    cursor.execute(SYNC_UPSERT_SQL)
+    inserted, updated, staged = cursor.fetchone()
+    refresh_content_genres(cursor, only="SELECT content_id FROM content_synced")
+    tombstoned = 0
+    if prune:
+        cursor.execute(SYNC_TOMBSTONE_SQL)
+        tombstoned = cursor.rowcount
+    return inserted, updated, staged - inserted - updated, tombstoned
+
 
-def clean(val):
-    """Convert NaN / None to empty string so Postgres is happy."""
-    if pd.isna(val):
-        return ""
-    return str(val).strip()
+def read_titles(csv_file, chunk_rows=LOAD_BATCH_ROWS):
+    """
+    Streams the CSV in chunks of chunk_rows, yielding clean_titles() of each,
+    so memory stays bounded by one chunk however large the file is.
+    """
+    with pd.read_csv(csv_file, dtype=str, keep_default_na=True, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield clean_titles(chunk)
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None where `resource` is unavailable)."""
+    try:
+        import resource
+    except ImportError:          # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def option(name, default=None):
+    """Value following `name` in argv, e.g. --csv other.csv."""
+    if name in sys.argv:
+        i = sys.argv.index(name)
+        if i + 1 < len(sys.argv):
+            return sys.argv[i + 1]
+    return default
 
 
 def main():
     force_mode = "--force" in sys.argv
+    sync_mode  = "--sync" in sys.argv
+    prune      = "--prune" in sys.argv
+    csv_file   = option("--csv", CSV_FILE)
+    load_mode  = option("--mode", "copy")
+    chunk_rows = option("--chunk-rows", str(LOAD_BATCH_ROWS))
+    if not chunk_rows.isdigit() or int(chunk_rows) < 1:
+        print(f"❌ --chunk-rows must be a positive number, got '{chunk_rows}'")
+        sys.exit(1)
+    chunk_rows = int(chunk_rows)
+    if load_mode not in ("copy", "insert"):
+        print(f"❌ Unknown --mode '{load_mode}' (use 'copy' or 'insert')")
+        sys.exit(1)
+    if force_mode and sync_mode:
+        print("❌ Use either --force (full reload) or --sync (incremental), not both")
+        sys.exit(1)
 
     # ── 1. Check CSV exists ────────────────────────────────────
-    if not os.path.exists(CSV_FILE):
-        print(f"\n❌ CSV file '{CSV_FILE}' not found!")
+    if not os.path.exists(csv_file):
+        print(f"\n❌ CSV file '{csv_file}' not found!")
         print("   ➡  Download it from Kaggle:")
         print("      https://www.kaggle.com/datasets/shivamb/netflix-shows")
         print(f"   ➡  Place '{CSV_FILE}' in the same folder as this script.\n")
@@ -46,7 +255,9 @@ def main():
     # ── 2. Connect to DB ───────────────────────────────────────
     try:
         conn = psycopg2.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASS)
-        conn.autocommit = True
+        # Titles, cast and descriptions are full of non-ASCII names; without an
+        # explicit UTF8 client encoding a SQL_ASCII database rejects those rows.
+        conn.set_client_encoding("UTF8")
         cursor = conn.cursor()
         print(f"✅ Connected to database: {DB_NAME}")
     except Exception as e:
@@ -57,96 +268,107 @@ def main():
     cursor.execute("SELECT COUNT(*) FROM content")
     existing = cursor.fetchone()[0]
 
-    if existing > 0 and not force_mode:
+    if existing > 0 and not (force_mode or sync_mode):
         print(f"\nℹ️  Content table already has {existing} rows.")
-        print("   Run with '--force' to reload:\n")
+        print("   Run with '--sync' to apply only what changed, or '--force' to reload:\n")
+        print("   python load_kaggle_content.py --sync")
         print("   python load_kaggle_content.py --force\n")
         conn.close()
         sys.exit(0)
 
-    # ── 4. Clear old data if force mode ───────────────────────
-    if force_mode and existing > 0:
-        cursor.execute("TRUNCATE TABLE content RESTART IDENTITY CASCADE")
-        print(f"⚠️  FORCE MODE: Cleared {existing} existing rows.")
+    # ── 4+5. Stream, clean and load chunk by chunk ──────────────
+    # One transaction: a failed load leaves the old catalog in place
+    print(f"\n📂 Streaming '{csv_file}' in chunks of {chunk_rows:,} rows...")
+    loader = copy_titles if load_mode == "copy" else insert_titles
+    target = "content_stage" if sync_mode else "content"
+    total_rows = loaded = skipped = keyless = 0
+    t0 = time.perf_counter()
+    try:
+        # ── Clear old data if force mode ──
+        if force_mode and existing > 0:
+            # Only the catalog and what's derived from it. No CASCADE: a table of user
+            # data referencing content makes this fail instead of being emptied.
+            # Watch history (content_views) is keyed on show_id and survives the reload.
+            cursor.execute("TRUNCATE TABLE content, content_genres, content_neighbors RESTART IDENTITY")
+            print(f"⚠️  FORCE MODE: Clearing {existing} existing rows.")
+        if sync_mode:
+            begin_sync(cursor)
+
+        for n, (df, rejected) in enumerate(read_titles(csv_file, chunk_rows), 1):
+            total_rows += len(df) + len(rejected)
+            for idx, row in rejected.iterrows():
+                if skipped < 10:
+                    print(f"   ⚠️  Row {idx} skipped: {row['reason']} ({row['show_id']})")
+                skipped += 1
+            if sync_mode:
+                no_key = df["show_id"].isna()
+                keyless += int(no_key.sum())
+                df = df[~no_key]
+            for _ in loader(cursor, df, chunk_rows, table=target):
+                pass
+            loaded += len(df)
+            print(f"   ✅ Chunk {n}: {loaded:,} titles {'staged' if sync_mode else 'loaded'} ({load_mode})...")
 
-    # ── 5. Read CSV ────────────────────────────────────────────
-    print(f"\n📂 Reading '{CSV_FILE}'...")
-    df = pd.read_csv(CSV_FILE)
-    total_rows = len(df)
-    print(f"   Found {total_rows} titles in the CSV.\n")
+        if keyless:
+            print(f"   ⚠️  {keyless} rows without a show_id can't be synced — skipped.")
+        if sync_mode:
+            inserted, updated, unchanged, tombstoned = apply_sync(cursor, prune)
+            print(f"   🔄 Sync: {inserted} new, {updated} updated, {unchanged} unchanged"
+                  + (f", {tombstoned} tombstoned" if prune else ""))
+        else:
+            links = refresh_content_genres(cursor)
+            print(f"   🎭 Genre links rebuilt ({links:,} title/genre pairs)")
+        if not sync_mode or inserted or updated or tombstoned:
+            # Tells running apps to reload their in-memory catalog
+            cursor.execute(CONTENT_VERSION_BUMP_SQL)
+        cursor.execute("ANALYZE content")
+        cursor.execute("ANALYZE content_genres")
+        conn.commit()
+    except psycopg2.errors.UniqueViolation as e:
+        conn.rollback()
+        print(f"❌ Load failed, nothing was changed: a show_id appears twice in the CSV.\n   {e}"
+              "   Use --sync, which keeps the first occurrence.")
+        conn.close()
+        sys.exit(1)
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Load failed, nothing was changed: {e}")
+        conn.close()
+        sys.exit(1)
+    elapsed = time.perf_counter() - t0
     print("─" * 60)
 
-    # ── 6. Insert rows ─────────────────────────────────────────
-    success_count = 0
-    error_count   = 0
-
-    for idx, row in df.iterrows():
-        try:
-            # Parse release_year safely
-            try:
-                release_year = int(row.get("release_year", 0))
-            except (ValueError, TypeError):
-                release_year = None
-
-            cursor.execute("""
-                INSERT INTO content
-                    (show_id, content_type, title, director, cast_members,
-                     country, date_added, release_year, rating, duration,
-                     genre, description)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                clean(row.get("show_id")),
-                clean(row.get("type")),           # 'Movie' or 'TV Show'
-                clean(row.get("title")),
-                clean(row.get("director")),
-                clean(row.get("cast")),
-                clean(row.get("country")),
-                clean(row.get("date_added")),
-                release_year,
-                clean(row.get("rating")),
-                clean(row.get("duration")),
-                clean(row.get("listed_in")),      # genre
-                clean(row.get("description")),
-            ))
-            success_count += 1
-
-            # Progress update every 500 rows
-            if success_count % 500 == 0:
-                conn.commit()
-                print(f"   ✅ Inserted {success_count}/{total_rows} titles...")
-
-        except Exception as e:
-            error_count += 1
-            print(f"   ⚠️  Row {idx} failed: {e}")
-            continue
-
-    # Final commit
-    conn.commit()
-
-    # ── 7. Show Summary ────────────────────────────────────────
+    # ── 6. Show Summary ────────────────────────────────────────
     print("\n" + "═" * 60)
     print("✅ KAGGLE CONTENT LOAD COMPLETE!")
     print("═" * 60)
 
-    cursor.execute("SELECT COUNT(*) FROM content")
-    final_count = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM content WHERE content_type = 'Movie'")
-    movies = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(*) FROM content WHERE content_type = 'TV Show'")
-    shows = cursor.fetchone()[0]
+    cursor.execute("""
+        SELECT COUNT(*),
+               COUNT(*) FILTER (WHERE content_type = 'Movie'),
+               COUNT(*) FILTER (WHERE content_type = 'TV Show')
+        FROM content
+        WHERE removed_at IS NULL
+    """)
+    final_count, movies, shows = cursor.fetchone()
 
     print(f"   📊 Total titles in DB : {final_count}")
     print(f"   🎬 Movies             : {movies}")
     print(f"   📺 TV Shows           : {shows}")
-    print(f"   ❌ Errors skipped     : {error_count}")
+    print(f"   📄 Rows in CSV        : {total_rows}")
+    print(f"   ❌ Errors skipped     : {skipped}")
+    print(f"   ⚡ Load speed         : {loaded / elapsed if elapsed else 0:,.0f} rows/sec "
+          f"({loaded} rows in {elapsed:.2f}s, {load_mode})")
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"   🧠 Peak memory        : {peak:,.0f} MB (chunks of {chunk_rows:,} rows)")
     print("═" * 60)
     print("\n🎉 Done! Users with an active subscription can now browse")
-    print("   the content library inside your Streamlit app.\n")
+    print("   the content library inside your Streamlit app.")
+    print("   Refresh the \"More like this\" neighbours:  python recommender.py\n")
 
     conn.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
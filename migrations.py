@@ -0,0 +1,663 @@
+"""
+Versioned schema migrations for the subscription system.
+
+Applied in order by `python database.py` (see DB.migrate). Each entry is
+    (version, description, [steps])
+where a step is a SQL string, a (sql, params) tuple, or a callable that
+receives the open cursor. Every migration runs in one transaction and is
+recorded in `schema_migrations`, so it is applied exactly once.
+
+Append new migrations at the end — never edit one that has already shipped.
+"""
+
+import hashlib
+from datetime import date, timedelta
+
+ADMIN_PASS_HASH = hashlib.sha256("admin123".encode()).hexdigest()
+
+# ── Secondary indexes for the hot per-request lookups in backend.py ──
+# Kept as a named list so benchmarks/bench_indexes.py builds exactly the same set.
+HOT_PATH_INDEXES = [
+    # get_active_plan, buy_plan duplicate guard, cancel_subscription, toggle_auto_renewal
+    """CREATE INDEX IF NOT EXISTS idx_subscriptions_user_active
+       ON subscriptions (user_id, start_date DESC) WHERE status = 'ACTIVE'""",
+    # get_expired_plan / renew_subscription (status IN (...) ORDER BY end_date DESC),
+    # per-user SUM/COUNT on the dashboard, get_user_invoices
+    """CREATE INDEX IF NOT EXISTS idx_subscriptions_user_status
+       ON subscriptions (user_id, status, end_date DESC)""",
+    # last login + per-user watch time, low-usage / at-risk scans
+    """CREATE INDEX IF NOT EXISTS idx_user_activity_user_login
+       ON user_activity (user_id, login_time DESC)""",
+    # peak hours and "this month" activity windows
+    """CREATE INDEX IF NOT EXISTS idx_user_activity_login_time
+       ON user_activity (login_time)""",
+    # revenue reports: payment_status = 'SUCCESS' AND payment_date range
+    """CREATE INDEX IF NOT EXISTS idx_payments_status_date
+       ON payments (payment_status, payment_date)""",
+    # payment history and latest-payment lookup for receipts
+    """CREATE INDEX IF NOT EXISTS idx_payments_user_date
+       ON payments (user_id, payment_date DESC)""",
+    # notification bell: PENDING invites per user
+    """CREATE INDEX IF NOT EXISTS idx_mutual_invites_user_status
+       ON mutual_invites (user_id, invite_status)""",
+    # group member lists / acceptance counts
+    """CREATE INDEX IF NOT EXISTS idx_mutual_invites_group
+       ON mutual_invites (group_id)""",
+]
+
+# ── Per-user running totals (see backend._bump_user_summary) ──
+# Backfill used by migration 003, before activity rollups existed.
+# The SHARE locks hold off concurrent writers so no increment is lost.
+_USER_SUMMARY_BACKFILL_SQL = [
+    "LOCK TABLE subscriptions, user_activity IN SHARE MODE",
+    """
+    INSERT INTO user_summary
+        (user_id, lifetime_spend, watch_minutes, subscription_count, last_login, updated_at)
+    SELECT u.user_id,
+           COALESCE(s.spend, 0), COALESCE(a.minutes, 0), COALESCE(s.subs, 0),
+           a.last_login, CURRENT_TIMESTAMP
+    FROM users u
+    LEFT JOIN (
+        SELECT user_id, SUM(amount) AS spend, COUNT(*) AS subs
+        FROM subscriptions GROUP BY user_id
+    ) s ON s.user_id = u.user_id
+    LEFT JOIN (
+        SELECT user_id, SUM(session_minutes) AS minutes, MAX(login_time) AS last_login
+        FROM user_activity GROUP BY user_id
+    ) a ON a.user_id = u.user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        lifetime_spend     = EXCLUDED.lifetime_spend,
+        watch_minutes      = EXCLUDED.watch_minutes,
+        subscription_count = EXCLUDED.subscription_count,
+        last_login         = EXCLUDED.last_login,
+        updated_at         = EXCLUDED.updated_at
+    """,
+]
+
+# ── Monthly partitions of user_activity (by login_time) ──
+# Migration 004 pre-creates partitions this far back / ahead of the current
+# month; `python database.py --maintain` keeps creating the ones ahead.
+ACTIVITY_PARTITION_MONTHS_BACK  = 12
+ACTIVITY_PARTITION_MONTHS_AHEAD = 3
+
+
+def add_months(day, months):
+    """First day of the month `months` after (or before) the month of `day`."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def activity_partition_name(month_start):
+    return f"user_activity_y{month_start.year}m{month_start.month:02d}"
+
+
+def create_activity_partition(cur, month_start):
+    """
+    Creates the partition holding one calendar month of user_activity.
+    Rows that already landed in the DEFAULT partition for that month are
+    moved across first, otherwise ATTACH would refuse the overlap.
+    Returns False if the partition already exists.
+    """
+    name = activity_partition_name(month_start)
+    cur.execute("SELECT to_regclass(%s)", (name,))
+    if cur.fetchone()[0]:
+        return False
+    bounds = (month_start, add_months(month_start, 1))
+    cur.execute(f"CREATE TABLE {name} (LIKE user_activity INCLUDING DEFAULTS)")
+    cur.execute(f"""
+        WITH moved AS (
+            DELETE FROM user_activity_default
+            WHERE login_time >= %s AND login_time < %s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, bounds)
+    cur.execute(f"ALTER TABLE user_activity ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+    return True
+
+
+def _partition_user_activity(cur):
+    """Swaps the plain user_activity table for a range-partitioned copy."""
+    cur.execute("SELECT pg_get_serial_sequence('user_activity', 'activity_id')")
+    seq = cur.fetchone()[0]
+    cur.execute("ALTER TABLE user_activity RENAME TO user_activity_legacy")
+    # Keep the existing id sequence so activity_ids stay unique across the swap
+    cur.execute(f"ALTER SEQUENCE {seq} OWNED BY NONE")
+    cur.execute(f'''CREATE TABLE user_activity (
+            activity_id     INTEGER NOT NULL DEFAULT nextval('{seq}'),
+            user_id         INTEGER REFERENCES users(user_id),
+            login_time      TIMESTAMP NOT NULL,
+            logout_time     TIMESTAMP,
+            session_minutes INTEGER DEFAULT 0
+        ) PARTITION BY RANGE (login_time)''')
+    cur.execute(f"ALTER SEQUENCE {seq} OWNED BY user_activity.activity_id")
+    # Safety net for rows outside every monthly partition
+    cur.execute("CREATE TABLE user_activity_default PARTITION OF user_activity DEFAULT")
+
+    this_month = date.today().replace(day=1)
+    cur.execute("SELECT MIN(login_time)::date FROM user_activity_legacy")
+    oldest = cur.fetchone()[0] or this_month
+    month = min(oldest.replace(day=1), add_months(this_month, -ACTIVITY_PARTITION_MONTHS_BACK))
+    while month <= add_months(this_month, ACTIVITY_PARTITION_MONTHS_AHEAD):
+        create_activity_partition(cur, month)
+        month = add_months(month, 1)
+
+    cur.execute("""
+        INSERT INTO user_activity (activity_id, user_id, login_time, logout_time, session_minutes)
+        SELECT activity_id, user_id, COALESCE(login_time, logout_time, CURRENT_TIMESTAMP),
+               logout_time, session_minutes
+        FROM user_activity_legacy
+    """)
+    cur.execute("DROP TABLE user_activity_legacy")
+    # The partition key has to be part of the primary key
+    cur.execute("ALTER TABLE user_activity ADD PRIMARY KEY (activity_id, login_time)")
+    for ddl in HOT_PATH_INDEXES:
+        if "ON user_activity (" in ddl:
+            cur.execute(ddl)
+    cur.execute("ANALYZE user_activity")
+
+
+# ── Daily activity rollups ──
+# Analytics read these for every day up to rollup_state.rolled_through and
+# only touch raw user_activity rows after it. Re-running a day range is
+# idempotent: its days are deleted and re-aggregated.
+ACTIVITY_ROLLUP_SQL = [
+    "DELETE FROM activity_daily_user WHERE day BETWEEN %(start)s AND %(end)s",
+    """
+    INSERT INTO activity_daily_user (day, user_id, sessions, minutes, last_login)
+    SELECT login_time::date, user_id, COUNT(*),
+           COALESCE(SUM(session_minutes), 0), MAX(login_time)
+    FROM user_activity
+    WHERE login_time >= %(start)s AND login_time < %(end)s::date + 1
+      AND user_id IS NOT NULL
+    GROUP BY 1, 2
+    """,
+    "DELETE FROM activity_daily_hour WHERE day BETWEEN %(start)s AND %(end)s",
+    """
+    INSERT INTO activity_daily_hour (day, hour, sessions, minutes)
+    SELECT login_time::date, EXTRACT(HOUR FROM login_time), COUNT(*),
+           COALESCE(SUM(session_minutes), 0)
+    FROM user_activity
+    WHERE login_time >= %(start)s AND login_time < %(end)s::date + 1
+    GROUP BY 1, 2
+    """,
+    """
+    INSERT INTO rollup_state (name, rolled_through) VALUES ('user_activity', %(end)s)
+    ON CONFLICT (name) DO UPDATE
+        SET rolled_through = GREATEST(rollup_state.rolled_through, EXCLUDED.rolled_through)
+    """,
+]
+
+# session_minutes is only set at logout but counted on the login day, so a
+# rollup run also re-rolls older days with sessions closed since the last
+# run. This moves that logout high-water mark; the slack covers logouts the
+# activity writer stamped earlier but had not flushed yet.
+ACTIVITY_LOGOUT_MARK_SQL = """
+    UPDATE rollup_state SET logouts_through = CURRENT_TIMESTAMP - INTERVAL '10 minutes'
+    WHERE name = 'user_activity'
+"""
+
+# Last day covered by the rollups ('-infinity' before the first rollup run),
+# spliced into the analytics queries in backend.py.
+ACTIVITY_ROLLED_THROUGH = """(
+    SELECT COALESCE(MAX(rolled_through), '-infinity'::date)
+    FROM rollup_state WHERE name = 'user_activity'
+)"""
+
+
+# Recomputes every user_summary row: used by `python database.py --rebuild-summary`
+# and after bulk loads / seeding. Watch time comes from the rollups up to the
+# watermark plus raw rows after it, so it survives raw-partition retention.
+USER_SUMMARY_REBUILD_SQL = [
+    "LOCK TABLE subscriptions, user_activity, activity_daily_user, rollup_state IN SHARE MODE",
+    f"""
+    INSERT INTO user_summary
+        (user_id, lifetime_spend, watch_minutes, subscription_count, last_login, updated_at)
+    SELECT u.user_id,
+           COALESCE(s.spend, 0), COALESCE(a.minutes, 0), COALESCE(s.subs, 0),
+           a.last_login, CURRENT_TIMESTAMP
+    FROM users u
+    LEFT JOIN (
+        SELECT user_id, SUM(amount) AS spend, COUNT(*) AS subs
+        FROM subscriptions GROUP BY user_id
+    ) s ON s.user_id = u.user_id
+    LEFT JOIN (
+        SELECT user_id, SUM(minutes) AS minutes, MAX(last_login) AS last_login
+        FROM (
+            SELECT user_id, minutes, last_login FROM activity_daily_user
+            WHERE day <= {ACTIVITY_ROLLED_THROUGH}
+            UNION ALL
+            SELECT user_id, session_minutes, login_time FROM user_activity
+            WHERE login_time >= {ACTIVITY_ROLLED_THROUGH} + 1
+        ) act GROUP BY user_id
+    ) a ON a.user_id = u.user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        lifetime_spend     = EXCLUDED.lifetime_spend,
+        watch_minutes      = EXCLUDED.watch_minutes,
+        subscription_count = EXCLUDED.subscription_count,
+        last_login         = EXCLUDED.last_login,
+        updated_at         = EXCLUDED.updated_at
+    """,
+]
+
+
+# ── Daily revenue ledger rollup (see backend._bump_revenue_daily) ──
+# One row per (day, plan, payment_type) of SUCCESS payments. Recomputed in
+# full for the migration backfill and after seeding; the app keeps it
+# current incrementally on every payment insert.
+REVENUE_DAILY_REBUILD_SQL = [
+    "LOCK TABLE payments IN SHARE MODE",
+    "DELETE FROM revenue_daily",
+    """
+    INSERT INTO revenue_daily (day, plan_name, payment_type, txn_count, revenue)
+    SELECT payment_date::date, COALESCE(plan_name, 'Unknown'), COALESCE(payment_type, 'NEW'),
+           COUNT(*), COALESCE(SUM(amount), 0)
+    FROM payments
+    WHERE payment_status = 'SUCCESS' AND payment_date IS NOT NULL
+    GROUP BY 1, 2, 3
+    """,
+]
+
+
+def rollup_activity_range(cur, start, end):
+    """Re-aggregates the days start..end (inclusive) into the rollup tables."""
+    if start is None or start > end:
+        return False
+    for stmt in ACTIVITY_ROLLUP_SQL:
+        cur.execute(stmt, {"start": start, "end": end})
+    return True
+
+
+def _backfill_activity_rollups(cur):
+    cur.execute("SELECT MIN(login_time)::date FROM user_activity")
+    rollup_activity_range(cur, cur.fetchone()[0], date.today() - timedelta(days=1))
+
+
+# ── Content sync (load_kaggle_content.py --sync) ──
+# Catalog columns that make up a title's content hash; show_id is the key.
+CONTENT_HASH_COLUMNS = [
+    "content_type", "title", "director", "cast_members", "country", "date_added",
+    "release_year", "rating", "duration", "genre", "description",
+]
+
+
+def content_hash_sql(alias=""):
+    """md5 over the catalog columns of `alias` (immutable, so usable in a generated column)."""
+    parts = [f"COALESCE({alias}{c}::text, '')" for c in CONTENT_HASH_COLUMNS]
+    return "md5(" + " || E'\\x1f' || ".join(parts) + ")"
+
+
+# ── Content search (ContentManager.browse_content) ──
+# Weighted full-text document: title (A) > cast (B) > director (C) > description (D).
+# Being a generated column, every loader path (COPY, --sync upsert) keeps it current.
+CONTENT_SEARCH_CONFIG = "english"
+CONTENT_SEARCH_WEIGHTS = [
+    ("title", "A"), ("cast_members", "B"), ("director", "C"), ("description", "D"),
+]
+
+
+def content_search_vector_sql():
+    return " || ".join(
+        f"setweight(to_tsvector('{CONTENT_SEARCH_CONFIG}', COALESCE({column}, '')), '{weight}')"
+        for column, weight in CONTENT_SEARCH_WEIGHTS
+    )
+
+
+# Browse order (newest release first, then title) as an all-ascending key, so a
+# keyset page is one row comparison `(key) > (cursor)` on idx_content_browse.
+# Undated titles sort last. backend.ContentManager must use these exact expressions.
+CONTENT_BROWSE_KEY = ["-COALESCE(release_year, -1)", "COALESCE(title, '')", "content_id"]
+
+
+# Catalog version stamp: bumped by every load that changes content, so
+# in-process copies (catalog.ContentCatalog) know when to reload.
+CONTENT_VERSION_BUMP_SQL = """
+    INSERT INTO catalog_meta (name, version, updated_at) VALUES ('content', 1, CURRENT_TIMESTAMP)
+    ON CONFLICT (name) DO UPDATE
+    SET version = catalog_meta.version + 1, updated_at = EXCLUDED.updated_at
+"""
+
+
+# Trigram indexes behind the substring (ILIKE) and typo-tolerant search modes.
+# They need the pg_trgm contrib extension, which not every server ships.
+CONTENT_TRIGRAM_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_content_title_trgm ON content USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_content_cast_trgm ON content USING gin (cast_members gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_content_director_trgm ON content USING gin (director gin_trgm_ops)",
+]
+
+
+def enable_content_trigram(cur):
+    """
+    Installs pg_trgm and the trigram indexes when the server offers the
+    extension. Returns True if enabled; otherwise the migration carries on.
+    """
+    cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    if cur.fetchone() is None:
+        print("ℹ️  pg_trgm is not available on this server — substring search stays unindexed.")
+        print("   Install the postgresql contrib package, then run:  python database.py --enable-trigram")
+        return False
+    cur.execute("SAVEPOINT enable_trgm")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT enable_trgm")
+        print(f"⚠️  Could not create the pg_trgm extension: {e}")
+        return False
+    for stmt in CONTENT_TRIGRAM_INDEXES:
+        cur.execute(stmt)
+    return True
+
+
+# ── Genres: content.genre (Kaggle's comma-separated listed_in) as a bridge table ──
+def refresh_content_genres(cur, only=None):
+    """
+    Re-derives genres / content_genres from content.genre. `only` is an
+    optional subquery of content_ids to limit the refresh to (the rows a
+    sync changed); without it every link is rebuilt.
+    """
+    scope = f"c.content_id IN ({only})" if only else "TRUE"
+    cur.execute(f"""
+        INSERT INTO genres (name)
+        SELECT DISTINCT btrim(g)
+        FROM content c, regexp_split_to_table(c.genre, ',') g
+        WHERE {scope} AND btrim(g) <> ''
+        ON CONFLICT (name) DO NOTHING
+    """)
+    if only:
+        cur.execute(f"DELETE FROM content_genres cg USING content c "
+                    f"WHERE cg.content_id = c.content_id AND {scope}")
+    else:
+        cur.execute("DELETE FROM content_genres")
+    cur.execute(f"""
+        INSERT INTO content_genres (content_id, genre_id)
+        SELECT DISTINCT c.content_id, gn.genre_id
+        FROM content c, regexp_split_to_table(c.genre, ',') g
+        JOIN genres gn ON gn.name = btrim(g)
+        WHERE {scope}
+    """)
+    return cur.rowcount
+
+
+MIGRATIONS = [
+    (1, "baseline schema", [
+        '''CREATE TABLE IF NOT EXISTS visitors (
+            visitor_id SERIAL PRIMARY KEY,
+            visit_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''CREATE TABLE IF NOT EXISTS users (
+            user_id SERIAL PRIMARY KEY,
+            fullname VARCHAR(100),
+            email VARCHAR(100) UNIQUE,
+            password VARCHAR(255),
+            mobile VARCHAR(15),
+            age INTEGER,
+            country VARCHAR(50),
+            role VARCHAR(20) DEFAULT 'USER',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            gender VARCHAR(10),
+            dob DATE,
+            favorite_genre VARCHAR(50),
+            profile_pic_url TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS subscriptions (
+            subscription_id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(user_id),
+            service_type VARCHAR(50),
+            plan_name VARCHAR(50),
+            amount DECIMAL(10,2),
+            start_date TIMESTAMP,
+            end_date TIMESTAMP,
+            status VARCHAR(20) DEFAULT 'ACTIVE',
+            auto_renewal BOOLEAN DEFAULT FALSE
+        )''',
+        '''CREATE TABLE IF NOT EXISTS payments (
+            payment_id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(user_id),
+            subscription_id INTEGER REFERENCES subscriptions(subscription_id),
+            plan_name VARCHAR(50),
+            amount DECIMAL(10,2),
+            payment_type VARCHAR(20) DEFAULT 'NEW',
+            payment_status VARCHAR(20) DEFAULT 'SUCCESS',
+            payment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''CREATE TABLE IF NOT EXISTS user_activity (
+            activity_id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(user_id),
+            login_time TIMESTAMP,
+            logout_time TIMESTAMP,
+            session_minutes INTEGER DEFAULT 0
+        )''',
+        '''CREATE TABLE IF NOT EXISTS feedback (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(user_id),
+            request_content TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+
+        # ── Content table — stores Netflix movies & shows from Kaggle ──
+        '''CREATE TABLE IF NOT EXISTS content (
+            content_id   SERIAL PRIMARY KEY,
+            show_id      VARCHAR(20),
+            content_type VARCHAR(10),          -- 'Movie' or 'TV Show'
+            title        VARCHAR(300),
+            director     TEXT,
+            cast_members TEXT,
+            country      VARCHAR(200),
+            date_added   VARCHAR(50),
+            release_year INTEGER,
+            rating       VARCHAR(20),          -- PG-13, TV-MA, etc.
+            duration     VARCHAR(30),          -- '90 min' or '3 Seasons'
+            genre        VARCHAR(200),         -- listed_in column from Kaggle
+            description  TEXT,
+            created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+
+        # ── Mutual Connection Groups ──────────────────────────
+        # Each row = one group of users sharing a plan
+        '''CREATE TABLE IF NOT EXISTS mutual_groups (
+            group_id     SERIAL PRIMARY KEY,
+            plan_name    VARCHAR(50),
+            full_price   DECIMAL(10,2),
+            split_price  DECIMAL(10,2),
+            max_members  INTEGER DEFAULT 4,
+            status       VARCHAR(20) DEFAULT 'FORMING',
+            created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+
+        # ── Per-user invite & membership record ───────────────
+        # invite_status: PENDING → ACCEPTED / DECLINED
+        # member_status: ACTIVE (after group forms) / LEFT
+        '''CREATE TABLE IF NOT EXISTS mutual_invites (
+            invite_id     SERIAL PRIMARY KEY,
+            user_id       INTEGER REFERENCES users(user_id),
+            group_id      INTEGER REFERENCES mutual_groups(group_id),
+            plan_name     VARCHAR(50),
+            split_price   DECIMAL(10,2),
+            admin_message TEXT,
+            invite_status VARCHAR(20) DEFAULT 'PENDING',
+            member_status VARCHAR(20) DEFAULT 'NONE',
+            sent_at       TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            responded_at  TIMESTAMP
+        )''',
+
+        # ── Columns added after the first release (older databases) ──
+        "ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS auto_renewal BOOLEAN DEFAULT FALSE",
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS gender VARCHAR(10)",
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS dob DATE",
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS favorite_genre VARCHAR(50)",
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS profile_pic_url TEXT",
+
+        # ── Admin account ─────────────────────────────────────
+        ("""
+            INSERT INTO users (fullname, email, password, role)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (email) DO NOTHING
+        """, ("System Admin", "admin", ADMIN_PASS_HASH, "ADMIN")),
+    ]),
+
+    (2, "indexes for hot lookup predicates", HOT_PATH_INDEXES + [
+        "ANALYZE subscriptions",
+        "ANALYZE user_activity",
+        "ANALYZE payments",
+        "ANALYZE mutual_invites",
+    ]),
+
+    (3, "user_summary table with backfill", [
+        '''CREATE TABLE IF NOT EXISTS user_summary (
+            user_id            INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+            lifetime_spend     DECIMAL(12,2) DEFAULT 0,
+            watch_minutes      BIGINT DEFAULT 0,
+            subscription_count INTEGER DEFAULT 0,
+            last_login         TIMESTAMP,
+            updated_at         TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+    ] + _USER_SUMMARY_BACKFILL_SQL),
+
+    (4, "monthly range partitions for user_activity", [
+        _partition_user_activity,
+    ]),
+
+    (5, "daily activity rollups", [
+        # Per user per day: watch time, low-usage and last-login reports
+        '''CREATE TABLE IF NOT EXISTS activity_daily_user (
+            day        DATE,
+            user_id    INTEGER,
+            sessions   INTEGER DEFAULT 0,
+            minutes    BIGINT DEFAULT 0,
+            last_login TIMESTAMP,
+            PRIMARY KEY (day, user_id)
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_activity_daily_user_user ON activity_daily_user (user_id, day)",
+        # Per hour-of-day per day: peak hours and average session length
+        '''CREATE TABLE IF NOT EXISTS activity_daily_hour (
+            day      DATE,
+            hour     SMALLINT,
+            sessions INTEGER DEFAULT 0,
+            minutes  BIGINT DEFAULT 0,
+            PRIMARY KEY (day, hour)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS rollup_state (
+            name           VARCHAR(50) PRIMARY KEY,
+            rolled_through DATE
+        )''',
+        _backfill_activity_rollups,
+    ]),
+
+    (6, "revenue_daily rollup with backfill", [
+        '''CREATE TABLE IF NOT EXISTS revenue_daily (
+            day          DATE,
+            plan_name    VARCHAR(50),
+            payment_type VARCHAR(20),
+            txn_count    INTEGER DEFAULT 0,
+            revenue      DECIMAL(14,2) DEFAULT 0,
+            PRIMARY KEY (day, plan_name, payment_type)
+        )''',
+    ] + REVENUE_DAILY_REBUILD_SQL),
+
+    (7, "content show_id key, content hash and tombstones", [
+        # show_id becomes the natural key: blanks are no key, duplicates keep the oldest row
+        "UPDATE content SET show_id = NULL WHERE show_id = ''",
+        '''DELETE FROM content c
+           USING content keep
+           WHERE c.show_id = keep.show_id AND c.content_id > keep.content_id''',
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_content_show_id ON content (show_id)",
+        f'''ALTER TABLE content ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32)
+            GENERATED ALWAYS AS ({content_hash_sql()}) STORED''',
+        # Set when a sync no longer finds the title in the CSV; readers skip these rows
+        "ALTER TABLE content ADD COLUMN IF NOT EXISTS removed_at TIMESTAMP",
+        "ANALYZE content",
+    ]),
+
+    (8, "weighted full-text search on content", [
+        f'''ALTER TABLE content ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS ({content_search_vector_sql()}) STORED''',
+        "CREATE INDEX IF NOT EXISTS idx_content_search ON content USING gin (search_vector)",
+        enable_content_trigram,
+        "ANALYZE content",
+    ]),
+
+    (9, "genres bridge table", [
+        '''CREATE TABLE IF NOT EXISTS genres (
+            genre_id SERIAL PRIMARY KEY,
+            name     VARCHAR(100) UNIQUE NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS content_genres (
+            content_id INTEGER REFERENCES content(content_id) ON DELETE CASCADE,
+            genre_id   INTEGER REFERENCES genres(genre_id) ON DELETE CASCADE,
+            PRIMARY KEY (content_id, genre_id)
+        )''',
+        # Genre filter: all titles of one genre
+        "CREATE INDEX IF NOT EXISTS idx_content_genres_genre ON content_genres (genre_id, content_id)",
+        refresh_content_genres,
+        "ANALYZE genres",
+        "ANALYZE content_genres",
+    ]),
+    (10, "browse-order index for keyset pagination of content", [
+        "CREATE INDEX IF NOT EXISTS idx_content_browse ON content ("
+        + ", ".join(f"({k})" for k in CONTENT_BROWSE_KEY)
+        + ") WHERE removed_at IS NULL",
+    ]),
+
+    (11, "catalog_meta version stamp", [
+        '''CREATE TABLE IF NOT EXISTS catalog_meta (
+            name       VARCHAR(50) PRIMARY KEY,
+            version    BIGINT NOT NULL DEFAULT 1,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        CONTENT_VERSION_BUMP_SQL,
+    ]),
+
+    (12, "content watch history", [
+        # Titles a user marked as watched; feeds their recommendations. Keyed on show_id,
+        # which survives catalog reloads: --force renumbers content_id, and no FK to
+        # content lets the reload's TRUNCATE reach this user data
+        '''CREATE TABLE IF NOT EXISTS content_views (
+            user_id    INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
+            show_id    VARCHAR(20) NOT NULL,
+            viewed_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, show_id)
+        )''',
+    ]),
+
+    (13, "precomputed content neighbours", [
+        # Filled by `python recommender.py`; the primary key is the "more like this" lookup
+        '''CREATE TABLE IF NOT EXISTS content_neighbors (
+            content_id  INTEGER REFERENCES content(content_id) ON DELETE CASCADE,
+            rank        SMALLINT NOT NULL,
+            neighbor_id INTEGER NOT NULL REFERENCES content(content_id) ON DELETE CASCADE,
+            score       REAL NOT NULL,
+            PRIMARY KEY (content_id, rank)
+        )''',
+    ]),
+
+    (14, "numeric duration and date_added columns on content", [
+        "ALTER TABLE content ADD COLUMN IF NOT EXISTS duration_minutes INTEGER",
+        "ALTER TABLE content ADD COLUMN IF NOT EXISTS season_count INTEGER",
+        "ALTER TABLE content ADD COLUMN IF NOT EXISTS added_on DATE",
+        # Backfill with the same rules the loader's clean_titles() applies to new rows:
+        # '90 min' / '3 Seasons' / 'September 25, 2021', anything else stays NULL
+        r"""UPDATE content SET
+            duration_minutes = CASE WHEN duration ~ '^\d+ min$'
+                                    THEN split_part(duration, ' ', 1)::int END,
+            season_count     = CASE WHEN duration ~ '^\d+ Seasons?$'
+                                    THEN split_part(duration, ' ', 1)::int END,
+            added_on         = CASE WHEN date_added ~ '^(January|February|March|April|May|June|July|August|September|October|November|December) \d{1,2}, \d{4}$'
+                                    THEN to_date(date_added, 'FMMonth FMDD, YYYY') END""",
+        # Range filters of ContentManager.browse_content (live titles only, like idx_content_browse)
+        "CREATE INDEX IF NOT EXISTS idx_content_duration_minutes ON content (duration_minutes) WHERE removed_at IS NULL",
+        "CREATE INDEX IF NOT EXISTS idx_content_season_count ON content (season_count) WHERE removed_at IS NULL",
+        "CREATE INDEX IF NOT EXISTS idx_content_added_on ON content (added_on) WHERE removed_at IS NULL",
+        "ANALYZE content",
+        CONTENT_VERSION_BUMP_SQL,       # in-process catalogs reload with the new columns
+    ]),
+
+    (15, "logout high-water mark for activity rollups", [
+        # NULL until the next rollup run, which then re-rolls every day with a closed session once
+        "ALTER TABLE rollup_state ADD COLUMN IF NOT EXISTS logouts_through TIMESTAMP",
+        # Sessions closed since the mark (DB.rollup_activity)
+        "CREATE INDEX IF NOT EXISTS idx_user_activity_logout_time ON user_activity (logout_time)",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
@@ -0,0 +1,350 @@
+"""
+Content-based recommendations from a sparse title-feature matrix.
+
+Every live title becomes one row of a SciPy CSR matrix:
+  description  TF-IDF over its words (stop words and one-off words dropped)
+  genre, cast, director, country, rating   one-hot (comma lists split)
+Each block is L2-normalised and scaled by FEATURE_WEIGHTS, then the whole
+row is normalised, so a dot product of two rows is their cosine similarity.
+
+The RECOMMENDER_NEIGHBORS most similar titles of every title are found once
+with batched sparse products (X[batch] @ X.T, so the n x n similarity is
+never held whole). A user's picks (profile genres + watched titles) are
+one sparse matrix-vector product.
+
+The model is built from the in-process catalog (catalog.py) and saved to
+RECOMMENDER_CACHE_DIR with the catalog's content version, so a restart
+loads it from disk. When the version moves it is rebuilt on a background
+thread; requests keep using the previous model until the new one is ready.
+
+Run it as an offline job after every content load: it builds the model
+and stores each title's neighbours in the content_neighbors table, which
+the title details read with one primary-key lookup (no model at request
+time). The table is stamped with the content version in catalog_meta.
+    python recommender.py
+"""
+
+import io
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+RECOMMENDER_NEIGHBORS = 20
+RECOMMENDER_BATCH_ROWS = 1024
+RECOMMENDER_CACHE_DIR = os.path.join(tempfile.gettempdir(), "subscription_recommender")
+# Bump when the features change, so models saved by older code are rebuilt
+RECOMMENDER_FORMAT = 1
+
+FEATURE_WEIGHTS = {
+    "description": 1.0,
+    "genre":       1.5,
+    "cast":        0.8,
+    "director":    0.6,
+    "country":     0.3,
+    "rating":      0.2,
+}
+# Description words in more than this share of titles say nothing about similarity
+MAX_TERM_SHARE = 0.4
+
+STOP_WORDS = frozenset("""
+    a about after against all also an and any are as at be before being between both but by
+    can could did do does during each for from had has have he her hers him his how if in
+    into is it its just more most no not now of off on once one only or other our out over
+    own same she so some such than that the their them then there these they this those
+    through to too two under until up very was we were what when where which while who
+    whom why will with would you your
+""".split())
+
+
+def _tokens(text):
+    return [w for w in re.findall(r"[a-z]+", (text or "").lower())
+            if len(w) > 2 and w not in STOP_WORDS]
+
+
+def _split_list(text):
+    return [v.strip() for v in (text or "").split(",") if v.strip()]
+
+
+def _counts(lists, n):
+    """(n x vocab) CSR of how often each row's list holds each value, and the vocab."""
+    s = pd.Series(lists).explode().dropna()
+    codes, vocab = pd.factorize(s.to_numpy())
+    m = sparse.csr_matrix((np.ones(len(codes), dtype=np.float32), (s.index.to_numpy(), codes)),
+                          shape=(n, len(vocab)))
+    m.sum_duplicates()
+    return m, vocab
+
+
+def _normalize_rows(m):
+    norms = np.sqrt(np.asarray(m.multiply(m).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags((1.0 / norms).astype(np.float32)) @ m
+
+
+def build_features(columns):
+    """
+    Feature matrix (CSR, float32, unit rows) of catalog column arrays, and
+    genre name -> column index (for profile vectors).
+    """
+    n = len(columns["content_id"])
+    blocks, genre_columns, offset = [], {}, 0
+
+    # Description: sublinear TF x smoothed IDF, keeping words two or more titles share
+    tf, _ = _counts([_tokens(d) for d in columns["description"]], n)
+    df = np.bincount(tf.indices, minlength=tf.shape[1])
+    keep = np.flatnonzero((df >= 2) & (df <= MAX_TERM_SHARE * n))
+    tf, df = tf[:, keep], df[keep]
+    tf.data = 1.0 + np.log(tf.data)
+    idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+    described = tf @ sparse.diags(idf.astype(np.float32))
+    blocks.append(("description", described))
+
+    for name, column in (("genre", "genre"), ("cast", "cast_members"),
+                         ("director", "director"), ("country", "country")):
+        m, vocab = _counts([_split_list(v) for v in columns[column]], n)
+        if name == "genre":
+            genre_columns = {g: i for i, g in enumerate(vocab)}
+        blocks.append((name, m))
+    m, _ = _counts([[r] if r else [] for r in columns["rating"]], n)
+    blocks.append(("rating", m))
+
+    scaled = []
+    for name, m in blocks:
+        if name == "genre":
+            genre_columns = {g: offset + i for g, i in genre_columns.items()}
+        offset += m.shape[1]
+        scaled.append(_normalize_rows(m) * np.float32(np.sqrt(FEATURE_WEIGHTS[name])))
+    matrix = _normalize_rows(sparse.hstack(scaled, format="csr")).tocsr().astype(np.float32)
+    return matrix, genre_columns
+
+
+def nearest_neighbors(matrix, k=RECOMMENDER_NEIGHBORS, batch_rows=RECOMMENDER_BATCH_ROWS):
+    """
+    Top-k most similar rows of every row (itself excluded), best first.
+    Returns (neighbors, scores), both n x k. One batch_rows x n block of
+    scores is dense at a time.
+    """
+    n = matrix.shape[0]
+    k = max(0, min(k, n - 1))
+    neighbors = np.zeros((n, k), dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    if not k:
+        return neighbors, scores
+    transposed = matrix.T.tocsr()
+    for start in range(0, n, batch_rows):
+        stop = min(start + batch_rows, n)
+        block = (matrix[start:stop] @ transposed).toarray()
+        block[np.arange(stop - start), np.arange(start, stop)] = -1.0
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        neighbors[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+    return neighbors, scores
+
+
+class RecommendationModel:
+    """
+    Feature matrix + precomputed neighbours of one catalog version. Positions
+    are rows of this model (ids[position] is the content_id), which match the
+    catalog's positions only while the catalog is still at `version`.
+    """
+
+    def __init__(self, version, ids, matrix, genre_columns, neighbors, scores):
+        self.version = version
+        self.ids = ids
+        self.position_of = {int(cid): i for i, cid in enumerate(ids)}
+        self.matrix = matrix
+        self.genre_columns = genre_columns
+        self.neighbors = neighbors
+        self.scores = scores
+
+    @classmethod
+    def build(cls, snapshot):
+        matrix, genre_columns = build_features(snapshot.columns)
+        neighbors, scores = nearest_neighbors(matrix)
+        ids = np.asarray(snapshot.columns["content_id"], dtype=np.int64)
+        return cls(snapshot.version, ids, matrix, genre_columns, neighbors, scores)
+
+    def for_profile(self, liked=(), genres=(), k=10):
+        """
+        Best positions for a taste profile: the titles at `liked` positions
+        (watched) plus the profile genres. Liked titles are not returned.
+        Empty when the profile has no usable features.
+        """
+        profile = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        if len(liked):
+            profile += np.asarray(self.matrix[list(liked)].mean(axis=0)).ravel()
+        genre_cols = [self.genre_columns[g] for g in genres if g in self.genre_columns]
+        if genre_cols:
+            # Same weight as the genre block of one title
+            profile[genre_cols] += np.sqrt(FEATURE_WEIGHTS["genre"] / len(genre_cols) / sum(FEATURE_WEIGHTS.values()))
+        if not profile.any():
+            return np.empty(0, dtype=np.int32)
+        scores = self.matrix @ profile
+        scores[list(liked)] = 0.0
+        k = min(k, int((scores > 0).sum()))
+        if not k:
+            return np.empty(0, dtype=np.int32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    # ── Disk cache ──────────────────────────────────────────
+    def save(self, path):
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        names = list(self.genre_columns)
+        np.savez(tmp, format=RECOMMENDER_FORMAT, version=self.version, ids=self.ids,
+                 data=self.matrix.data, indices=self.matrix.indices, indptr=self.matrix.indptr,
+                 shape=np.array(self.matrix.shape), genre_names=np.array(names, dtype=str),
+                 genre_cols=np.array([self.genre_columns[g] for g in names], dtype=np.int64),
+                 neighbors=self.neighbors, scores=self.scores)
+        os.replace(tmp, path)       # readers never see a half-written model
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            if int(f["format"]) != RECOMMENDER_FORMAT:
+                return None
+            matrix = sparse.csr_matrix((f["data"], f["indices"], f["indptr"]), shape=tuple(f["shape"]))
+            genre_columns = dict(zip(f["genre_names"].tolist(), f["genre_cols"].tolist()))
+            return cls(int(f["version"]), f["ids"], matrix, genre_columns, f["neighbors"], f["scores"])
+
+
+class ContentRecommender:
+    """
+    Keeps the model in step with the catalog off the request path: a new
+    catalog version starts a build (or disk-cache load) on a worker thread,
+    and model() keeps returning the previous model until it is ready.
+    """
+
+    def __init__(self, catalog, cache_dir=RECOMMENDER_CACHE_DIR):
+        self._catalog = catalog
+        self.cache_dir = cache_dir
+        self._model = None
+        self._started = None               # catalog version of the last build started
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()  # one build (and cache write) at a time
+        catalog.on_reload(self.refresh)
+
+    @property
+    def path(self):
+        return os.path.join(self.cache_dir, "content_model.npz")
+
+    def model(self):
+        """
+        The newest ready model, or None before the first one is. Never waits
+        for a build, so it may be for an older catalog version than the
+        current snapshot: match its rows to the catalog by model.ids.
+        """
+        snap = self._catalog.snapshot()
+        if snap is not None:
+            self.refresh(snap)
+        return self._model
+
+    def refresh(self, snap):
+        """Starts a background build for this snapshot, unless one was already started."""
+        with self._lock:
+            if self._started == snap.version:
+                return
+            self._started = snap.version
+        threading.Thread(target=self._build_in_background, args=(snap,),
+                         name="recommender-build", daemon=True).start()
+
+    def _build_in_background(self, snap):
+        model = self.build(snap)
+        with self._lock:
+            # Versions only go up; never replace a newer model with a late older build
+            if model is not None and (self._model is None or model.version >= self._model.version):
+                self._model = model
+
+    def build(self, snap):
+        """The model for a snapshot: from the disk cache, else built (and saved). None if the build fails."""
+        with self._build_lock:
+            model = None
+            try:
+                if os.path.exists(self.path):
+                    model = RecommendationModel.load(self.path)
+            except Exception as e:
+                print(f"⚠️  Recommendation model cache unreadable, rebuilding: {e}")
+            # The ids check also catches a cache written for another database
+            if (model is None or model.version != snap.version
+                    or not np.array_equal(model.ids, snap.columns["content_id"].astype(np.int64))):
+                try:
+                    model = RecommendationModel.build(snap)
+                except Exception as e:
+                    print(f"❌ Recommendation model build failed: {e}")
+                    return None
+                try:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    model.save(self.path)
+                except OSError as e:
+                    print(f"⚠️  Could not cache the recommendation model: {e}")
+            return model
+
+
+def store_neighbors(cur, model, limit=RECOMMENDER_NEIGHBORS):
+    """
+    Replaces content_neighbors with the model's top `limit` neighbours of
+    every title, in one transaction (readers keep the old rows until commit).
+    Refuses if the catalog moved on since the model was built. Returns rows written.
+    """
+    cur.execute("SELECT version FROM catalog_meta WHERE name = 'content' FOR SHARE")
+    row = cur.fetchone()
+    if (row[0] if row else 0) != model.version:
+        raise RuntimeError(f"content changed since the model was built (version {model.version}); re-run")
+
+    k = min(limit, model.neighbors.shape[1])
+    found = model.scores[:, :k] > 0
+    source = np.broadcast_to(np.arange(len(model.ids))[:, None], found.shape)[found]
+    ranks = np.broadcast_to(np.arange(1, k + 1), found.shape)[found]
+    df = pd.DataFrame({
+        "content_id":  model.ids[source],
+        "rank":        ranks,
+        "neighbor_id": model.ids[model.neighbors[:, :k][found]],
+        "score":       model.scores[:, :k][found].round(5),
+    })
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    cur.execute("DELETE FROM content_neighbors")
+    cur.copy_expert("COPY content_neighbors (content_id, rank, neighbor_id, score) FROM STDIN WITH (FORMAT csv)", buf)
+    cur.execute("""
+        INSERT INTO catalog_meta (name, version, updated_at) VALUES ('content_neighbors', %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (name) DO UPDATE SET version = EXCLUDED.version, updated_at = EXCLUDED.updated_at
+    """, (model.version,))
+    cur.execute("ANALYZE content_neighbors")
+    return len(df)
+
+
+if __name__ == "__main__":
+    # Offline job: (re)build the model for the current catalog and refresh content_neighbors
+    from backend import content_catalog, content_recommender as recommender, db
+
+    t0 = time.perf_counter()
+    snap = content_catalog.snapshot()
+    if snap is None:
+        print("❌ Could not load the content catalog. Run database.py and load_kaggle_content.py first.")
+        sys.exit(1)
+    # Shares a lock with the background build the catalog load started; the later one reads the disk cache
+    model = recommender.build(snap)
+    if model is None:
+        sys.exit(1)
+    print(f"✅ Recommendation model for {len(model.ids):,} titles (version {model.version}): "
+          f"{model.matrix.shape[1]:,} features, ready in {time.perf_counter() - t0:.1f}s")
+    print(f"   Cached at {recommender.path}")
+
+    t0 = time.perf_counter()
+    try:
+        with db.cursor() as cur:
+            written = store_neighbors(cur, model)
+    except Exception as e:
+        print(f"❌ content_neighbors not updated: {e}")
+        sys.exit(1)
+    print(f"✅ content_neighbors: {written:,} rows written in {time.perf_counter() - t0:.1f}s")
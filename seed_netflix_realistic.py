@@ -4,6 +4,8 @@ import hashlib
 from datetime import datetime, timedelta
 import sys
 
+from migrations import USER_SUMMARY_REBUILD_SQL, REVENUE_DAILY_REBUILD_SQL, rollup_activity_range
+
 # --- CONFIGURATION ---
 DB_PASS = "shrey28"
 DB_NAME = "sub_system"
@@ -85,6 +87,7 @@ try:
     # Delete order respects foreign key constraints:
     # mutual_invites -> payments -> user_activity -> subscriptions -> feedback -> users
     #
+    cleared_from = None
     if force_check and existing_count > 0:
         print("--------------------------------------------------")
         print("FORCE MODE: Removing ONLY seeded fake users (mobile = 9999988888)...")
@@ -96,8 +99,12 @@ try:
 
         if seeded_ids:
             ids_str = ','.join(str(i) for i in seeded_ids)
+            # First day holding removed sessions: step 5b re-rolls the hourly rollup from there
+            cursor.execute(f"SELECT MIN(login_time)::date FROM user_activity WHERE user_id IN ({ids_str})")
+            cleared_from = cursor.fetchone()[0]
             cursor.execute(f"DELETE FROM mutual_invites WHERE user_id IN ({ids_str})")
             cursor.execute(f"DELETE FROM payments      WHERE user_id IN ({ids_str})")
+            cursor.execute(f"DELETE FROM activity_daily_user WHERE user_id IN ({ids_str})")
             cursor.execute(f"DELETE FROM user_activity WHERE user_id IN ({ids_str})")
             cursor.execute(f"DELETE FROM subscriptions WHERE user_id IN ({ids_str})")
             cursor.execute(f"DELETE FROM feedback      WHERE user_id IN ({ids_str})")
@@ -259,6 +266,20 @@ try:
         conn.commit()
         print("Feedback Seeded Successfully.")
 
+    # --- 5b. REFRESH ROLLUPS & PER-USER SUMMARY ---
+    # Seeding writes subscriptions / payments / activity directly, bypassing the
+    # incremental summary / rollup updates in backend.py — recompute them once.
+    # Seeded sessions are back-dated, so re-roll every finished day with raw rows, and
+    # every day the removed seed sessions covered. Days before that keep their rollups:
+    # their raw partitions may already be dropped, so real users' history there can't be rebuilt.
+    cursor.execute("SELECT MIN(login_time)::date FROM user_activity")
+    first_days = [d for d in (cursor.fetchone()[0], cleared_from) if d is not None]
+    rollup_activity_range(cursor, min(first_days, default=None), datetime.now().date() - timedelta(days=1))
+    for stmt in USER_SUMMARY_REBUILD_SQL + REVENUE_DAILY_REBUILD_SQL:
+        cursor.execute(stmt)
+    conn.commit()
+    print("Activity rollups, user summary and revenue rollup refreshed.")
+
     # --- 6. FINAL SUMMARY ---
     print("--------------------------------------------------")
     print("SUCCESS! 150 Users Seeded.")
@@ -0,0 +1,60 @@
+"""
+ActivityWriter(sync=True): every log_in / log_out is written before the
+call returns. Runs against the configured database (python database.py
+first) with a throwaway user; skipped when the database isn't reachable.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import DB_HOST, DB_NAME, DB_USER, DB_PASS      # noqa: E402
+
+try:
+    psycopg2.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASS).close()
+except psycopg2.OperationalError as e:
+    pytest.skip(f"database not reachable: {e}", allow_module_level=True)
+
+from backend import ActivityWriter, db      # noqa: E402
+
+
+@pytest.fixture
+def user_id():
+    with db.cursor() as cur:
+        cur.execute("""
+            INSERT INTO users (fullname, email, password, role)
+            VALUES ('Activity Test', %s, 'x', 'USER') RETURNING user_id
+        """, (f"activity-test-{os.getpid()}@example.com",))
+        uid = cur.fetchone()[0]
+    yield uid
+    with db.cursor() as cur:
+        cur.execute("DELETE FROM user_activity WHERE user_id = %s", (uid,))
+        cur.execute("DELETE FROM users WHERE user_id = %s", (uid,))
+
+
+def test_sync_writer_writes_login_and_logout_immediately(user_id):
+    writer = ActivityWriter(sync=True)
+    login = datetime.now().replace(microsecond=0) - timedelta(minutes=45)
+
+    aid = writer.log_in(user_id, login)
+    assert writer.pending() == 0
+    with db.cursor() as cur:
+        cur.execute("SELECT user_id, login_time, logout_time FROM user_activity WHERE activity_id = %s", (aid,))
+        assert cur.fetchone() == (user_id, login, None)
+        cur.execute("SELECT last_login, watch_minutes FROM user_summary WHERE user_id = %s", (user_id,))
+        assert cur.fetchone() == (login, 0)
+
+    writer.log_out(aid, login + timedelta(minutes=45))
+    assert writer.pending() == 0
+    with db.cursor() as cur:
+        cur.execute("SELECT logout_time, session_minutes FROM user_activity WHERE activity_id = %s", (aid,))
+        assert cur.fetchone() == (login + timedelta(minutes=45), 45)
+        cur.execute("SELECT last_login, watch_minutes FROM user_summary WHERE user_id = %s", (user_id,))
+        assert cur.fetchone() == (login, 45)
+    writer.close()